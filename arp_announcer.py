@@ -0,0 +1,100 @@
+#!/usr/bin/python3
+# arp_announcer.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Gratuitous ARP announcer for VIM-BCAST for JHU's Rocket Lab.
+###############################################################################
+# Replaces `arping -U -c 1 -I eth0 -s <localIP> <targetIP>`. The Ethernet/ARP
+# frame is built once and sent over a persistent, non-blocking AF_PACKET
+# socket, so an announcement never forks or blocks the event loop.
+#
+# Once the link has been idle for idleTime seconds, an announcement is sent
+# every `interval` seconds, with the interval multiplied by `backoff` after
+# each one up to maxInterval. Any received packet resets the cadence.
+###############################################################################
+
+import logging
+import asyncio
+import socket
+import struct
+import time
+
+ETH_P_ARP = 0x0806
+ETH_P_IP = 0x0800
+ARP_HTYPE_ETHER = 1
+ARP_OP_REQUEST = 1
+BROADCAST_MAC = b'\xff' * 6
+ZERO_MAC = b'\x00' * 6
+
+IDLE_TIME = 5  # seconds without packets before announcing
+INTERVAL = 2  # seconds between announcements while idle
+BACKOFF = 2.0  # interval multiplier after each announcement
+MAX_INTERVAL = 60  # longest interval between announcements
+
+def buildFrame(srcMAC, localIP, targetIP):
+    ethHeader = struct.pack('!6s6sH', BROADCAST_MAC, srcMAC, ETH_P_ARP)
+    arpPayload = struct.pack('!HHBBH6s4s6s4s',
+                             ARP_HTYPE_ETHER, ETH_P_IP, 6, 4, ARP_OP_REQUEST,
+                             srcMAC, socket.inet_aton(localIP),
+                             ZERO_MAC, socket.inet_aton(targetIP))
+    return ethHeader + arpPayload
+
+class arpAnnouncer:
+    def __init__(self, iface, localIP, targetIP,
+                 idleTime=IDLE_TIME, interval=INTERVAL,
+                 backoff=BACKOFF, maxInterval=MAX_INTERVAL):
+        self.logger = logging.getLogger('bcast')
+        self.iface = iface
+        self.localIP = localIP
+        self.targetIP = targetIP
+        self.idleTime = idleTime
+        self.interval = interval
+        self.backoff = backoff
+        self.maxInterval = maxInterval
+        self.sentCount = 0
+        self.blockedCount = 0
+        self.errorCount = 0
+
+        self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW,
+                                  socket.htons(ETH_P_ARP))
+        self.sock.bind((iface, ETH_P_ARP))
+        self.sock.setblocking(False)
+        self.srcMAC = self.sock.getsockname()[4]
+        self.frame = buildFrame(self.srcMAC, localIP, targetIP)
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def announce(self):
+        try:
+            self.sock.send(self.frame)
+        except BlockingIOError:
+            self.blockedCount += 1
+            return False
+        except OSError as e:
+            self.errorCount += 1
+            self.logger.warn(f'ARP announcement failed: \'{e}\'')
+            return False
+        self.sentCount += 1
+        return True
+
+    async def run(self, lastActivity):
+        # lastActivity() returns the perf_counter() time of the last packet
+        interval = self.interval
+        while True:
+            idle = time.perf_counter() - lastActivity()
+            if idle < self.idleTime:
+                interval = self.interval
+                await asyncio.sleep(self.idleTime - idle)
+                continue
+            self.announce()
+            self.logger.debug(f'ARP announce {self.localIP} -> ' \
+                              f'{self.targetIP} sent={self.sentCount} ' \
+                              f'blocked={self.blockedCount} ' \
+                              f'errors={self.errorCount}')
+            await asyncio.sleep(interval)
+            interval = min(interval * self.backoff, self.maxInterval)
@@ -0,0 +1,360 @@
+#!/usr/bin/python3
+# bcast_forwarder.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Raw IP/UDP forwarding engine for VIM-BCAST for JHU's Rocket Lab.
+###############################################################################
+# The detector packets are rebroadcast with the detector's IP address and port
+# as the source, so the header has to be built by hand and sent over a raw
+# socket (IP_HDRINCL). Everything that is constant for a given source is
+# packed once into a 28 byte template; per packet only the IP total length,
+# IP ID, IP header checksum and UDP length are patched into a preallocated
+# buffer with pack_into().
+#
+# Checksums are computed incrementally. The template caches the
+# ones-complement sum of its constant IP header fields and of the UDP
+# pseudo-header (addresses, protocol) plus ports, so per packet only the
+# lengths, the IP ID and the payload are added in. The payload is summed once
+# per packet, whichever destinations it goes to. Packets longer than the MTU
+# are sent as IP fragments (the kernel does not fragment IP_HDRINCL packets,
+# and UDP GSO does not apply to raw sockets).
+#
+# A forwarder fans each packet out to a list of destinations (subnet
+# broadcast, unicast consumers, multicast groups), each with its own
+# persistent raw socket, header templates and send/error counters. The
+# payload is copied into the send buffer once; per destination only the 28
+# header bytes in front of it are rewritten.
+#
+# IP IDs run 1..65535: with IP_HDRINCL the kernel replaces an ID of 0 with a
+# fresh one on every fragment, so a fragmented datagram with ID 0 could
+# never be reassembled.
+###############################################################################
+
+import sys
+import logging
+import ipaddress
+import socket
+import struct
+
+import mmsg_io
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+IP_HDR_LEN = 20
+UDP_HDR_LEN = 8
+HDR_LEN = IP_HDR_LEN + UDP_HDR_LEN
+MAX_IP_PKT = 65535
+MAX_PAYLOAD = MAX_IP_PKT - HDR_LEN
+IP_TTL = 20
+MTU = 1500
+IP_MF = 0x2000  # more fragments flag
+MAX_TEMPLATES = 64  # cached source headers before the cache is flushed
+
+_ipHdr = struct.Struct('>BBHHHBBH4s4s')
+_udpHdr = struct.Struct('>HHHH')
+_lenId = struct.Struct('>HH')
+_lenIdFrag = struct.Struct('>HHH')
+_short = struct.Struct('>H')
+
+def onesComplementSum(data, start=0):
+    """Sum `data` as big-endian 16 bit words, without folding the carry."""
+    if len(data) % 2:
+        data = bytes(data) + b'\x00'
+    total = start
+    for (word,) in struct.iter_unpack('>H', data):
+        total += word
+    return total
+
+def foldSum(total):
+    """Fold the carries of a ones-complement sum into 16 bits."""
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return total
+
+def foldChecksum(total):
+    """Fold the carries of a ones-complement sum and invert it."""
+    return ~foldSum(total) & 0xFFFF
+
+def _payloadSumInt(data):
+    # 2**16 == 1 (mod 0xFFFF), so a big-endian integer is congruent to the
+    # sum of its 16 bit words
+    value = int.from_bytes(data, 'big')
+    if len(data) & 1:
+        value <<= 8
+    return value % 0xFFFF
+
+def _payloadSumNumpy(data):
+    # the sum is byte-order independent and folds the same from 32 bit
+    # words: add them in native order and swap the folded result (RFC 1071)
+    length = len(data)
+    words = np.frombuffer(data, np.uint32, length >> 2)
+    total = foldSum(int(np.add.reduce(words, dtype=np.uint64)))
+    if sys.byteorder == 'little':
+        total = ((total & 0xFF) << 8) | (total >> 8)
+    tail = length & 3
+    if tail:
+        total += _payloadSumInt(data[length - tail:])
+    return total
+
+# ones-complement sum of a payload, congruent mod 0xFFFF to the exact sum
+payloadSum = _payloadSumNumpy if np is not None else _payloadSumInt
+
+class headerTemplate:
+    """Pre-packed IP/UDP header for one (srcIP, srcPort) -> destination."""
+    __slots__ = ('header', 'partialSum', 'udpSum')
+
+    def __init__(self, srcIP, srcPort, dstIP, dstPort, ttl=IP_TTL):
+        ipHeader = _ipHdr.pack(0x45, 0, 0, 0, 0, ttl, socket.IPPROTO_UDP, 0,
+                               socket.inet_aton(srcIP),
+                               socket.inet_aton(dstIP))
+        udpHeader = _udpHdr.pack(srcPort, dstPort, 0, 0)
+        self.header = ipHeader + udpHeader
+        # length, ID and checksum are zero in the template, so this is the
+        # checksum contribution of every field that never changes
+        self.partialSum = onesComplementSum(ipHeader)
+        # UDP pseudo-header (addresses, protocol) and ports; the UDP length
+        # is added twice per packet, once for each place it appears
+        self.udpSum = onesComplementSum(ipHeader[12:20] + udpHeader,
+                                        socket.IPPROTO_UDP)
+
+def nextIpId(ipId):
+    """The IP ID after `ipId`, skipping 0."""
+    return ipId % 0xFFFF + 1
+
+class destination:
+    """One forwarding destination: its address, raw socket and counters."""
+    def __init__(self, ip, port, ttl=IP_TTL, ifaceIP=None):
+        self.ip = ip
+        self.port = port
+        self.dest = (ip, port)
+        self.ttl = ttl
+        self.kind = destinationKind(ip)
+        self.templates = {}
+        self.sentCount = 0
+        self.errorCount = 0
+        self.fragmentCount = 0  # datagrams sent as IP fragments
+        self.batchSender = None
+        self.fragHeader = bytearray(IP_HDR_LEN)
+        self.sock = self.openSocket(ifaceIP)
+
+    def openSocket(self, ifaceIP):
+        sock = socket.socket(socket.AF_INET,
+                             socket.SOCK_RAW,
+                             socket.IPPROTO_RAW)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        if self.kind == 'multicast':
+            if ifaceIP is not None:
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF,
+                                socket.inet_aton(ifaceIP))
+        else:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        return sock
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def getTemplate(self, addr):
+        template = self.templates.get(addr)
+        if template is None:
+            if len(self.templates) >= MAX_TEMPLATES:
+                self.templates.clear()
+            template = headerTemplate(addr[0], addr[1], self.ip, self.port,
+                                      self.ttl)
+            self.templates[addr] = template
+        return template
+
+    def writeHeader(self, buf, addr, payloadLen, ipId, dataSum=None):
+        """Write the IP/UDP header for a payload into buf[:HDR_LEN].
+
+        dataSum is payloadSum() of the payload, or None for no UDP checksum.
+        """
+        template = self.getTemplate(addr)
+        totalLen = HDR_LEN + payloadLen
+        udpLen = UDP_HDR_LEN + payloadLen
+        buf[:HDR_LEN] = template.header
+        _lenId.pack_into(buf, 2, totalLen, ipId)
+        _short.pack_into(buf, 10,
+                         foldChecksum(template.partialSum + totalLen + ipId))
+        _short.pack_into(buf, 24, udpLen)
+        if dataSum is not None:
+            checksum = foldChecksum(template.udpSum + 2 * udpLen + dataSum)
+            _short.pack_into(buf, 26, checksum or 0xFFFF)  # 0 means none
+        return totalLen
+
+    def sendFragments(self, view, addr, totalLen, ipId, mtu):
+        """Send the packet in view[:totalLen] as IP fragments."""
+        template = self.getTemplate(addr)
+        header = self.fragHeader
+        header[:] = template.header[:IP_HDR_LEN]
+        step = (mtu - IP_HDR_LEN) & ~7  # fragment offsets are in 8 bytes
+        dataLen = totalLen - IP_HDR_LEN
+        for offset in range(0, dataLen, step):
+            count = min(step, dataLen - offset)
+            flags = (IP_MF if offset + count < dataLen else 0) | (offset >> 3)
+            fragLen = IP_HDR_LEN + count
+            _lenIdFrag.pack_into(header, 2, fragLen, ipId, flags)
+            _short.pack_into(header, 10,
+                             foldChecksum(template.partialSum + fragLen +
+                                          ipId + flags))
+            start = IP_HDR_LEN + offset
+            self.sock.sendmsg([header, view[start:start + count]], (), 0,
+                              self.dest)
+        self.fragmentCount += 1
+
+    def summary(self):
+        return {'dest': f'{self.ip}:{self.port}', 'kind': self.kind,
+                'sent': self.sentCount, 'errors': self.errorCount,
+                'fragmented': self.fragmentCount}
+
+def destinationKind(ip):
+    address = ipaddress.IPv4Address(ip)
+    if address.is_multicast:
+        return 'multicast'
+    if ip.endswith('.255'):
+        return 'broadcast'
+    return 'unicast'
+
+def parseDestination(spec, defaultPort):
+    """'IP' or 'IP:PORT' -> (ip, port)."""
+    ip, sep, port = spec.partition(':')
+    ipaddress.IPv4Address(ip)  # ValueError if it is not an address
+    return ip, int(port) if sep else defaultPort
+
+class rawForwarder:
+    def __init__(self, destinations, ttl=IP_TTL, ifaceIP=None, mtu=MTU,
+                 udpChecksum=True, ipId=1):
+        self.logger = logging.getLogger('bcast')
+        if not destinations:
+            raise ValueError('no destinations to forward to')
+        if mtu < IP_HDR_LEN + 8:
+            raise ValueError(f'MTU {mtu} is too small')
+        self.ttl = ttl
+        self.mtu = mtu
+        self.udpChecksum = udpChecksum
+        self.destinations = []
+        try:
+            for ip, port in destinations:
+                self.destinations.append(destination(ip, port, ttl, ifaceIP))
+        except OSError:
+            self.close()
+            raise
+        self.ipId = ((ipId & 0xFFFF) or 1) - 1  # the first packet gets ipId
+        self.buf = bytearray(MAX_IP_PKT)
+        self.view = memoryview(self.buf)
+        self.payloads = None
+
+    def setTTL(self, ttl):
+        # the TTL is part of the cached header templates
+        self.ttl = ttl
+        for dest in self.destinations:
+            dest.ttl = ttl
+            dest.templates.clear()
+
+    @property
+    def sentCount(self):
+        return sum(dest.sentCount for dest in self.destinations)
+
+    @property
+    def errorCount(self):
+        return sum(dest.errorCount for dest in self.destinations)
+
+    @property
+    def fragmentCount(self):
+        return sum(dest.fragmentCount for dest in self.destinations)
+
+    def close(self):
+        for dest in self.destinations:
+            dest.close()
+
+    def summary(self):
+        return [dest.summary() for dest in self.destinations]
+
+    def forward(self, addr, payload):
+        """Send one payload to every destination; it is copied in once."""
+        payloadLen = len(payload)
+        if payloadLen > MAX_PAYLOAD:
+            raise ValueError(f'payload too large ({payloadLen}B)')
+        buf = self.buf
+        buf[HDR_LEN:HDR_LEN + payloadLen] = payload
+        self.ipId = ipId = nextIpId(self.ipId)
+        dataSum = payloadSum(payload) if self.udpChecksum else None
+        mtu = self.mtu
+
+        error = None
+        for dest in self.destinations:
+            pktLen = dest.writeHeader(buf, addr, payloadLen, ipId, dataSum)
+            try:
+                if pktLen > mtu:
+                    dest.sendFragments(self.view, addr, pktLen, ipId, mtu)
+                else:
+                    dest.sock.sendto(self.view[:pktLen], dest.dest)
+            except OSError as e:
+                dest.errorCount += 1
+                error = error or e
+            else:
+                dest.sentCount += 1
+        if error is not None:
+            raise error  # after every destination has had its copy
+
+    def enableBatch(self, batchSize, bufSize):
+        """Allocate the sendmmsg() vectors for forwardBatch()."""
+        self.payloads = mmsg_io.bufferVector(batchSize, bufSize)
+        for dest in self.destinations:
+            dest.batchSender = mmsg_io.gatherSender(dest.sock, dest.dest,
+                                                    self.payloads, HDR_LEN)
+
+    def forwardBatch(self, receiver, count):
+        """Forward datagrams 0..count-1 of an mmsgReceiver, one sendmmsg
+        per destination."""
+        if self.payloads is None:
+            for i in range(count):
+                self.forward(*receiver.packet(i))
+            return
+
+        views = self.payloads.views
+        maxLen = min(self.payloads.bufSize, self.mtu - HDR_LEN)
+        addrs = []
+        lengths = []
+        sums = []
+        udpChecksum = self.udpChecksum
+        for i in range(count):
+            addr, payload = receiver.packet(i)
+            payloadLen = len(payload)
+            if payloadLen > maxLen:
+                # needs fragmenting: forward this batch packet by packet
+                for j in range(count):
+                    self.forward(*receiver.packet(j))
+                return
+            views[i][:payloadLen] = payload
+            addrs.append(addr)
+            lengths.append(payloadLen)
+            sums.append(payloadSum(payload) if udpChecksum else None)
+        ipIds = []
+        ipId = self.ipId
+        for i in range(count):
+            ipId = nextIpId(ipId)
+            ipIds.append(ipId)
+        self.ipId = ipId
+
+        error = None
+        for dest in self.destinations:
+            headers = dest.batchSender.headerViews
+            for i in range(count):
+                dest.writeHeader(headers[i], addrs[i], lengths[i],
+                                 ipIds[i], sums[i])
+            try:
+                dest.sentCount += dest.batchSender.send(lengths)
+            except OSError as e:
+                sent = getattr(e, 'sent', None) or 0  # before the error
+                dest.sentCount += sent
+                dest.errorCount += count - sent
+                error = error or e
+        if error is not None:
+            raise error
@@ -0,0 +1,85 @@
+#!/usr/bin/python3
+# bench_decode.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Decode benchmark for VIM-PARLL zero-order packets.
+###############################################################################
+# Times the original per-photon slicing loop against photon_decoder with the
+# array fallback and, when installed, numpy, for packets of 0, 1, 100 and
+# MAX_PHOTONS photons. Results are checked against each other before timing.
+#
+#   ./bench_decode.py --repeat 20000
+###############################################################################
+
+import sys
+import argparse
+import shlex
+import random
+import timeit
+
+import photon_decoder
+from photon_decoder import buildPacket, MAX_PHOTONS
+
+def legacyDecode(pkt):
+    # copy of the original packetHandler.handlePacket decode loop
+    numPhotons = (pkt[1]<<8) + pkt[0]
+    numPhotonBytes = numPhotons * 6
+    pktData = pkt[6:]
+    photonList = [pktData[i:i+6] for i in range(0, numPhotonBytes, 6)]
+    photonQueue = []
+    for photon in photonList:
+        xA = photon[1]<<3
+        xB = photon[0]>>5
+        yA = photon[3]<<3
+        yB = photon[2]>>5
+        x = (xA + xB) & 255
+        y = (yA + yB) & 255
+        photonQueue.append((x, y))
+    return photonQueue
+
+def makePacket(numPhotons):
+    photons = [(random.getrandbits(16), random.getrandbits(16),
+                random.getrandbits(16)) for _ in range(numPhotons)]
+    return buildPacket(1, photons)
+
+def decoders():
+    found = [('legacy', legacyDecode),
+             ('array', lambda pkt: photon_decoder._decodeArray(
+                 pkt, photon_decoder.photonsInPacket(pkt, pkt[0] | pkt[1] << 8)))]
+    if photon_decoder.np is not None:
+        found.append(('numpy', lambda pkt: photon_decoder._decodeNumpy(
+            pkt, photon_decoder.photonsInPacket(pkt, pkt[0] | pkt[1] << 8))))
+    return found
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if isinstance(argv, str):
+        argv = shlex.split(argv)
+
+    parser = argparse.ArgumentParser(sys.argv[0])
+    parser.add_argument('--repeat', type=int, default=10000,
+                        help='decodes per measurement')
+    parser.add_argument('--sizes', type=str, default=f'0,1,100,{MAX_PHOTONS}',
+                        help='comma separated photons per packet')
+
+    opts = parser.parse_args(argv)
+    sizes = [int(n) for n in opts.sizes.split(',')]
+
+    print(f'{"photons":>8s} {"decoder":<8s} {"us/pkt":>9s} {"Mphot/s":>9s}')
+    for size in sizes:
+        pkt = makePacket(size)
+        expected = legacyDecode(pkt)
+        for name, decode in decoders():
+            if name != 'legacy' and size > 0:
+                x, y = decode(pkt)
+                assert list(zip(x.tolist(), y.tolist())) == expected, name
+            elapsed = timeit.timeit(lambda: decode(pkt), number=opts.repeat)
+            perPkt = elapsed / opts.repeat
+            rate = size / perPkt / 1e6 if size else 0.0
+            print(f'{size:8d} {name:<8s} {1e6 * perPkt:9.2f} {rate:9.2f}')
+
+if __name__ == "__main__":
+    main()
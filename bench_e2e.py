@@ -0,0 +1,300 @@
+#!/usr/bin/python3
+# bench_e2e.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# End-to-end throughput benchmark for VIM-BCAST and VIM-PARLL.
+###############################################################################
+# Starts main_bcast.py / main_parll.py on loopback, drives them with
+# traffic_gen at increasing rates and reads their stats over the control
+# socket. Stand-ins replace the hardware:
+#   bcast - forwards to a UDP sink on 127.0.0.1:--sinkPort (raw socket, root)
+#   parll - --gpio fake (simulated 74HC595 pair and auto-acking RIO)
+#
+# Each rate step resets the service metrics, sends for --duration seconds,
+# waits for the service to drain and records packets/s, photons/s, drop rate
+# and latency percentiles. A step is sustainable when the drop rate is at
+# most --maxDrop and the generator kept up with the target rate. The sweep
+# stops at the first unsustainable step. Results are one JSON document
+# (stdout or --output) so they can be compared across versions.
+#
+#   sudo ./bench_e2e.py --service both --rates 500,1000,2000,5000,10000
+###############################################################################
+
+import os
+import sys
+import argparse
+import shlex
+import json
+import platform
+import signal
+import socket
+import subprocess
+import threading
+import time
+
+import control_socket
+from traffic_gen import packetSource, sendTraffic, DISTRIBUTIONS
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+START_TIMEOUT = 10  # seconds to wait for a service's control socket
+POLL_TIME = 0.1  # seconds between drain checks
+RATE_SLACK = 0.95  # fraction of the target rate the generator must reach
+SINK_BUF = 4 << 20
+
+class udpSink:
+    """Counts datagrams arriving on a port, in a background thread."""
+    def __init__(self, port):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SINK_BUF)
+        self.sock.bind(('127.0.0.1', port))
+        self.sock.settimeout(POLL_TIME)
+        self.count = 0
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        recv = self.sock.recv
+        while self.running:
+            try:
+                recv(65536)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self.count += 1
+
+    def close(self):
+        self.running = False
+        self.thread.join()
+        self.sock.close()
+
+class service:
+    """A main_*.py subprocess and its control socket."""
+    def __init__(self, name, argv, ctlPath, logFile):
+        self.name = name
+        self.ctlPath = ctlPath
+        self.proc = subprocess.Popen([sys.executable] + argv, cwd=HERE,
+                                     stdout=logFile, stderr=logFile)
+
+    def query(self, command):
+        reply = control_socket.query(self.ctlPath, command)
+        if 'error' in reply:
+            raise RuntimeError(f'{self.name} {command}: {reply["error"]}')
+        return reply['ok']
+
+    def waitReady(self):
+        deadline = time.perf_counter() + START_TIMEOUT
+        while time.perf_counter() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f'{self.name} exited with ' \
+                                   f'{self.proc.returncode}')
+            try:
+                return self.query('stats')
+            except OSError:
+                time.sleep(POLL_TIME)
+        raise RuntimeError(f'{self.name} did not start')
+
+    def stop(self):
+        if self.proc.poll() is None:
+            self.proc.send_signal(signal.SIGINT)
+            try:
+                self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+
+def waitDrained(read, settle):
+    """Wait until read() stops changing, at most `settle` seconds."""
+    start = time.perf_counter()
+    last = read()
+    while time.perf_counter() - start < settle:
+        time.sleep(POLL_TIME)
+        value = read()
+        if value == last:
+            break
+        last = value
+    return time.perf_counter() - start
+
+def latency(stats, *names):
+    # first histogram with samples, e.g. packet vs batch I/O mode
+    for name in names:
+        hist = stats['histograms'].get(name)
+        if hist and hist['count']:
+            return dict(hist, stage=name)
+    return None
+
+def stepBCAST(svc, sink, sock, dest, source, rate, opts):
+    svc.query('reset')
+    sink0 = sink.count
+    traffic = sendTraffic(sock, dest, source, rate, opts.duration)
+    drain = waitDrained(lambda: sink.count, opts.settle)
+    stats = svc.query('stats')
+    delivered = sink.count - sink0
+    return {'target_pps': rate,
+            'traffic': traffic.asDict(),
+            'delivered': delivered,
+            'delivered_pps': round(delivered / (traffic.elapsed + drain), 1),
+            'rx_packets': stats['counters'].get('rx_packets', 0),
+            'rx_dropped': stats['counters'].get('rx_dropped', 0),
+            'drop_rate': round(1 - delivered / traffic.sent, 6)
+                         if traffic.sent else 0.0,
+            'drain_s': round(drain, 3),
+            'latency': latency(stats, 'rx_to_send', 'batch_rx_to_send')}
+
+def stepPARLL(svc, sock, dest, source, rate, opts):
+    svc.query('reset')
+    before = svc.query('stats')
+    traffic = sendTraffic(sock, dest, source, rate, opts.duration)
+    drain = waitDrained(
+        lambda: svc.query('stats')['counters'].get('photons_out', 0),
+        opts.settle)
+    stats = svc.query('stats')
+    counters = stats['counters']
+    gauges, gauges0 = stats['gauges'], before['gauges']
+    photonsOut = counters.get('photons_out', 0)
+    rxPackets = counters.get('rx_packets', 0)
+    return {'target_pps': rate,
+            'traffic': traffic.asDict(),
+            'rx_packets': rxPackets,
+            'rx_dropped': counters.get('rx_dropped', 0),
+            'packet_loss': round(1 - rxPackets / traffic.sent, 6)
+                           if traffic.sent else 0.0,
+            'photons_out': photonsOut,
+            'photons_per_s': round(photonsOut / (traffic.elapsed + drain), 1),
+            'fifo_dropped_photons': gauges.get('fifo_dropped_photons', 0) -
+                                    gauges0.get('fifo_dropped_photons', 0),
+            'drop_rate': round(1 - photonsOut / traffic.photons, 6)
+                         if traffic.photons else 0.0,
+            'drain_s': round(drain, 3),
+            'latency': latency(stats, 'rx_to_shift'),
+            'decode_latency': latency(stats, 'rx_to_decode')}
+
+def sustainable(step, maxDrop):
+    return step['drop_rate'] <= maxDrop and \
+        step['traffic']['rate_pps'] >= RATE_SLACK * step['target_pps']
+
+def sweep(name, runStep, rates, opts):
+    steps = []
+    best = None
+    for rate in rates:
+        step = runStep(rate)
+        step['sustainable'] = sustainable(step, opts.maxDrop)
+        steps.append(step)
+        print(f'{name}: {rate:g} pkt/s -> drop {step["drop_rate"]:.4%}' \
+              f'{"" if step["sustainable"] else " (unsustainable)"}',
+              file=sys.stderr)
+        if not step['sustainable']:
+            break
+        best = step
+    result = {'steps': steps,
+              'max_sustainable_pps': best['target_pps'] if best else 0}
+    if best is not None and 'photons_per_s' in best:
+        result['max_sustainable_photons_per_s'] = best['photons_per_s']
+    return result
+
+def runService(name, opts, rates, logFile):
+    ctlPath = f'/tmp/bench-{name}-{os.getpid()}.sock'
+    if name == 'bcast':
+        argv = ['main_bcast.py', '--localIP', '127.0.0.1',
+                '--port', str(opts.port), '--bcastIP', '127.0.0.1',
+                '--bcastPort', str(opts.sinkPort)]
+    else:
+        argv = ['main_parll.py', '--port', str(opts.port),
+                '--srcIP', '127.0.0.1', '--gpio', 'fake']
+    argv += ['--ctlSocket', ctlPath, '--logLevel', '30']
+    argv += shlex.split(opts.serviceArgs)
+
+    sink = udpSink(opts.sinkPort) if name == 'bcast' else None
+    svc = service(name, argv, ctlPath, logFile)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    dest = ('127.0.0.1', opts.port)
+    source = packetSource(opts.dist, opts.photons, seed=opts.seed)
+    try:
+        svc.waitReady()
+        if name == 'bcast':
+            runStep = lambda rate: stepBCAST(svc, sink, sock, dest, source,
+                                             rate, opts)
+        else:
+            runStep = lambda rate: stepPARLL(svc, sock, dest, source,
+                                             rate, opts)
+        result = sweep(name, runStep, rates, opts)
+        result['argv'] = argv
+        return result
+    finally:
+        sock.close()
+        svc.stop()
+        if sink is not None:
+            sink.close()
+
+def gitVersion():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'],
+                              cwd=HERE, capture_output=True, text=True,
+                              timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if isinstance(argv, str):
+        argv = shlex.split(argv)
+
+    parser = argparse.ArgumentParser(sys.argv[0])
+    parser.add_argument('--service', type=str, default='both',
+                        choices=['bcast', 'parll', 'both'])
+    parser.add_argument('--rates', type=str,
+                        default='500,1000,2000,5000,10000,20000,50000',
+                        help='comma separated packet rates to sweep')
+    parser.add_argument('--duration', type=float, default=5,
+                        help='in seconds - traffic per rate step')
+    parser.add_argument('--settle', type=float, default=5,
+                        help='in seconds - max wait for the service to drain')
+    parser.add_argument('--dist', type=str, default='poisson',
+                        choices=DISTRIBUTIONS,
+                        help='photons per packet distribution')
+    parser.add_argument('--photons', type=int, default=20,
+                        help='mean photons per packet')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--maxDrop', type=float, default=0.001,
+                        help='highest drop rate counted as sustainable')
+    parser.add_argument('--port', type=int, default=61000,
+                        help='UDP port the service under test listens on')
+    parser.add_argument('--sinkPort', type=int, default=61001,
+                        help='UDP port of the bcast sink')
+    parser.add_argument('--serviceArgs', type=str, default='',
+                        help='extra arguments for main_*.py')
+    parser.add_argument('--serviceLog', type=str, default=os.devnull,
+                        help='file for the services\' output')
+    parser.add_argument('--output', type=str, default=None,
+                        help='write the JSON results here instead of stdout')
+    opts = parser.parse_args(argv)
+
+    rates = [float(rate) for rate in opts.rates.split(',')]
+    names = ['bcast', 'parll'] if opts.service == 'both' else [opts.service]
+    results = {'benchmark': 'bench_e2e',
+               'version': gitVersion(),
+               'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+               'python': platform.python_version(),
+               'platform': platform.platform(),
+               'params': {'duration_s': opts.duration, 'dist': opts.dist,
+                          'photons': opts.photons, 'seed': opts.seed,
+                          'max_drop': opts.maxDrop,
+                          'service_args': opts.serviceArgs},
+               'services': {}}
+    with open(opts.serviceLog, 'a') as logFile:
+        for name in names:
+            results['services'][name] = runService(name, opts, rates, logFile)
+
+    text = json.dumps(results, indent=2)
+    if opts.output is None:
+        print(text)
+    else:
+        with open(opts.output, 'w') as f:
+            f.write(text + '\n')
+
+if __name__ == "__main__":
+    main()
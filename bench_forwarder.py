@@ -0,0 +1,164 @@
+#!/usr/bin/python3
+# bench_forwarder.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Microbenchmark for the VIM-BCAST raw forwarding path.
+###############################################################################
+# Compares the original per-packet path (new raw socket + struct.pack header
+# for every packet) against rawForwarder (persistent socket + cached header
+# template), first without the UDP checksum (as before) and then with it.
+# Packets are sent back-to-back, so the send rate is limited only by the
+# forwarding path. --size above the MTU exercises IP fragmentation (the
+# legacy path cannot send those). The payload checksum implementations are
+# timed on their own as well. With --fanout N it also compares N forwarders, one
+# per destination port, with one forwarder fanning out to all N. Needs root
+# for the raw socket.
+#
+#   sudo ./bench_forwarder.py --dest 127.255.255.255 --count 50000 --size 1024
+#   sudo ./bench_forwarder.py --size 8000 --mtu 1500
+###############################################################################
+
+import sys
+import argparse
+import shlex
+import socket
+import struct
+import time
+
+import bcast_forwarder
+from bcast_forwarder import rawForwarder
+
+SRC_ADDR = ('192.168.1.10', 1025)
+
+def legacyForward(addr, udp_payload, bcastIP, bcastPort):
+    # copy of the original packetHandler.handlePacket send path
+    udp_header = struct.pack(">HHHH",
+                             addr[1],
+                             bcastPort,
+                             8 + len(udp_payload),
+                             0)
+    ip_payload = udp_header + udp_payload
+
+    ip_header = struct.pack(">BBH", 69, 0, 20 + len(ip_payload))
+    ip_header += struct.pack(">HH", 12345, 0)
+    ip_header += struct.pack(">BBH", 20, 17, 0)
+
+    srcIP_split = addr[0].split('.')
+    ip_header += struct.pack(">BBBB",
+                             int(srcIP_split[0]),
+                             int(srcIP_split[1]),
+                             int(srcIP_split[2]),
+                             int(srcIP_split[3]))
+
+    bcastIP_split = bcastIP.split('.')
+    ip_header += struct.pack(">BBBB",
+                             int(bcastIP_split[0]),
+                             int(bcastIP_split[1]),
+                             int(bcastIP_split[2]),
+                             int(bcastIP_split[3]))
+
+    ip_pkt = ip_header + ip_payload
+
+    sock = socket.socket(socket.AF_INET,
+                         socket.SOCK_RAW,
+                         socket.IPPROTO_RAW)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    sock.sendto(ip_pkt, (bcastIP, bcastPort))
+    sock.close()
+
+def runLegacy(opts, payload):
+    t0 = time.perf_counter()
+    for _ in range(opts.count):
+        legacyForward(SRC_ADDR, payload, opts.dest, opts.port)
+    return time.perf_counter() - t0
+
+def runForwarder(opts, payload, udpChecksum=False):
+    forwarder = rawForwarder([(opts.dest, opts.port)], mtu=opts.mtu,
+                             udpChecksum=udpChecksum)
+    try:
+        t0 = time.perf_counter()
+        for _ in range(opts.count):
+            forwarder.forward(SRC_ADDR, payload)
+        return time.perf_counter() - t0
+    finally:
+        forwarder.close()
+
+def runSeparate(opts, payload):
+    # one forwarder per destination, as with parallel forwarder processes
+    forwarders = [rawForwarder([(opts.dest, opts.port + n)])
+                  for n in range(opts.fanout)]
+    try:
+        t0 = time.perf_counter()
+        for _ in range(opts.count):
+            for forwarder in forwarders:
+                forwarder.forward(SRC_ADDR, payload)
+        return time.perf_counter() - t0
+    finally:
+        for forwarder in forwarders:
+            forwarder.close()
+
+def runFanout(opts, payload):
+    forwarder = rawForwarder([(opts.dest, opts.port + n)
+                              for n in range(opts.fanout)])
+    try:
+        t0 = time.perf_counter()
+        for _ in range(opts.count):
+            forwarder.forward(SRC_ADDR, payload)
+        return time.perf_counter() - t0
+    finally:
+        forwarder.close()
+
+def runChecksum(opts, payload, payloadSum):
+    t0 = time.perf_counter()
+    for _ in range(opts.count):
+        payloadSum(payload)
+    return time.perf_counter() - t0
+
+def report(name, count, elapsed):
+    print(f'{name:<10s} {count:8d} pkts  {elapsed:8.3f} s  ' \
+          f'{count / elapsed:10.0f} pkt/s  {1e6 * elapsed / count:7.2f} us/pkt')
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if isinstance(argv, str):
+        argv = shlex.split(argv)
+
+    parser = argparse.ArgumentParser(sys.argv[0])
+    parser.add_argument('--dest', type=str, default='127.0.0.1',
+                        help='destination (broadcast) IP address')
+    parser.add_argument('--port', type=int, default=60000,
+                        help='destination UDP port')
+    parser.add_argument('--count', type=int, default=20000,
+                        help='packets per run')
+    parser.add_argument('--size', type=int, default=1024,
+                        help='UDP payload size in bytes')
+    parser.add_argument('--mtu', type=int, default=bcast_forwarder.MTU,
+                        help='larger packets are sent as IP fragments')
+    parser.add_argument('--fanout', type=int, default=0,
+                        help='also compare N forwarders with one fanning ' \
+                             'out to N destinations (ports --port..+N-1)')
+
+    opts = parser.parse_args(argv)
+    payload = bytes(range(256)) * (opts.size // 256) + bytes(opts.size % 256)
+
+    if opts.size + bcast_forwarder.HDR_LEN <= opts.mtu:
+        report('legacy', opts.count, runLegacy(opts, payload))
+    report('forwarder', opts.count, runForwarder(opts, payload))
+    report('checksum', opts.count, runForwarder(opts, payload, True))
+    sums = [('sum-loop', bcast_forwarder.onesComplementSum),
+            ('sum-int', bcast_forwarder._payloadSumInt)]
+    if bcast_forwarder.np is not None:
+        sums.append(('sum-numpy', bcast_forwarder._payloadSumNumpy))
+    for name, payloadSum in sums:
+        report(name, opts.count, runChecksum(opts, payload, payloadSum))
+    if opts.fanout > 0:
+        sends = opts.count * opts.fanout
+        report('separate', sends, runSeparate(opts, payload))
+        report('fanout', sends, runFanout(opts, payload))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/python3
+# bench_idle.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Idle CPU and wakeup latency of the queue consumer loops.
+###############################################################################
+# Runs the old busy-polling consumer (q.empty() check + 1 us sleep) and the
+# event-driven consumer (await q.get()) against the same producer. Each run
+# has an idle phase, where nothing is queued and only CPU time is measured,
+# and a trickle phase, where items stamped with perf_counter() are queued at
+# a fixed interval and the consumer records put-to-get latency.
+#
+#   ./bench_idle.py --idle 5 --items 500 --interval 0.002
+###############################################################################
+
+import sys
+import argparse
+import shlex
+import asyncio
+import time
+
+SLEEP_TIME = 0.000001  # the old loops' sleep
+
+async def pollingConsumer(q, latencies):
+    while True:
+        if not q.empty():
+            stamp = await q.get()
+            latencies.append(time.perf_counter() - stamp)
+        await asyncio.sleep(SLEEP_TIME)
+
+async def blockingConsumer(q, latencies):
+    while True:
+        stamp = await q.get()
+        latencies.append(time.perf_counter() - stamp)
+
+async def runMode(consumer, opts):
+    q = asyncio.Queue(maxsize=32)
+    latencies = []
+    task = asyncio.ensure_future(consumer(q, latencies))
+
+    wall0 = time.perf_counter()
+    cpu0 = time.process_time()
+    await asyncio.sleep(opts.idle)
+    idleCPU = 100 * (time.process_time() - cpu0) / (time.perf_counter() - wall0)
+
+    for _ in range(opts.items):
+        q.put_nowait(time.perf_counter())
+        await asyncio.sleep(opts.interval)
+    await asyncio.sleep(0.01)
+
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    return idleCPU, sorted(latencies)
+
+def percentile(data, pct):
+    if not data:
+        return float('nan')
+    return data[min(len(data) - 1, int(len(data) * pct / 100))]
+
+def report(name, idleCPU, latencies):
+    print(f'{name:<8s} idle_cpu={idleCPU:6.1f}%  n={len(latencies)}  ' \
+          f'p50={1e6 * percentile(latencies, 50):8.1f}us  ' \
+          f'p99={1e6 * percentile(latencies, 99):8.1f}us  ' \
+          f'max={1e6 * percentile(latencies, 100):8.1f}us')
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if isinstance(argv, str):
+        argv = shlex.split(argv)
+
+    parser = argparse.ArgumentParser(sys.argv[0])
+    parser.add_argument('--mode', type=str, default='both',
+                        choices=['old', 'new', 'both'],
+                        help='old: busy polling, new: await q.get()')
+    parser.add_argument('--idle', type=float, default=3,
+                        help='seconds of idle time to measure CPU over')
+    parser.add_argument('--items', type=int, default=500,
+                        help='items queued in the latency phase')
+    parser.add_argument('--interval', type=float, default=0.002,
+                        help='seconds between queued items')
+
+    opts = parser.parse_args(argv)
+    loop = asyncio.get_event_loop()
+    if opts.mode in ('old', 'both'):
+        report('old', *loop.run_until_complete(runMode(pollingConsumer, opts)))
+    if opts.mode in ('new', 'both'):
+        report('new', *loop.run_until_complete(runMode(blockingConsumer, opts)))
+    loop.close()
+
+if __name__ == "__main__":
+    main()
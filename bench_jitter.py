@@ -0,0 +1,152 @@
+#!/usr/bin/python3
+# bench_jitter.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Event loop wake-up jitter with and without the real-time profile.
+###############################################################################
+# A 1 kHz asyncio timer stands in for the packet path: every tick it records
+# how late it woke up and then does a packet's worth of work that leaves
+# cyclic garbage behind, with `--live` long-lived objects held like a
+# running service holds its modules and state. `--load` busy processes
+# compete for the CPUs like cron jobs and other daemons.
+#
+# The same run is made under the default scheduler and GC, then again after
+# rt_profile (CPU pinning, SCHED_FIFO, mlockall, gc.freeze and small young
+# collections between ticks). Reports the lateness distribution and the GC
+# pauses of each run.
+#
+#   sudo ./bench_jitter.py --seconds 10 --load 4 --rtCPUs 3
+###############################################################################
+
+import sys
+import argparse
+import shlex
+import asyncio
+import subprocess
+import json
+import gc
+import os
+import time
+
+import metrics
+import rt_profile
+
+def makeGarbage(count):
+    for i in range(count):
+        node = {'photon': (i, i), 'next': None}
+        node['next'] = node  # a cycle only the collector frees
+
+async def ticker(opts, lateness, ticks):
+    interval = opts.interval / 1000
+    start = time.perf_counter()
+    for i in range(int(opts.seconds / interval)):
+        deadline = start + (i + 1) * interval
+        await asyncio.sleep(max(deadline - time.perf_counter(), 0))
+        lateness.append(time.perf_counter() - deadline)
+        makeGarbage(opts.garbage)
+        ticks.value += 1
+
+async def runPhase(opts, rt):
+    lateness = []
+    ticks = metrics.counter()
+    tasks = [asyncio.ensure_future(ticker(opts, lateness, ticks))]
+    if rt is not None:
+        tasks.append(asyncio.ensure_future(
+            rt.collectIdle(lambda: ticks.value)))
+    await tasks[0]
+    for task in tasks[1:]:
+        task.cancel()
+    return sorted(lateness)
+
+def percentile(data, pct):
+    return data[min(len(data) - 1, int(len(data) * pct / 100))]
+
+def startLoad(count):
+    return [subprocess.Popen([sys.executable, '-c', 'while True: pass'])
+            for _ in range(count)]
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if isinstance(argv, str):
+        argv = shlex.split(argv)
+
+    parser = argparse.ArgumentParser(sys.argv[0])
+    parser.add_argument('--seconds', type=float, default=5,
+                        help='length of each run')
+    parser.add_argument('--interval', type=float, default=1,
+                        help='in milliseconds - timer period')
+    parser.add_argument('--garbage', type=int, default=200,
+                        help='cyclic objects left behind per tick')
+    parser.add_argument('--live', type=int, default=200000,
+                        help='long-lived objects held during the runs')
+    parser.add_argument('--load', type=int, default=os.cpu_count(),
+                        help='busy processes competing for the CPUs')
+    parser.add_argument('--rtCPUs', type=str, default='3',
+                        help='core for the event loop in the rt run')
+    parser.add_argument('--rtPriority', type=int,
+                        default=rt_profile.PRIORITY,
+                        help='SCHED_FIFO priority in the rt run')
+    parser.add_argument('--json', action='store_true',
+                        help='print the results as JSON')
+    opts = parser.parse_args(argv)
+
+    live = [[i] for i in range(opts.live)]  # tracked by the collector
+    pauses = metrics.latencyHistogram()
+    gcStart = []
+
+    def onCollect(phase, info):
+        if phase == 'start':
+            gcStart.append(time.perf_counter())
+        elif gcStart:
+            pauses.record(time.perf_counter() - gcStart.pop())
+
+    gc.callbacks.append(onCollect)
+    load = startLoad(opts.load)
+    results = []
+    try:
+        for name in ('default', 'rt'):
+            rt = None
+            if name == 'rt':
+                rt = rt_profile.rtProfile('jitter',
+                                          rt_profile.parseCPUs(opts.rtCPUs),
+                                          opts.rtPriority)
+                rt.apply()
+                rt.freezeGC()
+            pauses.reset()
+            lateness = asyncio.run(runPhase(opts, rt))
+            result = {'profile': name, 'ticks': len(lateness),
+                      'gc_collections': pauses.count,
+                      'gc_max_us': round(pauses.max / 1e3, 1)}
+            for pct in (50, 99, 99.9, 100):
+                result[f'p{pct}_us'] = round(1e6 *
+                                             percentile(lateness, pct), 1)
+            if rt is not None:
+                result['applied'] = rt.applied
+            results.append(result)
+    finally:
+        for proc in load:
+            proc.kill()
+            proc.wait()
+    del live
+
+    if opts.json:
+        print(json.dumps({'benchmark': 'bench_jitter',
+                          'interval_ms': opts.interval, 'load': opts.load,
+                          'results': results}, indent=2))
+        return
+    for result in results:
+        print(f'{result["profile"]:<8s} n={result["ticks"]}  ' \
+              f'p50={result["p50_us"]:8.1f}us  ' \
+              f'p99={result["p99_us"]:8.1f}us  ' \
+              f'p99.9={result["p99.9_us"]:8.1f}us  ' \
+              f'max={result["p100_us"]:8.1f}us  ' \
+              f'gc={result["gc_collections"]} ' \
+              f'(max {result["gc_max_us"]:.0f}us)')
+        if 'applied' in result:
+            print(f'         applied: {result["applied"]}')
+
+if __name__ == "__main__":
+    main()
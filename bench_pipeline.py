@@ -0,0 +1,173 @@
+#!/usr/bin/python3
+# bench_pipeline.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Serial vs pipelined shift register output, timing model and emulation.
+###############################################################################
+# Per photon the output spends
+#   shift    - clocking y and x into the 74HC595
+#   present  - latch, outEn LOW, SNAP_FIFO_EMPTY LOW
+#   ack      - the RIO reading the outputs until SNAP_FIFO_READ
+#   release  - SNAP_FIFO_EMPTY HIGH, outEn HIGH
+#   drop     - the RIO dropping SNAP_FIFO_READ again
+# so the model period is
+#   serial    = shift + present + ack + release + drop
+#   pipelined = max(shift, ack) + present + release + drop
+# The shift, present and release costs are measured on fakeGPIO. Then
+# GPIO_to_cRIO.handleDataSync() sends the same photons in both modes to a
+# fakeGPIO whose RIO reads `ackDelay` after SNAP_FIFO_EMPTY and drops READ
+# `releaseDelay` after it is released. The queue is drained (flushSync) every
+# --drainEvery photons, as the output thread does whenever the ring runs
+# empty. The photons the RIO received are checked against the ones sent,
+# with no photon latched over before it was read and none presented while
+# READ was still HIGH.
+#
+#   ./bench_pipeline.py --count 20000 --ackDelay 0,10,20,50
+###############################################################################
+
+import sys
+import argparse
+import shlex
+import json
+import time
+
+from gpio_backend import fakeGPIO, MSBFIRST, HIGH
+from photon_fifo import photonFIFO
+from shift_register import GPIO_to_cRIO
+
+HANDSHAKE_TIMEOUT = 0.1  # seconds, a photon the RIO never read fails the run
+PINS = dict(inputPin=1, clockPin=2, latchPin=3, clearPin=5, outEnPin=6,
+            snapEmptyPin=14, snapReadPin=15)
+
+def makeFake(ackDelay=0, releaseDelay=0):
+    return fakeGPIO(**PINS, ackDelay=ackDelay, releaseDelay=releaseDelay)
+
+def makeShiftReg(gpio, pipelined):
+    return GPIO_to_cRIO(qFIFO=photonFIFO(),
+                        inputPin=PINS['inputPin'],
+                        clockPin=PINS['clockPin'],
+                        latchPin=PINS['latchPin'],
+                        clearPin=PINS['clearPin'],
+                        outEnPin=PINS['outEnPin'],
+                        snapFullPin=13,
+                        snapEmptyPin=PINS['snapEmptyPin'],
+                        snapReadPin=PINS['snapReadPin'],
+                        order=MSBFIRST,
+                        gpio=gpio,
+                        handshakeTimeout=HANDSHAKE_TIMEOUT,
+                        pipelined=pipelined)
+
+def measureSteps(photons):
+    """Seconds per photon of the shift, present and release steps."""
+    gpio = makeFake()
+    gpio.configurePhoton(PINS['inputPin'], PINS['clockPin'],
+                         PINS['latchPin'], PINS['outEnPin'],
+                         PINS['snapEmptyPin'], MSBFIRST)
+    shift = present = release = 0.0
+    for x, y in photons:
+        t0 = time.perf_counter()
+        gpio.shiftPhoton(x, y)
+        t1 = time.perf_counter()
+        gpio.presentPhoton()
+        t2 = time.perf_counter()
+        gpio.digitalWrite(PINS['snapEmptyPin'], HIGH)
+        gpio.digitalWrite(PINS['outEnPin'], HIGH)
+        t3 = time.perf_counter()
+        shift += t1 - t0
+        present += t2 - t1
+        release += t3 - t2
+    count = len(photons)
+    return shift / count, present / count, release / count
+
+def model(steps, ackDelay, releaseDelay):
+    shift, present, release = steps
+    return {'serial': shift + present + ackDelay + release + releaseDelay,
+            'pipelined': max(shift, ackDelay) + present + release +
+                         releaseDelay}
+
+def emulate(photons, ackDelay, releaseDelay, pipelined, drainEvery):
+    gpio = makeFake(ackDelay, releaseDelay)
+    shiftReg = makeShiftReg(gpio, pipelined)
+    t0 = time.perf_counter()
+    for i, (x, y) in enumerate(photons, 1):
+        shiftReg.handleDataSync(x, y)
+        if drainEvery and i % drainEvery == 0:
+            shiftReg.flushSync()  # the queue ran empty
+    shiftReg.flushSync()
+    elapsed = time.perf_counter() - t0
+    if shiftReg.handshake.timeouts:
+        raise AssertionError(f'{shiftReg.handshake.timeouts} handshakes ' \
+                             f'timed out')
+    if list(gpio.received) != photons:
+        raise AssertionError(f'RIO received {gpio.readCount} photons, ' \
+                             f'not the {len(photons)} sent in order')
+    if gpio.overwrites:
+        raise AssertionError(f'{gpio.overwrites} photons latched over ' \
+                             f'before the RIO read them')
+    if gpio.stalePresents:
+        raise AssertionError(f'{gpio.stalePresents} photons presented ' \
+                             f'before SNAP_FIFO_READ dropped')
+    return elapsed / len(photons)
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if isinstance(argv, str):
+        argv = shlex.split(argv)
+
+    parser = argparse.ArgumentParser(sys.argv[0])
+    parser.add_argument('--count', type=int, default=20000,
+                        help='photons per run')
+    parser.add_argument('--ackDelay', type=str, default='0,5,10,20,50',
+                        help='in microseconds - emulated RIO read times, ' \
+                             'comma separated')
+    parser.add_argument('--releaseDelay', type=float, default=50,
+                        help='in microseconds - emulated RIO time to drop ' \
+                             'SNAP_FIFO_READ after the release')
+    parser.add_argument('--drainEvery', type=int, default=100,
+                        help='photons between queue drains, 0=only at the end')
+    parser.add_argument('--json', action='store_true',
+                        help='print the results as JSON')
+    opts = parser.parse_args(argv)
+
+    photons = [(i & 255, (i * 7 + 3) & 255) for i in range(opts.count)]
+    releaseDelay = opts.releaseDelay / 1e6
+    for pipelined in (False, True):
+        emulate(photons[:1000], 0, releaseDelay, pipelined,
+                opts.drainEvery)  # warm up
+    steps = measureSteps(photons)
+    if not opts.json:
+        print(f'shift {1e6 * steps[0]:.2f} us  present ' \
+              f'{1e6 * steps[1]:.2f} us  release {1e6 * steps[2]:.2f} us')
+        print(f'{"ack_us":>7s} {"mode":<10s} {"model_us":>9s} ' \
+              f'{"emulated_us":>12s} {"photons/s":>10s} {"speedup":>8s}')
+
+    results = []
+    for ackDelay in [float(us) / 1e6 for us in opts.ackDelay.split(',')]:
+        predicted = model(steps, ackDelay, releaseDelay)
+        serial = None
+        for mode in ('serial', 'pipelined'):
+            period = emulate(photons, ackDelay, releaseDelay,
+                             mode == 'pipelined', opts.drainEvery)
+            if serial is None:
+                serial = period
+            results.append({'ack_us': 1e6 * ackDelay, 'mode': mode,
+                            'model_us': round(1e6 * predicted[mode], 3),
+                            'emulated_us': round(1e6 * period, 3),
+                            'speedup': round(serial / period, 3)})
+            if not opts.json:
+                print(f'{1e6 * ackDelay:7.1f} {mode:<10s} ' \
+                      f'{1e6 * predicted[mode]:9.2f} {1e6 * period:12.2f} ' \
+                      f'{1 / period:10.0f} {serial / period:8.2f}')
+    if opts.json:
+        print(json.dumps({'benchmark': 'bench_pipeline', 'count': opts.count,
+                          'release_us': opts.releaseDelay,
+                          'drain_every': opts.drainEvery,
+                          'steps_us': [round(1e6 * step, 3)
+                                       for step in steps],
+                          'results': results}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/python3
+# bench_recv.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Per-datagram cost of the UDP receive path, old vs new.
+###############################################################################
+# Feeds datagram_received() directly, in bursts like the loop's socket reader
+# does, with a consumer draining qPacket, and reports microseconds per datagram
+# from the callback to the consumer:
+#   legacy - copies of the original protocols: ensure_future(datagram_handler)
+#            -> create_task(enqueue_packet) -> await put (parll also turns the
+#            packet into an int and formats it for a debug message)
+#   fast   - the current protocols: put_nowait() from the callback
+# with the asyncio event loop, and uvloop when it is installed.
+#
+#   ./bench_recv.py --count 50000 --photons 244
+###############################################################################
+
+import sys
+import argparse
+import shlex
+import asyncio
+import logging
+import json
+import random
+import time
+
+import metrics
+import udp_server_async_bcast
+import udp_server_async_parll
+from photon_decoder import buildPacket
+from queue_policy import packetQueue
+
+SRC_ADDR = ('192.168.1.10', 1025)
+
+class legacyBcastProtocol(asyncio.DatagramProtocol):
+    # copy of the original VIM-BCAST receive path
+    def __init__(self, loop, logger, qPacket):
+        self.loop = loop
+        self.logger = logger
+        self.qPacket = qPacket
+
+    def datagram_received(self, data, addr):
+        rcv_time = time.time()
+        self.logger.debug(f'Data received: \'{data}\'' \
+                          f'from \'{addr}\'' \
+                          f'at \'{rcv_time}\'')
+        datagram = (rcv_time, addr, data)
+        asyncio.ensure_future(self.datagram_handler(datagram))
+
+    async def datagram_handler(self, dgram):
+        self.loop.create_task(self.enqueue_packet(dgram))
+
+    async def enqueue_packet(self, packet):
+        if self.qPacket.full():
+            self.logger.warn(f'Incoming Packet Queue is full')
+        else:
+            await self.qPacket.put(packet)
+
+class legacyParllProtocol(legacyBcastProtocol):
+    # copy of the original VIM-PARLL receive path
+    def __init__(self, loop, logger, qPacket, srcIP):
+        super().__init__(loop, logger, qPacket)
+        self.srcIP = srcIP
+
+    def datagram_received(self, data, addr):
+        if addr[0] == self.srcIP:
+            rcv_time = time.time()
+            self.logger.debug(f'Data received: \'{data}\' from \'{addr}\'')
+            datagram = (rcv_time, addr, data)
+            asyncio.ensure_future(self.datagram_handler(datagram))
+
+    async def datagram_handler(self, dgram):
+        packet = dgram[2]
+        try:
+            pktDec = int.from_bytes(packet, "little")
+        except:
+            self.logger.debug(f'cannot convert to int')
+        self.logger.debug(f'{packet} type={type(packet)} int={pktDec}')
+        self.loop.create_task(self.enqueue_packet(dgram))
+
+def makeProtocol(service, path, loop, qPacket):
+    logger = logging.getLogger(service)
+    stats = metrics.registry(service)
+    if service == 'bcast':
+        if path == 'legacy':
+            return legacyBcastProtocol(loop, logger, qPacket)
+        return udp_server_async_bcast.AsyncUDPServerProtocol(
+            loop, logger, qPacket, stats)
+    if path == 'legacy':
+        return legacyParllProtocol(loop, logger, qPacket, SRC_ADDR[0])
+    return udp_server_async_parll.AsyncUDPServerProtocol(
+        loop, logger, qPacket, SRC_ADDR[0], stats)
+
+async def drive(service, path, data, count, burst):
+    loop = asyncio.get_running_loop()
+    if path == 'legacy':
+        qPacket = asyncio.Queue(maxsize=count)
+    else:
+        qPacket = packetQueue(capacity=count, loggerName=service)
+    protocol = makeProtocol(service, path, loop, qPacket)
+
+    async def consume():
+        for _ in range(count):
+            await qPacket.get()
+
+    consumer = asyncio.ensure_future(consume())
+    await asyncio.sleep(0)
+    t0 = time.perf_counter()
+    received = protocol.datagram_received
+    for _ in range(count // burst):
+        for _ in range(burst):
+            received(data, SRC_ADDR)
+        await asyncio.sleep(0)  # back to the loop, as after a socket read
+    await consumer
+    return (time.perf_counter() - t0) / count
+
+def loopFactories():
+    factories = [('asyncio', asyncio.new_event_loop)]
+    try:
+        import uvloop
+    except ImportError:
+        pass
+    else:
+        factories.append(('uvloop', uvloop.new_event_loop))
+    return factories
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if isinstance(argv, str):
+        argv = shlex.split(argv)
+
+    parser = argparse.ArgumentParser(sys.argv[0])
+    parser.add_argument('--count', type=int, default=50000,
+                        help='datagrams per run')
+    parser.add_argument('--burst', type=int, default=8,
+                        help='datagrams per loop iteration')
+    parser.add_argument('--photons', type=int, default=244,
+                        help='photons per zero-order packet')
+    parser.add_argument('--json', action='store_true',
+                        help='print the results as JSON')
+    opts = parser.parse_args(argv)
+    opts.count -= opts.count % opts.burst
+
+    random.seed(0)
+    data = buildPacket(1, [(random.getrandbits(16), random.getrandbits(16),
+                            random.getrandbits(16))
+                           for _ in range(opts.photons)])
+    results = []
+    for loopName, factory in loopFactories():
+        for service in ('bcast', 'parll'):
+            for path in ('legacy', 'fast'):
+                loop = factory()
+                try:
+                    perPacket = loop.run_until_complete(
+                        drive(service, path, data, opts.count, opts.burst))
+                finally:
+                    loop.close()
+                results.append({'loop': loopName, 'service': service,
+                                'path': path, 'us_per_datagram':
+                                round(perPacket * 1e6, 3)})
+                if not opts.json:
+                    print(f'{loopName:<8s} {service:<6s} {path:<7s} ' \
+                          f'{perPacket * 1e6:8.2f} us/datagram  ' \
+                          f'{1 / perPacket:10.0f} datagrams/s')
+    if opts.json:
+        print(json.dumps({'benchmark': 'bench_recv', 'bytes': len(data),
+                          'count': opts.count, 'burst': opts.burst,
+                          'results': results}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/python3
+# capture_ring.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Memory-mapped ring file of received datagrams for JHU's Rocket Lab.
+###############################################################################
+# The file is preallocated and mapped once, so capturing a datagram is a
+# struct.pack_into() and a slice copy into the page cache; nothing waits on
+# the disk. Once the ring is full the oldest datagrams are overwritten.
+#
+# Layout (little-endian):
+#   [0:64]   FILE_HEADER: magic, version, slot size, slot count, records
+#            written so far
+#   [64: ]   slotCount slots of slotSize bytes, record n in slot n % slotCount
+#            RECORD: receive time (time.time()), source IP, source port,
+#            captured length, original length; then the datagram (cut to
+#            slotSize - RECORD.size)
+#
+#   ring = captureRing('/var/tmp/vim-parll.cap', slots=16384)
+#   ring.write(rcvTime, addr, data)
+#   ...
+#   for rcvTime, addr, data in readCapture('/var/tmp/vim-parll.cap'):
+###############################################################################
+
+import os
+import mmap
+import socket
+import struct
+
+MAGIC = b'VIMCAP01'
+VERSION = 1
+FILE_HEADER = struct.Struct('<8sHxxIIQ36x')  # 64 bytes
+COUNT_OFFSET = 20  # offset of the record count in FILE_HEADER
+COUNT = struct.Struct('<Q')
+RECORD = struct.Struct('<d4sHHI')  # time, IP, port, captured, original
+SLOT_SIZE = 2048
+DEFAULT_SLOTS = 16384  # 32 MB
+
+class captureRing:
+    def __init__(self, path, slots=DEFAULT_SLOTS, slotSize=SLOT_SIZE):
+        if slotSize <= RECORD.size:
+            raise ValueError(f'slot size {slotSize} is too small')
+        self.path = path
+        self.slotCount = slots
+        self.slotSize = slotSize
+        self.maxData = slotSize - RECORD.size
+        self.count = 0
+        self.truncated = 0
+        self.lastIP = None  # the source hardly ever changes
+        self.lastPacked = None
+
+        size = FILE_HEADER.size + slots * slotSize
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            try:
+                os.posix_fallocate(fd, 0, size)
+            except (AttributeError, OSError):
+                pass  # sparse file; pages are allocated on first write
+            self.map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        # touch every page now rather than on the receive path
+        page = mmap.PAGESIZE
+        zero = bytes(page)
+        for offset in range(0, size, page):
+            self.map[offset:offset + page] = zero[:min(page, size - offset)]
+        FILE_HEADER.pack_into(self.map, 0, MAGIC, VERSION, slotSize, slots, 0)
+
+    def write(self, rcvTime, addr, data):
+        length = len(data)
+        if length > self.maxData:
+            self.truncated += 1
+            captured = self.maxData
+            data = memoryview(data)[:captured]
+        else:
+            captured = length
+        ip = addr[0]
+        if ip != self.lastIP:
+            self.lastIP = ip
+            self.lastPacked = socket.inet_aton(ip)
+        offset = FILE_HEADER.size + \
+                 (self.count % self.slotCount) * self.slotSize
+        RECORD.pack_into(self.map, offset, rcvTime, self.lastPacked,
+                         addr[1], captured, length)
+        start = offset + RECORD.size
+        self.map[start:start + captured] = data
+        self.count += 1
+        COUNT.pack_into(self.map, COUNT_OFFSET, self.count)
+
+    def close(self):
+        if self.map is not None:
+            self.map.flush()
+            self.map.close()
+            self.map = None
+
+def readCapture(path):
+    """Yield (rcvTime, (ip, port), data) from oldest to newest."""
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        magic, version, slotSize, slotCount, count = \
+            FILE_HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError(f'\'{path}\' is not a capture file')
+        for n in range(max(count - slotCount, 0), count):
+            offset = FILE_HEADER.size + (n % slotCount) * slotSize
+            rcvTime, ip, port, captured, length = \
+                RECORD.unpack_from(data, offset)
+            start = offset + RECORD.size
+            yield (rcvTime, (socket.inet_ntoa(ip), port),
+                   data[start:start + captured])
+    finally:
+        data.close()
+
+def captureInfo(path):
+    with open(path, 'rb') as f:
+        magic, version, slotSize, slotCount, count = \
+            FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f'\'{path}\' is not a capture file')
+    return {'version': version, 'slot_size': slotSize,
+            'slots': slotCount, 'written': count,
+            'available': min(count, slotCount)}
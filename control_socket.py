@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+# control_socket.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Local Unix datagram command socket for JHU's Rocket Lab.
+###############################################################################
+# Each request is one datagram holding a command line ("stats", ...); the
+# reply is one datagram of JSON. Handlers are registered per command and get
+# the remaining words as arguments:
+#
+#   ctl = controlSocket('/tmp/vim-bcast.sock')
+#   ctl.register('stats', lambda args: registry.snapshot())
+#   ctl.start(loop)
+#
+# query() is the client side, used by the --stats command line option.
+###############################################################################
+
+import os
+import json
+import logging
+import socket
+import tempfile
+
+MAX_REQUEST = 4096
+MAX_REPLY = 65536
+
+class controlSocket:
+    def __init__(self, path, loggerName='bcast'):
+        self.logger = logging.getLogger(loggerName)
+        self.path = path
+        self.handlers = {'help': lambda args: sorted(self.handlers)}
+        self.sock = None
+        self.loop = None
+
+    def register(self, command, handler):
+        self.handlers[command] = handler
+
+    def start(self, loop):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(self.path)
+        self.sock.setblocking(False)
+        self.loop = loop
+        loop.add_reader(self.sock.fileno(), self.onRequest)
+        self.logger.debug(f'Control socket bound: \'{self.path}\'')
+
+    def close(self):
+        if self.sock is not None:
+            self.loop.remove_reader(self.sock.fileno())
+            self.sock.close()
+            self.sock = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def onRequest(self):
+        try:
+            request, addr = self.sock.recvfrom(MAX_REQUEST)
+        except OSError:
+            return
+        words = request.decode('utf-8', 'replace').split()
+        reply = self.dispatch(words)
+        if not addr:
+            return  # client has no address to reply to
+        try:
+            self.sock.sendto(json.dumps(reply).encode('utf-8'), addr)
+        except OSError as e:
+            self.logger.warn(f'Control reply failed: \'{e}\'')
+
+    def dispatch(self, words):
+        if not words:
+            return {'error': 'empty command'}
+        handler = self.handlers.get(words[0])
+        if handler is None:
+            return {'error': f'unknown command \'{words[0]}\''}
+        try:
+            return {'ok': handler(words[1:])}
+        except Exception as e:
+            return {'error': f'{words[0]}: {e!r}'}
+
+def query(path, command, timeout=2.0):
+    """Send one command to a controlSocket and return the decoded reply."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    clientPath = os.path.join(tempfile.gettempdir(),
+                              f'rocketlab-ctl-{os.getpid()}.sock')
+    try:
+        if os.path.exists(clientPath):
+            os.unlink(clientPath)
+        sock.bind(clientPath)
+        sock.settimeout(timeout)
+        sock.sendto(command.encode('utf-8'), path)
+        reply, _ = sock.recvfrom(MAX_REPLY)
+        return json.loads(reply.decode('utf-8'))
+    finally:
+        sock.close()
+        if os.path.exists(clientPath):
+            os.unlink(clientPath)
@@ -0,0 +1,530 @@
+#!/usr/bin/python3
+# gpio_backend.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# GPIO backends for the shift register output (VIM-PARLL).
+###############################################################################
+# Every backend has the wiringPi-style calls GPIO_to_cRIO needs (pinMode,
+# digitalWrite, digitalRead, shiftOut) plus writePhoton(x, y), which puts one
+# photon on the 74HC595 outputs and signals SNAP_FIFO_EMPTY:
+#
+#   clock LOW, shift y, shift x, latch LOW/HIGH/LOW, outEn LOW, snapEmpty LOW
+#
+# The two halves are also separate calls for the pipelined output, which
+# shifts the next photon while the RIO is still reading the latched one:
+#   shiftPhoton(x, y) - clock LOW, shift y, shift x (outputs unchanged)
+#   presentPhoton()   - latch LOW/HIGH/LOW, outEn LOW, snapEmpty LOW
+#
+#   wiringPiGPIO - the wiringpi Python bindings (the original implementation)
+#   mmapGPIO     - memory-maps the SoC GPIO registers (/dev/gpiomem or any
+#                  file) and stores whole output words. When all photon pins
+#                  are in one bank, writePhoton() is a single pass over a
+#                  precomputed list of register words.
+#   fakeGPIO     - in-memory pins with a 74HC595 model and an emulated RIO
+#                  that acknowledges every photon, for running off-target.
+#                  With ackDelay the RIO raises SNAP_FIFO_READ that many
+#                  seconds after SNAP_FIFO_EMPTY, and counts latches that
+#                  change the outputs before it has read them. With
+#                  releaseDelay it drops SNAP_FIFO_READ that long after
+#                  SNAP_FIFO_EMPTY goes HIGH, and counts photons presented
+#                  while READ was still HIGH.
+#
+# mmapGPIO needs a register layout (JSON):
+#   {"size": 4096, "offset": 0,
+#    "banks": {"A": {"dir": 0, "out": 4, "in": 8, "dirOutput": 0}},
+#    "pins":  {"1": ["A", 0], "2": ["A", 1], ...}}
+# with byte offsets of the direction, output and input registers of each bank,
+# the direction bit value that means output, and a (bank, bit) per wiringPi
+# pin. FAKE_LAYOUT maps the VIM-PARLL pins onto one bank of a plain file;
+# gpio_layout.example.json is the same layout as a file to start from.
+###############################################################################
+
+import os
+import sys
+import abc
+import json
+import mmap
+import tempfile
+import time
+from collections import deque
+
+try:
+    import wiringpi
+except ImportError:
+    wiringpi = None
+
+LOW = 0
+HIGH = 1
+INPUT = 0
+OUTPUT = 1
+LSBFIRST = 0
+MSBFIRST = 1
+
+FAKE_LAYOUT = {
+    'size': 4096,
+    'offset': 0,
+    'banks': {'A': {'dir': 0, 'out': 4, 'in': 8, 'dirOutput': 0}},
+    'pins': {str(pin): ['A', bit] for bit, pin in
+             enumerate([1, 2, 3, 5, 6, 13, 14, 15, 16, 17, 18, 19, 20])},
+}
+
+def bitOrder(order):
+    return range(7, -1, -1) if order == MSBFIRST else range(8)
+
+class gpioBackend(abc.ABC):
+    def __init__(self):
+        self.photonPins = None
+
+    def setup(self):
+        pass
+
+    def close(self):
+        pass
+
+    @abc.abstractmethod
+    def pinMode(self, pin, mode):
+        pass
+
+    @abc.abstractmethod
+    def digitalWrite(self, pin, value):
+        pass
+
+    @abc.abstractmethod
+    def digitalRead(self, pin):
+        pass
+
+    def shiftOut(self, dataPin, clockPin, order, value):
+        for i in bitOrder(order):
+            self.digitalWrite(dataPin, (value >> i) & 1)
+            self.digitalWrite(clockPin, HIGH)
+            self.digitalWrite(clockPin, LOW)
+
+    def configurePhoton(self, inputPin, clockPin, latchPin, outEnPin,
+                        snapEmptyPin, order):
+        self.photonPins = (inputPin, clockPin, latchPin, outEnPin,
+                           snapEmptyPin, order)
+
+    def writePhoton(self, x, y):
+        self.shiftPhoton(x, y)
+        self.presentPhoton()
+
+    def shiftPhoton(self, x, y):
+        inputPin, clockPin, latchPin, outEnPin, snapEmptyPin, order = \
+            self.photonPins
+        self.digitalWrite(clockPin, LOW)
+        self.shiftOut(inputPin, clockPin, order, y)
+        self.digitalWrite(clockPin, LOW)
+        self.shiftOut(inputPin, clockPin, order, x)
+
+    def presentPhoton(self):
+        inputPin, clockPin, latchPin, outEnPin, snapEmptyPin, order = \
+            self.photonPins
+        self.digitalWrite(latchPin, LOW)
+        self.digitalWrite(latchPin, HIGH)
+        self.digitalWrite(latchPin, LOW)
+        self.digitalWrite(outEnPin, LOW)
+        self.digitalWrite(snapEmptyPin, LOW)
+
+class wiringPiGPIO(gpioBackend):
+    def __init__(self):
+        super().__init__()
+        if wiringpi is None:
+            raise ImportError('wiringpi is not installed')
+        # bind the C calls directly, these are on the per-photon path
+        self.pinMode = wiringpi.pinMode
+        self.digitalWrite = wiringpi.digitalWrite
+        self.digitalRead = wiringpi.digitalRead
+        self.shiftOut = wiringpi.shiftOut
+
+    def setup(self):
+        wiringpi.wiringPiSetup()
+
+    # replaced per instance by the wiringpi functions above
+    def pinMode(self, pin, mode):
+        wiringpi.pinMode(pin, mode)
+
+    def digitalWrite(self, pin, value):
+        wiringpi.digitalWrite(pin, value)
+
+    def digitalRead(self, pin):
+        return wiringpi.digitalRead(pin)
+
+def loadLayout(path):
+    with open(path) as f:
+        return json.load(f)
+
+def makeRegisterFile(path, layout=FAKE_LAYOUT):
+    """Create a zeroed file to stand in for the GPIO register block."""
+    with open(path, 'wb') as f:
+        f.write(bytes(layout['offset'] + layout['size']))
+
+class mmapGPIO(gpioBackend):
+    def __init__(self, path, layout):
+        super().__init__()
+        self.path = path
+        self.layout = layout
+        self.banks = layout['banks']
+        self.pins = {int(pin): (bank, bit)
+                     for pin, (bank, bit) in layout['pins'].items()}
+        self.fd = None
+        self.mm = None
+        self.regs = None
+        self.shadow = {}
+        self.photonPlan = None
+
+    def setup(self):
+        self.fd = os.open(self.path, os.O_RDWR | os.O_SYNC)
+        self.mm = mmap.mmap(self.fd, self.layout['size'], mmap.MAP_SHARED,
+                            mmap.PROT_READ | mmap.PROT_WRITE,
+                            offset=self.layout['offset'])
+        self.regs = memoryview(self.mm).cast('I')
+        for name, bank in self.banks.items():
+            self.shadow[name] = self.regs[bank['out'] // 4]
+
+    def close(self):
+        if self.regs is not None:
+            self.regs.release()
+            self.regs = None
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def pinMode(self, pin, mode):
+        name, bit = self.pins[pin]
+        bank = self.banks[name]
+        idx = bank['dir'] // 4
+        dirBit = bank['dirOutput'] if mode == OUTPUT else \
+                 1 - bank['dirOutput']
+        if dirBit:
+            self.regs[idx] |= 1 << bit
+        else:
+            self.regs[idx] &= ~(1 << bit) & 0xFFFFFFFF
+
+    def digitalWrite(self, pin, value):
+        name, bit = self.pins[pin]
+        if value:
+            word = self.shadow[name] | (1 << bit)
+        else:
+            word = self.shadow[name] & ~(1 << bit)
+        self.shadow[name] = word
+        self.regs[self.banks[name]['out'] // 4] = word
+
+    def digitalRead(self, pin):
+        name, bit = self.pins[pin]
+        return (self.regs[self.banks[name]['in'] // 4] >> bit) & 1
+
+    def configurePhoton(self, inputPin, clockPin, latchPin, outEnPin,
+                        snapEmptyPin, order):
+        super().configurePhoton(inputPin, clockPin, latchPin, outEnPin,
+                                snapEmptyPin, order)
+        banks = {self.pins[pin][0] for pin in
+                 (inputPin, clockPin, latchPin, outEnPin, snapEmptyPin)}
+        if len(banks) != 1:
+            # pins span banks, fall back to one store per digitalWrite()
+            self.photonPlan = None
+            return
+
+        bankName = banks.pop()
+        dataBit = 1 << self.pins[inputPin][1]
+        clockBit = 1 << self.pins[clockPin][1]
+
+        # data and clock words for every byte value; the data bit is set
+        # together with clock LOW, so each bit costs two stores
+        byteWords = []
+        for value in range(256):
+            words = []
+            for i in bitOrder(order):
+                data = dataBit if (value >> i) & 1 else 0
+                words.append(data)
+                words.append(data | clockBit)
+            words.append(words[-1] & ~clockBit)
+            byteWords.append(tuple(words))
+
+        self.photonPlan = (bankName,
+                           self.banks[bankName]['out'] // 4,
+                           dataBit | clockBit,
+                           1 << self.pins[latchPin][1],
+                           1 << self.pins[outEnPin][1],
+                           1 << self.pins[snapEmptyPin][1],
+                           byteWords)
+
+    def writePhoton(self, x, y):
+        plan = self.photonPlan
+        if plan is None:
+            return super().writePhoton(x, y)
+
+        bankName, idx, shiftMask, latchBit, outEnBit, emptyBit, byteWords = \
+            plan
+        regs = self.regs
+        base = self.shadow[bankName] & ~shiftMask & ~latchBit
+        for word in byteWords[y]:
+            regs[idx] = base | word
+        for word in byteWords[x]:
+            regs[idx] = base | word
+        last = base | byteWords[x][-1]
+        regs[idx] = last | latchBit
+        regs[idx] = last
+        last &= ~outEnBit
+        regs[idx] = last
+        last &= ~emptyBit
+        regs[idx] = last
+        self.shadow[bankName] = last
+
+    def shiftPhoton(self, x, y):
+        plan = self.photonPlan
+        if plan is None:
+            return super().shiftPhoton(x, y)
+
+        bankName, idx, shiftMask, latchBit, outEnBit, emptyBit, byteWords = \
+            plan
+        regs = self.regs
+        base = self.shadow[bankName] & ~shiftMask & ~latchBit
+        for word in byteWords[y]:
+            regs[idx] = base | word
+        for word in byteWords[x]:
+            regs[idx] = base | word
+        self.shadow[bankName] = base | byteWords[x][-1]
+
+    def presentPhoton(self):
+        plan = self.photonPlan
+        if plan is None:
+            return super().presentPhoton()
+
+        bankName, idx, shiftMask, latchBit, outEnBit, emptyBit, byteWords = \
+            plan
+        regs = self.regs
+        last = self.shadow[bankName]
+        regs[idx] = last | latchBit
+        regs[idx] = last
+        last &= ~outEnBit
+        regs[idx] = last
+        last &= ~emptyBit
+        regs[idx] = last
+        self.shadow[bankName] = last
+
+class fakeGPIO(gpioBackend):
+    """In-memory pins, a 74HC595 pair and a RIO that acks every photon."""
+    def __init__(self, inputPin, clockPin, latchPin, clearPin, outEnPin,
+                 snapEmptyPin, snapReadPin, autoAck=True, keep=None,
+                 ackDelay=0, releaseDelay=0):
+        super().__init__()
+        self.inputPin = inputPin
+        self.clockPin = clockPin
+        self.latchPin = latchPin
+        self.clearPin = clearPin
+        self.outEnPin = outEnPin
+        self.snapEmptyPin = snapEmptyPin
+        self.snapReadPin = snapReadPin
+        self.autoAck = autoAck
+        self.ackDelay = ackDelay  # seconds from SNAP_FIFO_EMPTY to the read
+        self.ackTime = None  # when the pending read happens
+        self.releaseDelay = releaseDelay  # seconds from EMPTY HIGH to READ LOW
+        self.releaseTime = None  # when READ drops
+        self.overwrites = 0  # photons latched over before the RIO read them
+        self.stalePresents = 0  # SNAP_FIFO_EMPTY LOW while READ still HIGH
+        self.levels = {}
+        self.modes = {}
+        self.shiftReg = 0
+        self.storageReg = 0
+        self.received = deque(maxlen=keep)  # last `keep` photons, None=all
+        self.readCount = 0
+        self.writeCount = 0
+
+    def pinMode(self, pin, mode):
+        self.modes[pin] = mode
+
+    def digitalRead(self, pin):
+        if pin == self.snapReadPin:
+            self.rioUpdate()
+        return self.levels.get(pin, LOW)
+
+    def rioUpdate(self):
+        # READ drops and pending reads that are due by now
+        now = time.perf_counter()
+        if self.releaseTime is not None and now >= self.releaseTime:
+            self.releaseTime = None
+            self.levels[self.snapReadPin] = LOW
+        if self.ackTime is not None and now >= self.ackTime:
+            self.ackTime = None
+            self.rioRead()
+
+    def digitalWrite(self, pin, value):
+        self.writeCount += 1
+        old = self.levels.get(pin, LOW)
+        self.levels[pin] = value
+        if old == value:
+            return
+
+        if pin == self.clockPin and value == HIGH:
+            self.shiftReg = ((self.shiftReg << 1) |
+                             self.levels.get(self.inputPin, LOW)) & 0xFFFF
+        elif pin == self.latchPin and value == HIGH:
+            if self.ackTime is not None:
+                self.overwrites += 1
+            self.storageReg = self.shiftReg
+        elif pin == self.clearPin and value == LOW:
+            self.shiftReg = 0
+        elif pin == self.snapEmptyPin and self.autoAck:
+            if value == LOW:
+                self.rioUpdate()
+                if self.levels.get(self.snapReadPin, LOW) == HIGH:
+                    self.stalePresents += 1
+            if value == LOW and self.ackDelay:
+                self.ackTime = time.perf_counter() + self.ackDelay
+            elif value == LOW:
+                self.rioRead()
+            else:
+                self.ackTime = None  # withdrawn before it was read
+                if not self.releaseDelay:
+                    self.levels[self.snapReadPin] = LOW
+                elif self.levels.get(self.snapReadPin, LOW) == HIGH:
+                    self.releaseTime = time.perf_counter() + \
+                                       self.releaseDelay
+
+    def rioRead(self):
+        # the RIO latches the parallel outputs and raises SNAP_FIFO_READ
+        if self.levels.get(self.outEnPin, HIGH) == LOW:
+            self.readCount += 1
+            self.received.append((self.storageReg & 0xFF,
+                                  self.storageReg >> 8))
+        self.levels[self.snapReadPin] = HIGH
+
+class _registerProbe:
+    """Wraps mmapGPIO.regs and replays output register stores as pin edges."""
+    def __init__(self, regs, backend, target):
+        self.regs = regs
+        self.target = target
+        self.outIdx = {bank['out'] // 4: name
+                       for name, bank in backend.banks.items()}
+        self.bankPins = {}
+        for pin, (name, bit) in backend.pins.items():
+            self.bankPins.setdefault(name, []).append((pin, bit))
+        self.edgePins = (target.clockPin, target.latchPin)
+
+    def __getitem__(self, idx):
+        return self.regs[idx]
+
+    def __setitem__(self, idx, word):
+        old = self.regs[idx]
+        self.regs[idx] = word
+        name = self.outIdx.get(idx)
+        if name is None:
+            return
+        changed = [(pin, (word >> bit) & 1)
+                   for pin, bit in self.bankPins[name]
+                   if ((old ^ word) >> bit) & 1]
+        # levels first, then clock/latch edges
+        changed.sort(key=lambda change: change[0] in self.edgePins)
+        for pin, level in changed:
+            self.target.digitalWrite(pin, level)
+
+def selfTest(count=2000):
+    pins = dict(inputPin=1, clockPin=2, latchPin=3, clearPin=5, outEnPin=6,
+                snapEmptyPin=14, snapReadPin=15)
+    photons = [(i & 255, (i * 7 + 3) & 255) for i in range(count)]
+
+    def runPhotons(backend, target):
+        t0 = time.perf_counter()
+        for x, y in photons:
+            backend.writePhoton(x, y)
+            backend.digitalWrite(pins['snapEmptyPin'], HIGH)
+            backend.digitalWrite(pins['outEnPin'], HIGH)
+        return time.perf_counter() - t0
+
+    def runPipelined(backend, target):
+        # shift photon N+1, let the RIO read N, release N, wait for READ to
+        # drop, latch N+1
+        backend.shiftPhoton(*photons[0])
+        backend.presentPhoton()
+        for x, y in photons[1:]:
+            backend.shiftPhoton(x, y)
+            while not target.digitalRead(pins['snapReadPin']):
+                pass
+            backend.digitalWrite(pins['snapEmptyPin'], HIGH)
+            backend.digitalWrite(pins['outEnPin'], HIGH)
+            while target.digitalRead(pins['snapReadPin']):
+                pass
+            backend.presentPhoton()
+        while not target.digitalRead(pins['snapReadPin']):
+            pass
+        backend.digitalWrite(pins['snapEmptyPin'], HIGH)
+        backend.digitalWrite(pins['outEnPin'], HIGH)
+
+    def check(target, name):
+        # explicit raises, so the checks also run under python -O
+        if list(target.received) != photons:
+            raise AssertionError(f'{name}: RIO received {target.readCount} ' \
+                                 f'photons, not the {count} sent in order')
+        if target.overwrites:
+            raise AssertionError(f'{name}: {target.overwrites} photons ' \
+                                 f'latched over before the RIO read them')
+        if target.stalePresents:
+            raise AssertionError(f'{name}: {target.stalePresents} photons ' \
+                                 f'presented before SNAP_FIFO_READ dropped')
+
+    # reference: the wiringPi call sequence on the fake pins
+    fake = fakeGPIO(**pins)
+    fake.configurePhoton(pins['inputPin'], pins['clockPin'], pins['latchPin'],
+                         pins['outEnPin'], pins['snapEmptyPin'], MSBFIRST)
+    for pin in ('clearPin', 'outEnPin', 'snapEmptyPin'):
+        fake.digitalWrite(pins[pin], HIGH)
+    fakeTime = runPhotons(fake, fake)
+    check(fake, 'fakeGPIO')
+
+    # pipelined order, with a RIO that reads after the next shift
+    piped = fakeGPIO(**pins, ackDelay=1e-9, releaseDelay=20e-6)
+    piped.configurePhoton(pins['inputPin'], pins['clockPin'],
+                          pins['latchPin'], pins['outEnPin'],
+                          pins['snapEmptyPin'], MSBFIRST)
+    for pin in ('clearPin', 'outEnPin', 'snapEmptyPin'):
+        piped.digitalWrite(pins[pin], HIGH)
+    runPipelined(piped, piped)
+    check(piped, 'fakeGPIO pipelined')
+
+    # mmap backend on a file-backed register map, replayed into a fake
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'gpiomem')
+        makeRegisterFile(path)
+        backend = mmapGPIO(path, FAKE_LAYOUT)
+        backend.setup()
+        try:
+            for pin in pins.values():
+                backend.pinMode(pin, OUTPUT)
+            backend.configurePhoton(pins['inputPin'], pins['clockPin'],
+                                    pins['latchPin'], pins['outEnPin'],
+                                    pins['snapEmptyPin'], MSBFIRST)
+            backend.digitalWrite(pins['clearPin'], HIGH)
+            backend.digitalWrite(pins['outEnPin'], HIGH)
+            backend.digitalWrite(pins['snapEmptyPin'], HIGH)
+            mmapTime = runPhotons(backend, None)
+
+            probed = fakeGPIO(**pins)
+            probed.levels.update({pins['clearPin']: HIGH,
+                                  pins['outEnPin']: HIGH,
+                                  pins['snapEmptyPin']: HIGH})
+            backend.regs = _registerProbe(backend.regs, backend, probed)
+            runPhotons(backend, probed)
+            check(probed, 'mmapGPIO')
+
+            probed = fakeGPIO(**pins, ackDelay=1e-9, releaseDelay=20e-6)
+            probed.levels.update({pins['clearPin']: HIGH,
+                                  pins['outEnPin']: HIGH,
+                                  pins['snapEmptyPin']: HIGH})
+            backend.regs.target = probed
+            runPipelined(backend, probed)
+            backend.regs = backend.regs.regs
+            check(probed, 'mmapGPIO pipelined')
+        finally:
+            backend.close()
+
+    print(f'{count} photons OK (serial and pipelined)  ' \
+          f'fake: {1e6 * fakeTime / count:.2f} us/photon  ' \
+          f'mmap: {1e6 * mmapTime / count:.2f} us/photon')
+
+if __name__ == "__main__":
+    selfTest(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,136 @@
+#!/usr/bin/python3
+# gpio_edge.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Edge events for the SNAP_FIFO_READ handshake (VIM-PARLL).
+###############################################################################
+# Instead of polling SNAP_FIFO_READ, the shift register waits for its rising
+# edge:
+#   sysfsEdge - /sys/class/gpio/gpioN/value with edge=rising, waited on with
+#               poll(POLLPRI). Blocking only (output thread mode): sysfs value
+#               files always look readable to the event loop.
+#   gpiodEdge - a libgpiod (v1 bindings) line event fd. Readable when an edge
+#               is queued, so it can also be registered with the event loop.
+#
+# Usage per photon: drain() stale events, assert SNAP_FIFO_EMPTY, then
+# read() the level and only wait for an edge if the RIO has not already
+# answered.
+###############################################################################
+
+import os
+import select
+import time
+
+from metrics import latencyHistogram
+
+try:
+    import gpiod
+except ImportError:
+    gpiod = None
+
+SYSFS_GPIO = '/sys/class/gpio'
+
+class handshakeStats:
+    """SNAP_FIFO_READ round trip latency histogram and timeout count."""
+    def __init__(self, hist=None):
+        self.hist = hist if hist is not None else latencyHistogram()
+        self.timeouts = 0
+
+    def record(self, elapsed):
+        self.hist.record(elapsed)
+
+    def timeout(self):
+        self.timeouts += 1
+
+    def summary(self):
+        snap = self.hist.snapshot()
+        return f'handshakes={snap["count"]} timeouts={self.timeouts} ' \
+               f'mean={snap["mean_us"]:.1f}us p99={snap["p99_us"]:.1f}us ' \
+               f'max={snap["max_us"]:.1f}us'
+
+class sysfsEdge:
+    pollable = False  # cannot be registered with the event loop
+
+    def __init__(self, gpioNum, edge='rising'):
+        self.gpioNum = gpioNum
+        path = os.path.join(SYSFS_GPIO, f'gpio{gpioNum}')
+        if not os.path.exists(path):
+            with open(os.path.join(SYSFS_GPIO, 'export'), 'w') as f:
+                f.write(str(gpioNum))
+        with open(os.path.join(path, 'direction'), 'w') as f:
+            f.write('in')
+        with open(os.path.join(path, 'edge'), 'w') as f:
+            f.write(edge)
+        self.fd = os.open(os.path.join(path, 'value'), os.O_RDONLY)
+        self.poller = select.poll()
+        self.poller.register(self.fd, select.POLLPRI | select.POLLERR)
+        self.drain()
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def read(self):
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        return 1 if os.read(self.fd, 2)[:1] == b'1' else 0
+
+    def drain(self):
+        # reading the value clears the pending edge notification
+        self.read()
+
+    def wait(self, timeout=None):
+        """Block until an edge or timeout (seconds); True on an edge."""
+        ms = -1 if timeout is None else max(int(timeout * 1000), 0)
+        if self.poller.poll(ms):
+            self.drain()
+            return True
+        return False
+
+class gpiodEdge:
+    pollable = True
+
+    def __init__(self, chip, line, consumer='vim-parll'):
+        if gpiod is None:
+            raise ImportError('gpiod is not installed')
+        self.chip = gpiod.Chip(chip)
+        self.line = self.chip.get_line(line)
+        self.line.request(consumer=consumer,
+                          type=gpiod.LINE_REQ_EV_RISING_EDGE)
+        self.fd = self.line.event_get_fd()
+
+    def close(self):
+        if self.line is not None:
+            self.line.release()
+            self.chip.close()
+            self.line = None
+
+    def fileno(self):
+        return self.fd
+
+    def read(self):
+        return self.line.get_value()
+
+    def drain(self):
+        while select.select([self.fd], [], [], 0)[0]:
+            self.line.event_read()
+
+    def wait(self, timeout=None):
+        if select.select([self.fd], [], [], timeout)[0]:
+            self.drain()
+            return True
+        return False
+
+def waitForLevel(edge, timeout=None):
+    """Wait until the line reads HIGH; False on timeout."""
+    deadline = None if timeout is None else time.perf_counter() + timeout
+    while not edge.read():
+        remaining = None
+        if deadline is not None:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return False
+        edge.wait(remaining)
+    return True
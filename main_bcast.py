@@ -9,16 +9,48 @@
 ###############################################################################
 
 import sys
+import startup_profile
+
+profile = startup_profile.getProfile('bcast')
+IFACE = 'eth0'
+EARLY_SOCKET = None
+if __name__ == "__main__":
+    # --fastStart: bind the UDP socket before the slow imports below; the
+    # kernel buffers the early packets until the event loop reads them
+    EARLY_SOCKET = startup_profile.earlyBind(sys.argv[1:], 'bcast',
+                                             iface=IFACE)
+
+profile.begin('imports')
 import asyncio
 import netifaces
 import logging
 import argparse
 import shlex
+import json
 
+import mmsg_io
+import arp_announcer
+import metrics
+import control_socket
+import capture_ring
+import queue_policy
+import packet_trace
+import tunables
+import rt_profile
+import bcast_forwarder
 from udp_server_async_bcast import AsyncUDPServer
-from packet_handler_bcast import packetHandler
+from packet_handler_bcast import packetHandler, ARPING_TIME
+from bcast_forwarder import parseDestination
+
+try:
+    import signal
+except ImportError:
+    signal = None
+profile.end('imports')
 
 DELAY = 2000
+CTL_SOCKET = '/tmp/vim-bcast.sock'
+TRACE_FILE = '/tmp/vim-bcast-trace.jsonl'
 
 def custom_except_hook(loop, context):
     logger = logging.getLogger('bcast')
@@ -27,7 +59,89 @@ def custom_except_hook(loop, context):
     if repr(context['exception']) == 'SystemExit()':
         logger.debug('Exiting Program...')
 
-async def runBCAST(loop, opts):
+def networkDefaults(localIP):
+    """(broadcast address, detector address) for the network we are on."""
+    if localIP[:3] == '192':
+        return '192.168.1.255', '192.168.1.10'  # rocket network
+    if localIP[:3] == '172':
+        return '172.16.15.255', '172.16.0.171'  # IDG-LAB, GRAY-MAC
+    # anywhere else (loopback benchmarks): no detector to announce to
+    return '127.0.0.1', '127.0.0.1'
+
+def makeCapture(opts, logger):
+    if opts.capture is None:
+        return None
+    capture = capture_ring.captureRing(opts.capture, slots=opts.captureSlots)
+    metrics.getRegistry('bcast').gauge('captured', lambda: capture.count)
+    logger.info(f'CAPTURE_FILE={opts.capture} ({opts.captureSlots} slots)')
+    return capture
+
+def registerKnobs(knobs, logger, tracer, udpServer, pktHandler):
+    queues = (udpServer.qPacket, udpServer.qXmit)
+    forwarder = pktHandler.forwarder
+
+    def setQueues(attr, value):
+        for queue in queues:
+            setattr(queue, attr, value)
+
+    def setQueueSize(size):
+        for queue in queues:
+            queue.setCapacity(size)
+
+    knobs.add('logLevel', lambda: logger.level, logger.setLevel,
+              tunables.logLevel, 'logging threshold. 10=debug, 20=info')
+    knobs.add('trace', lambda: tracer.spec, tracer.configure, str,
+              'trace sampling: off, every:N or rate:M[@point,...]')
+    knobs.add('queueSize', lambda: queues[0].capacity, setQueueSize, int,
+              'packets held by each of the packet and transmit queues',
+              minimum=1)
+    knobs.add('queuePolicy', lambda: queues[0].policy,
+              lambda policy: setQueues('policy', policy), str,
+              'queue overflow policy', choices=queue_policy.POLICIES)
+    knobs.add('maxAge', lambda: queues[0].maxAge * 1000,
+              lambda ms: setQueues('maxAge', ms / 1000), float,
+              'in milliseconds - data age limit for the deadline policy',
+              minimum=0)
+    knobs.add('ttl', lambda: forwarder.ttl, forwarder.setTTL, int,
+              'IP TTL of forwarded packets', minimum=1)
+    knobs.add('udpChecksum', lambda: 'on' if forwarder.udpChecksum else 'off',
+              lambda state: setattr(forwarder, 'udpChecksum', state == 'on'),
+              str, 'UDP checksums of forwarded packets',
+              choices=('on', 'off'))
+
+    announcer = pktHandler.announcer
+    if announcer is not None:
+        # picked up by the announcer when its current sleep ends
+        knobs.add('arpIdle', lambda: announcer.idleTime,
+                  lambda s: setattr(announcer, 'idleTime', s), float,
+                  'in seconds - idle time before gratuitous ARPs start',
+                  minimum=0)
+        knobs.add('arpInterval', lambda: announcer.interval,
+                  lambda s: setattr(announcer, 'interval', s), float,
+                  'in seconds - first interval between idle ARPs',
+                  minimum=0.001)
+        knobs.add('arpBackoff', lambda: announcer.backoff,
+                  lambda factor: setattr(announcer, 'backoff', factor),
+                  float, 'idle ARP interval multiplier', minimum=1)
+        knobs.add('arpMaxInterval', lambda: announcer.maxInterval,
+                  lambda s: setattr(announcer, 'maxInterval', s), float,
+                  'in seconds - longest interval between idle ARPs',
+                  minimum=0.001)
+
+def newEventLoop(kind):
+    if kind == 'uvloop':
+        try:
+            import uvloop
+        except ImportError:
+            logging.getLogger('bcast').warn('uvloop is not installed, ' \
+                                             'using the asyncio event loop')
+        else:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    return loop
+
+async def runBCAST(loop, opts, sock=None):
     logging.basicConfig(datefmt = "%Y-%m-%d %H:%M:%S",
                         format = '%(asctime)s.%(msecs)03dZ ' \
                                  '%(name)-10s %(levelno)s ' \
@@ -37,31 +151,117 @@ async def runBCAST(loop, opts):
     logger.setLevel(opts.logLevel)
     logger.info('~~~~~~starting log~~~~~~')
 
+    rt = None
+    if opts.rt:
+        rt = rt_profile.rtProfile('bcast', rt_profile.parseCPUs(opts.rtCPUs),
+                                  opts.rtPriority, gcIdle=opts.gcIdle)
+        rt.apply()
+
+    profile.begin('interface')
     try:
-        localIP = netifaces.ifaddresses('eth0')[netifaces.AF_INET][0]['addr']
+        localIP = netifaces.ifaddresses(IFACE)[netifaces.AF_INET][0]['addr']
     except:
         localIP = '192.168.1.100'
+    profile.end('interface')
+    if opts.localIP is not None:
+        localIP = opts.localIP
     
-    if localIP[:3] == '192':
-        bcastIP = "192.168.1.255"
-    elif localIP[:3] == '172':
-        bcastIP = "172.16.15.255"
+    bcastIP, srcIP = networkDefaults(localIP)
+    if opts.bcastIP is not None:
+        bcastIP = opts.bcastIP
     
-    bcastPort = 60000
+    bcastPort = opts.bcastPort or opts.port
+    if opts.dest:
+        destinations = [parseDestination(spec, bcastPort)
+                        for spec in opts.dest]
+    else:
+        destinations = [(bcastIP, bcastPort)]
 
     logger.info(f'VIM-BCAST_IP_ADDRESS={localIP}')
-    logger.info(f'UDP_BROADCAST_ADDRESS={bcastIP}')
-    logger.info(f'BROADCAST_PORT={bcastPort}')
+    logger.info(f'SRC_IP_ADDRESS={srcIP}')
+    logger.info('DESTINATIONS=' +
+                ' '.join(f'{ip}:{port}' for ip, port in destinations))
+    logger.info(f'TTL={opts.ttl} MTU={opts.mtu} ' \
+                f'UDP_CHECKSUM={opts.udpChecksum}')
+    logger.info(f'EVENT_LOOP={type(loop).__module__}.{type(loop).__name__}')
+    logger.info(f'QUEUE_POLICY={opts.queuePolicy} ({opts.queueSize} packets)')
 
-    udpServer = AsyncUDPServer(loop, localIP, bcastPort)
-    pktHandler = packetHandler(qPacket=udpServer.qPacket,
-                               qXmit=udpServer.qXmit,
-                               bcastIP=bcastIP,
-                               bcastPort=bcastPort)
+    tracer = packet_trace.getTracer('bcast')
+    tracer.setCapacity(opts.traceSize)
+    tracer.configure(opts.trace)
+    if signal is not None:
+        # kill -USR1 <pid> dumps the trace ring to --traceFile
+        loop.add_signal_handler(signal.SIGUSR1, tracer.dumpFile,
+                                opts.traceFile)
+    logger.info(f'TRACE={opts.trace}')
 
-    await asyncio.gather(udpServer.start_server(), 
-                         pktHandler.start(),
-                         )
+    capture = makeCapture(opts, logger)
+    udpServer = AsyncUDPServer(loop, localIP, opts.port, capture=capture,
+                               queueSize=opts.queueSize,
+                               queuePolicy=opts.queuePolicy,
+                               maxAge=opts.maxAge / 1000,
+                               timestamps=opts.rxTimestamps)
+    logger.info(f'RX_TIMESTAMPS={"kernel" if opts.rxTimestamps else "loop"}')
+    with profile.phase('handler'):
+        pktHandler = packetHandler(qPacket=udpServer.qPacket,
+                                   qXmit=udpServer.qXmit,
+                                   destinations=destinations,
+                                   localIP=localIP,
+                                   srcIP=srcIP,
+                                   arpIdleTime=opts.arpIdle,
+                                   arpInterval=opts.arpInterval,
+                                   arpBackoff=opts.arpBackoff,
+                                   arpMaxInterval=opts.arpMaxInterval,
+                                   ttl=opts.ttl,
+                                   mtu=opts.mtu,
+                                   udpChecksum=opts.udpChecksum == 'on',
+                                   ipId=opts.ipId)
+
+    ctlSocket = control_socket.controlSocket(opts.ctlSocket, 'bcast')
+    ctlSocket.register('stats',
+                       lambda args: metrics.getRegistry('bcast').snapshot())
+    ctlSocket.register('reset',
+                       lambda args: metrics.getRegistry('bcast').reset())
+    ctlSocket.register('trace',
+                       lambda args: tracer.command(args, opts.traceFile))
+    knobs = tunables.getTunables('bcast')
+    registerKnobs(knobs, logger, tracer, udpServer, pktHandler)
+    knobs.register(ctlSocket)
+    ctlSocket.start(loop)
+
+    stats = metrics.getRegistry('bcast')
+    stats.gauge('startup', profile.summary)
+    rxPackets = stats.counter('rx_packets')
+    watchFirst = profile.watchFirst({
+        'first_rx': lambda: rxPackets.value,
+        'first_forward': lambda: pktHandler.forwarder.sentCount})
+
+    ioMode = opts.ioMode
+    if ioMode == 'batch' and not mmsg_io.available():
+        logger.warn('recvmmsg/sendmmsg not available, using packet I/O')
+        ioMode = 'packet'
+    logger.info(f'IO_MODE={ioMode}')
+
+    tasks = [pktHandler.start(),
+             pktHandler.idleAnnounce(),
+             watchFirst,
+             ]
+    if ioMode == 'batch':
+        pktHandler.forwarder.enableBatch(opts.batchSize, opts.bufSize)
+        with profile.phase('bind'):
+            await udpServer.start_batch_server(pktHandler.handleBatch,
+                                               batchSize=opts.batchSize,
+                                               bufSize=opts.bufSize,
+                                               sock=sock)
+        tasks.append(udpServer.logBatchStats())
+    else:
+        with profile.phase('bind'):
+            await udpServer.start_server(sock=sock)
+    if rt is not None:
+        rt.freezeGC()
+        tasks.append(rt.collectIdle(lambda: rxPackets.value))
+    profile.mark('ready')
+    await asyncio.gather(*tasks)
 
 def main(argv=None):
     if argv is None:
@@ -72,11 +272,119 @@ def main(argv=None):
     parser = argparse.ArgumentParser(sys.argv[0])
     parser.add_argument('--logLevel', type=int, default=logging.INFO,
                         help='logging threshold. 10=debug, 20=info, 30=warn')
+    parser.add_argument('--localIP', type=str, default=None,
+                        help='address to receive on (default: eth0 address)')
+    parser.add_argument('--port', type=int, default=60000,
+                        help='UDP port to receive on')
+    parser.add_argument('--bcastIP', type=str, default=None,
+                        help='address to forward to (default: by network)')
+    parser.add_argument('--bcastPort', type=int, default=None,
+                        help='UDP port to forward to (default: --port)')
+    parser.add_argument('--dest', type=str, action='append', default=[],
+                        help='IP[:PORT] to forward to (broadcast, unicast ' \
+                             'or multicast), repeat for several; replaces ' \
+                             '--bcastIP (PORT default: --bcastPort)')
+    parser.add_argument('--io-mode', dest='ioMode', type=str,
+                        choices=['packet', 'batch'], default='packet',
+                        help='packet: one datagram per wakeup, ' \
+                             'batch: recvmmsg/sendmmsg')
+    parser.add_argument('--batchSize', type=int, default=mmsg_io.DEFAULT_BATCH,
+                        help='max datagrams per recvmmsg/sendmmsg call')
+    parser.add_argument('--bufSize', type=int,
+                        default=mmsg_io.DEFAULT_BUF_SIZE,
+                        help='batch mode: largest datagram received whole')
+    parser.add_argument('--ttl', type=int, default=bcast_forwarder.IP_TTL,
+                        help='IP TTL of the forwarded packets')
+    parser.add_argument('--ipId', type=int, default=1,
+                        help='first IP ID (1-65535, 0=1); incremented per ' \
+                             'packet, skipping 0')
+    parser.add_argument('--mtu', type=int, default=bcast_forwarder.MTU,
+                        help='larger packets are sent as IP fragments')
+    parser.add_argument('--udpChecksum', type=str, default='on',
+                        choices=['on', 'off'],
+                        help='compute the UDP checksum (off: send 0)')
+    parser.add_argument('--arpIdle', type=float, default=ARPING_TIME,
+                        help='in seconds - idle time before ARP announcing')
+    parser.add_argument('--arpInterval', type=float,
+                        default=arp_announcer.INTERVAL,
+                        help='in seconds - first interval between ARPs')
+    parser.add_argument('--arpBackoff', type=float,
+                        default=arp_announcer.BACKOFF,
+                        help='ARP interval multiplier while idle')
+    parser.add_argument('--arpMaxInterval', type=float,
+                        default=arp_announcer.MAX_INTERVAL,
+                        help='in seconds - longest interval between ARPs')
+    parser.add_argument('--loop', type=str, default='asyncio',
+                        choices=['asyncio', 'uvloop'],
+                        help='event loop implementation')
+    parser.add_argument('--queueSize', type=int,
+                        default=queue_policy.PACKET_CAPACITY,
+                        help='packets held by the incoming packet queue')
+    parser.add_argument('--queuePolicy', type=str,
+                        default=queue_policy.DROP_NEWEST,
+                        choices=queue_policy.POLICIES,
+                        help='packet queue overflow policy')
+    parser.add_argument('--maxAge', type=float,
+                        default=queue_policy.MAX_AGE * 1000,
+                        help='in milliseconds - data age limit for the ' \
+                             'deadline policy')
+    parser.add_argument('--capture', type=str, default=None,
+                        help='record received datagrams to this ring file')
+    parser.add_argument('--captureSlots', type=int,
+                        default=capture_ring.DEFAULT_SLOTS,
+                        help='datagrams kept in the --capture ring file')
+    parser.add_argument('--rxTimestamps', action='store_true',
+                        help='kernel receive timestamps (SO_TIMESTAMPNS), ' \
+                             'so latencies include socket buffer queuing')
+    parser.add_argument('--rt', action='store_true',
+                        help='real-time profile: CPU pinning, SCHED_FIFO, ' \
+                             'mlockall and idle-time GC')
+    parser.add_argument('--rtCPUs', type=str, default='3',
+                        help='with --rt, the core for the event loop')
+    parser.add_argument('--rtPriority', type=int, default=rt_profile.PRIORITY,
+                        help='SCHED_FIFO priority with --rt, 0=leave the ' \
+                             'scheduler alone')
+    parser.add_argument('--gcIdle', type=float, default=rt_profile.GC_IDLE,
+                        help='in seconds - time without packets before a ' \
+                             'garbage collection with --rt')
+    parser.add_argument('--ctlSocket', type=str, default=CTL_SOCKET,
+                        help='Unix socket for stats/control commands')
+    parser.add_argument('--stats', action='store_true',
+                        help='print the stats of the running service and exit')
+    parser.add_argument('--ctl', type=str, default=None,
+                        help='send a command to the running service, ' \
+                             'print the reply and exit (e.g. "trace dump")')
+    parser.add_argument('--trace', type=str, default='off',
+                        help='trace sampling: off, every:N or rate:M, ' \
+                             'optionally @point,point')
+    parser.add_argument('--traceSize', type=int,
+                        default=packet_trace.TRACE_CAPACITY,
+                        help='trace records kept in memory')
+    parser.add_argument('--traceFile', type=str, default=TRACE_FILE,
+                        help='file the trace ring is dumped to (SIGUSR1)')
+    parser.add_argument('--fastStart', action='store_true',
+                        help='bind the UDP socket before the slow imports ' \
+                             'and initialization, buffering early packets')
+    parser.add_argument('--fastStartBuffer', type=int,
+                        default=startup_profile.EARLY_RCVBUF,
+                        help='fast start socket receive buffer, in bytes')
 
     opts = parser.parse_args(argv)
-    loop = asyncio.get_event_loop()
+    if opts.stats or opts.ctl is not None:
+        command = 'stats' if opts.stats else opts.ctl
+        try:
+            reply = control_socket.query(opts.ctlSocket, command)
+        except OSError as e:
+            sys.exit(f'service not running on {opts.ctlSocket}: {e}')
+        print(json.dumps(reply, indent=2))
+        return
+
+    sock = EARLY_SOCKET
+    if sock is None:
+        sock = startup_profile.earlyBind(argv, 'bcast', opts.port, IFACE)
+    loop = newEventLoop(opts.loop)
     loop.set_exception_handler(custom_except_hook)
-    loop.run_until_complete(runBCAST(loop, opts))
+    loop.run_until_complete(runBCAST(loop, opts, sock))
     try:
         loop.run_forever()
     except KeyboardInterrupt:
@@ -9,20 +9,45 @@
 ###############################################################################
 
 import sys
+import startup_profile
+
+profile = startup_profile.getProfile('parll')
+EARLY_SOCKET = None
+if __name__ == "__main__":
+    # --fastStart: bind the UDP socket before the slow imports below; the
+    # kernel buffers the early packets until the event loop reads them
+    EARLY_SOCKET = startup_profile.earlyBind(sys.argv[1:], 'parll')
+
+profile.begin('imports')
 import asyncio
 import netifaces
 import logging
 import argparse
 import shlex
-import wiringpi as gpio
+import json
 
+import metrics
+import control_socket
+import capture_ring
+import queue_policy
+import packet_trace
+import tunables
+import rt_profile
+import gpio_backend
+import gpio_edge
 from udp_server_async_parll import AsyncUDPServer
 from shift_register import GPIO_to_cRIO
 from packet_handler_parll import packetHandler
+from photon_fifo import PHOTON_CAPACITY
+from photon_ring import photonRing
+from output_engine import threadedOutput
+from photon_image import photonImage, WINDOW as IMAGE_WINDOW
+from photon_decimator import photonDecimator, MODES as DECIMATE_MODES, \
+                             HEADROOM
 
 #       IDX |  0    1    2    3    4    5    6    7    8    9   10   11   12
 #      PHYS |  6    7    8   15   16   29   30   31   32   33   35   37   39
-#PIN_LIST = [470, 471, 472, 506, 505, 423, 422, 425, 424, 507, 477, 421, 462]
+SYSFS_PIN_LIST = [470, 471, 472, 506, 505, 423, 422, 425, 424, 507, 477, 421, 462]
 PIN_LIST  = [  1,   2,   3,   5,   6,  13,  14,  15,  16,  17,  18,  19,  20]
 
 SHIFTREG_INPUT_PIN = PIN_LIST[0]
@@ -34,8 +59,18 @@ SHIFTREG_OUTEN_PIN = PIN_LIST[4]
 SNAP_FIFO_FULL_PIN = PIN_LIST[5]
 SNAP_FIFO_EMPTY_PIN = PIN_LIST[6]
 SNAP_FIFO_READ_PIN = PIN_LIST[7]
+SNAP_FIFO_READ_SYSFS = SYSFS_PIN_LIST[7]
+
+try:
+    import signal
+except ImportError:
+    signal = None
+profile.end('imports')
 
 DELAY = 2000
+CTL_SOCKET = '/tmp/vim-parll.sock'
+TRACE_FILE = '/tmp/vim-parll-trace.jsonl'
+FAKE_KEEP = 1024  # photons remembered by --gpio fake
 
 def custom_except_hook(loop, context):
     logger = logging.getLogger('parll')
@@ -44,7 +79,94 @@ def custom_except_hook(loop, context):
     if repr(context['exception']) == 'SystemExit()':
         logger.debug('Exiting Program...')
 
-async def runFODO(loop, opts):
+def makeGPIO(opts):
+    if opts.gpio == 'fake':
+        # stand-in 74HC595 and RIO, for benchmarks without the hardware
+        return gpio_backend.fakeGPIO(SHIFTREG_INPUT_PIN, SHIFTREG_CLOCK_PIN,
+                                     SHIFTREG_LATCH_PIN, SHIFTREG_CLEAR_PIN,
+                                     SHIFTREG_OUTEN_PIN, SNAP_FIFO_EMPTY_PIN,
+                                     SNAP_FIFO_READ_PIN, keep=FAKE_KEEP)
+    if opts.gpio == 'mmap':
+        return gpio_backend.mmapGPIO(opts.gpioDevice,
+                                     gpio_backend.loadLayout(opts.gpioLayout))
+    return gpio_backend.wiringPiGPIO()
+
+def makeEdge(opts):
+    if opts.edge == 'sysfs':
+        return gpio_edge.sysfsEdge(SNAP_FIFO_READ_SYSFS)
+    if opts.edge == 'gpiod':
+        return gpio_edge.gpiodEdge(opts.edgeChip, opts.edgeLine)
+    return None
+
+def makeCapture(opts, logger):
+    if opts.capture is None:
+        return None
+    capture = capture_ring.captureRing(opts.capture, slots=opts.captureSlots)
+    metrics.getRegistry('parll').gauge('captured', lambda: capture.count)
+    logger.info(f'CAPTURE_FILE={opts.capture} ({opts.captureSlots} slots)')
+    return capture
+
+def registerKnobs(knobs, logger, tracer, udpServer, shiftReg, decimator,
+                  opts):
+    qPacket = udpServer.qPacket
+    qFIFO = udpServer.qFIFO
+
+    def setMaxAge(ms):
+        qPacket.maxAge = qFIFO.maxAge = ms / 1000
+
+    knobs.add('logLevel', lambda: logger.level, logger.setLevel,
+              tunables.logLevel, 'logging threshold. 10=debug, 20=info')
+    knobs.add('trace', lambda: tracer.spec, tracer.configure, str,
+              'trace sampling: off, every:N or rate:M[@point,...]')
+    knobs.add('queueSize', lambda: qPacket.capacity, qPacket.setCapacity,
+              int, 'packets held by the incoming packet queue', minimum=1)
+    knobs.add('queuePolicy', lambda: qPacket.policy,
+              lambda policy: setattr(qPacket, 'policy', policy), str,
+              'packet queue overflow policy', choices=queue_policy.POLICIES)
+    knobs.add('maxAge', lambda: qPacket.maxAge * 1000, setMaxAge, float,
+              'in milliseconds - data age limit for the deadline policy',
+              minimum=0)
+    if opts.outputMode == 'async':
+        # the thread mode ring is preallocated, its size is fixed
+        knobs.add('fifoPhotons', lambda: qFIFO.capacity,
+                  lambda photons: setattr(qFIFO, 'capacity', photons), int,
+                  'photon FIFO capacity, in photons', minimum=1)
+        knobs.add('fifoPolicy', lambda: qFIFO.policy,
+                  lambda policy: setattr(qFIFO, 'policy', policy), str,
+                  'photon FIFO overflow policy',
+                  choices=queue_policy.POLICIES)
+    knobs.add('tickRate', lambda: shiftReg.clockTime * 1000,
+              lambda ms: setattr(shiftReg, 'clockTime', ms / 1000), float,
+              'in milliseconds - minimum time between photons shifted out',
+              minimum=0)
+    knobs.add('handshakeTimeout', lambda: shiftReg.handshakeTimeout or 0,
+              lambda s: setattr(shiftReg, 'handshakeTimeout', s or None),
+              float, 'in seconds - SNAP_FIFO_READ timeout, 0=none',
+              minimum=0)
+    knobs.add('pollMaxTime', lambda: shiftReg.pollMaxTime * 1000,
+              lambda ms: setattr(shiftReg, 'pollMaxTime', ms / 1000), float,
+              'in milliseconds - longest sleep between SNAP_FIFO_READ ' \
+              'polls', minimum=0.001)
+    if decimator is not None:
+        knobs.add('decimateHeadroom', lambda: decimator.headroom,
+                  lambda headroom: setattr(decimator, 'headroom', headroom),
+                  float, 'fraction of the measured output rate to aim for',
+                  minimum=0.01)
+
+def newEventLoop(kind):
+    if kind == 'uvloop':
+        try:
+            import uvloop
+        except ImportError:
+            logging.getLogger('parll').warn('uvloop is not installed, ' \
+                                             'using the asyncio event loop')
+        else:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    return loop
+
+async def runFODO(loop, opts, sock=None):
     logging.basicConfig(datefmt = "%Y-%m-%d %H:%M:%S",
                         format = '%(asctime)s.%(msecs)03dZ ' \
                                 '%(name)-10s %(levelno)s ' \
@@ -54,27 +176,84 @@ async def runFODO(loop, opts):
     logger.setLevel(opts.logLevel)
     logger.debug('~~~~~~starting log~~~~~~')
 
+    rt = None
+    if opts.rt:
+        rt = rt_profile.rtProfile('parll', rt_profile.parseCPUs(opts.rtCPUs),
+                                  opts.rtPriority, gcIdle=opts.gcIdle)
+        rt.apply()
+
+    profile.begin('interface')
     try:
         localIP = netifaces.ifaddresses('eth0')[netifaces.AF_INET][0]['addr']
     except:
         localIP = '192.168.1.200'
+    profile.end('interface')
 
     if localIP[:3] == '192':
         srcIP = "192.168.1.10"  # Zero-Order Detector
     elif localIP[:3] == '172':
         srcIP = "172.16.0.171"  # GRAY-MAC on IDG_LAB
+    if opts.srcIP is not None:
+        srcIP = opts.srcIP
 
-    bcastPort = 60000
+    bcastPort = opts.port
 
     logger.info(f'VIM-PARLL_IP_ADDRESS={localIP}')
     logger.info(f'SRC_IP_ADDRESS={srcIP}')
     logger.info(f'BROADCAST_PORT={bcastPort}')
+    logger.info(f'EVENT_LOOP={type(loop).__module__}.{type(loop).__name__}')
+    logger.info(f'QUEUE_POLICY={opts.queuePolicy} ({opts.queueSize} packets)')
     
-    udpServer = AsyncUDPServer(loop, '', bcastPort, srcIP)
+    tracer = packet_trace.getTracer('parll')
+    tracer.setCapacity(opts.traceSize)
+    tracer.configure(opts.trace)
+    if signal is not None:
+        # kill -USR1 <pid> dumps the trace ring to --traceFile
+        loop.add_signal_handler(signal.SIGUSR1, tracer.dumpFile,
+                                opts.traceFile)
+    logger.info(f'TRACE={opts.trace}')
+
+    capture = makeCapture(opts, logger)
+    udpServer = AsyncUDPServer(loop, '', bcastPort, srcIP,
+                               fifoPhotons=opts.fifoPhotons,
+                               capture=capture,
+                               queueSize=opts.queueSize,
+                               queuePolicy=opts.queuePolicy,
+                               fifoPolicy=opts.fifoPolicy,
+                               maxAge=opts.maxAge / 1000,
+                               timestamps=opts.rxTimestamps)
+    logger.info(f'RX_TIMESTAMPS={"kernel" if opts.rxTimestamps else "loop"}')
     
+    # thread output mode: the handler feeds a ring read by the output thread
+    if opts.outputMode == 'thread':
+        photonQueue = photonRing(opts.fifoPhotons)
+    else:
+        photonQueue = udpServer.qFIFO
+    logger.info(f'OUTPUT_MODE={opts.outputMode}' \
+                f'{" (pipelined)" if opts.pipeline else ""}')
+
+    decimator = None
+    if opts.decimate != 'off':
+        photonsOut = metrics.getRegistry('parll').counter('photons_out')
+        decimator = photonDecimator(opts.decimate,
+                                    outputCount=lambda: photonsOut.value,
+                                    outputQueue=photonQueue,
+                                    headroom=opts.decimateHeadroom)
+    logger.info(f'DECIMATION={opts.decimate}')
+
+    image = None
+    if opts.image is not None:
+        image = photonImage(opts.image, window=opts.imageWindow)
+        logger.info(f'IMAGE_FILE={opts.image} ({opts.imageWindow} s frames)')
+
     pktHandler = packetHandler(qPacket=udpServer.qPacket,
-                               qFIFO=udpServer.qFIFO)
+                               qFIFO=photonQueue,
+                               reorderWindow=opts.reorderWindow,
+                               reorderBudget=opts.reorderBudget / 1000,
+                               decimator=decimator,
+                               image=image)
     
+    profile.begin('gpio')
     shiftReg = GPIO_to_cRIO(qFIFO=udpServer.qFIFO,
                             inputPin=SHIFTREG_INPUT_PIN,
                             clockPin=SHIFTREG_CLOCK_PIN,
@@ -84,13 +263,61 @@ async def runFODO(loop, opts):
                             snapFullPin=SNAP_FIFO_FULL_PIN, 
                             snapEmptyPin=SNAP_FIFO_EMPTY_PIN, 
                             snapReadPin=SNAP_FIFO_READ_PIN,
-                            order=gpio.MSBFIRST,
-                            clockTime=opts.tickRate)
+                            order=gpio_backend.MSBFIRST,
+                            clockTime=opts.tickRate / 1000,
+                            gpio=makeGPIO(opts),
+                            edge=makeEdge(opts),
+                            handshakeTimeout=opts.handshakeTimeout or None,
+                            pipelined=opts.pipeline)
+    profile.end('gpio')
+
+    stats = metrics.getRegistry('parll')
+    stats.gauge('startup', profile.summary)
+    if opts.outputMode == 'thread':
+        stats.gauge('ring_photons', photonQueue.qsize)
+        stats.gauge('ring_high_water', lambda: photonQueue.highWater)
+        stats.gauge('ring_overruns', lambda: photonQueue.overruns)
+        stats.gauge('ring_dropped_photons',
+                    lambda: photonQueue.droppedPhotons)
+
+    ctlSocket = control_socket.controlSocket(opts.ctlSocket, 'parll')
+    ctlSocket.register('stats', lambda args: stats.snapshot())
+    ctlSocket.register('reset', lambda args: stats.reset())
+    ctlSocket.register('trace',
+                       lambda args: tracer.command(args, opts.traceFile))
+    knobs = tunables.getTunables('parll')
+    registerKnobs(knobs, logger, tracer, udpServer, shiftReg, decimator,
+                  opts)
+    knobs.register(ctlSocket)
+    if image is not None:
+        ctlSocket.register('image', image.command)
+        stats.gauge('image_frames', lambda: image.frameNumber)
+    ctlSocket.start(loop)
 
-    await asyncio.gather(udpServer.start_server(), 
-                         pktHandler.start(),
-                         shiftReg.start(),
-                         )
+    with profile.phase('bind'):
+        await udpServer.start_server(sock=sock)
+    rxPackets = stats.counter('rx_packets')
+    tasks = [pktHandler.start(),
+             pktHandler.logStats(),
+             shiftReg.logStats(),
+             profile.watchFirst({'first_rx': lambda: rxPackets.value,
+                                 'first_forward':
+                                     lambda: shiftReg.photonsOut.value}),
+             ]
+    if image is not None:
+        tasks.append(image.run())
+
+    if opts.outputMode == 'thread':
+        outputEngine = threadedOutput(shiftReg, photonQueue,
+                                      setup=rt.outputThread if rt else None)
+        outputEngine.start()
+    else:
+        tasks.append(shiftReg.start())
+    if rt is not None:
+        rt.freezeGC()
+        tasks.append(rt.collectIdle(lambda: rxPackets.value))
+    profile.mark('ready')
+    await asyncio.gather(*tasks)
 
 def main(argv=None):
     if argv is None:
@@ -102,14 +329,139 @@ def main(argv=None):
     parser.add_argument('--logLevel', type=int, default=logging.INFO,
                         help='logging threshold. 10=debug, 20=info, 30=warn')
     parser.add_argument('--delay', type=int, default=2000,
-                        help='in milliseconds - used for pausing')
-    parser.add_argument('--tickRate', type=int, default=0,
-                        help='in milliseconds - clock tick rate')
+                        help='unused, accepted for old command lines')
+    parser.add_argument('--port', type=int, default=60000,
+                        help='UDP port to receive zero-order packets on')
+    parser.add_argument('--srcIP', type=str, default=None,
+                        help='zero-order packet source (default: by network)')
+    parser.add_argument('--tickRate', type=float, default=0,
+                        help='in milliseconds - minimum time between ' \
+                             'photons shifted out, 0=as fast as the RIO')
+    parser.add_argument('--fifoPhotons', type=int, default=PHOTON_CAPACITY,
+                        help='photon FIFO capacity, in photons')
+    parser.add_argument('--outputMode', type=str, default='async',
+                        choices=['async', 'thread'],
+                        help='async: GPIO output on the event loop, ' \
+                             'thread: GPIO output in its own thread')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='shift the next photon in while the RIO reads ' \
+                             'the latched one')
+    parser.add_argument('--gpio', type=str, default='wiringpi',
+                        choices=['wiringpi', 'mmap', 'fake'],
+                        help='GPIO backend for the shift register output ' \
+                             '(fake: simulated shift register and RIO)')
+    parser.add_argument('--gpioDevice', type=str, default='/dev/gpiomem',
+                        help='register device for --gpio mmap')
+    parser.add_argument('--gpioLayout', type=str, default=None,
+                        help='register layout (JSON) for --gpio mmap, ' \
+                             'see gpio_layout.example.json')
+    parser.add_argument('--edge', type=str, default='none',
+                        choices=['none', 'sysfs', 'gpiod'],
+                        help='SNAP_FIFO_READ edge events (sysfs: thread ' \
+                             'output mode only), none: poll the pin')
+    parser.add_argument('--edgeChip', type=str, default='gpiochip0',
+                        help='gpiod chip for --edge gpiod')
+    parser.add_argument('--edgeLine', type=int, default=0,
+                        help='gpiod line offset of SNAP_FIFO_READ')
+    parser.add_argument('--handshakeTimeout', type=float, default=0,
+                        help='in seconds - SNAP_FIFO_READ timeout, 0=none')
+    parser.add_argument('--reorderWindow', type=int, default=0,
+                        help='packets held to repair reordering, 0=off')
+    parser.add_argument('--reorderBudget', type=float, default=5,
+                        help='in milliseconds - max time a packet is held')
+    parser.add_argument('--loop', type=str, default='asyncio',
+                        choices=['asyncio', 'uvloop'],
+                        help='event loop implementation')
+    parser.add_argument('--decimate', type=str, default='off',
+                        choices=DECIMATE_MODES,
+                        help='thin photons to the achieved output rate: ' \
+                             'uniform or random across each packet')
+    parser.add_argument('--decimateHeadroom', type=float, default=HEADROOM,
+                        help='fraction of the measured output rate to aim for')
+    parser.add_argument('--image', type=str, default=None,
+                        help='integrate a 256x256 photon image, snapshots ' \
+                             'in this memory-mapped file')
+    parser.add_argument('--imageWindow', type=float, default=IMAGE_WINDOW,
+                        help='in seconds - image integration window')
+    parser.add_argument('--queueSize', type=int,
+                        default=queue_policy.PACKET_CAPACITY,
+                        help='packets held by the incoming packet queue')
+    parser.add_argument('--queuePolicy', type=str,
+                        default=queue_policy.DROP_NEWEST,
+                        choices=queue_policy.POLICIES,
+                        help='packet queue overflow policy')
+    parser.add_argument('--fifoPolicy', type=str,
+                        default=queue_policy.DROP_NEWEST,
+                        choices=queue_policy.POLICIES,
+                        help='photon FIFO overflow policy (async output mode)')
+    parser.add_argument('--maxAge', type=float,
+                        default=queue_policy.MAX_AGE * 1000,
+                        help='in milliseconds - data age limit for the ' \
+                             'deadline policy')
+    parser.add_argument('--capture', type=str, default=None,
+                        help='record received datagrams to this ring file')
+    parser.add_argument('--captureSlots', type=int,
+                        default=capture_ring.DEFAULT_SLOTS,
+                        help='datagrams kept in the --capture ring file')
+    parser.add_argument('--rxTimestamps', action='store_true',
+                        help='kernel receive timestamps (SO_TIMESTAMPNS), ' \
+                             'so latencies include socket buffer queuing')
+    parser.add_argument('--rt', action='store_true',
+                        help='real-time profile: CPU pinning, SCHED_FIFO, ' \
+                             'mlockall and idle-time GC')
+    parser.add_argument('--rtCPUs', type=str, default='2,3',
+                        help='with --rt, the cores for the event loop ' \
+                             'and the output thread (--outputMode thread)')
+    parser.add_argument('--rtPriority', type=int, default=rt_profile.PRIORITY,
+                        help='SCHED_FIFO priority with --rt, 0=leave the ' \
+                             'scheduler alone')
+    parser.add_argument('--gcIdle', type=float, default=rt_profile.GC_IDLE,
+                        help='in seconds - time without packets before a ' \
+                             'garbage collection with --rt')
+    parser.add_argument('--ctlSocket', type=str, default=CTL_SOCKET,
+                        help='Unix socket for stats/control commands')
+    parser.add_argument('--stats', action='store_true',
+                        help='print the stats of the running service and exit')
+    parser.add_argument('--ctl', type=str, default=None,
+                        help='send a command to the running service, ' \
+                             'print the reply and exit (e.g. "trace dump")')
+    parser.add_argument('--trace', type=str, default='off',
+                        help='trace sampling: off, every:N or rate:M, ' \
+                             'optionally @point,point')
+    parser.add_argument('--traceSize', type=int,
+                        default=packet_trace.TRACE_CAPACITY,
+                        help='trace records kept in memory')
+    parser.add_argument('--traceFile', type=str, default=TRACE_FILE,
+                        help='file the trace ring is dumped to (SIGUSR1)')
+    parser.add_argument('--fastStart', action='store_true',
+                        help='bind the UDP socket before the slow imports ' \
+                             'and initialization, buffering early packets')
+    parser.add_argument('--fastStartBuffer', type=int,
+                        default=startup_profile.EARLY_RCVBUF,
+                        help='fast start socket receive buffer, in bytes')
 
     opts = parser.parse_args(argv)
-    loop = asyncio.get_event_loop()
+    if opts.gpio == 'mmap' and opts.gpioLayout is None:
+        parser.error('--gpio mmap needs --gpioLayout, ' \
+                     'see gpio_layout.example.json')
+    if opts.edge == 'sysfs' and opts.outputMode != 'thread':
+        parser.error('--edge sysfs needs --outputMode thread; the sysfs ' \
+                     'value file cannot be watched by the event loop')
+    if opts.stats or opts.ctl is not None:
+        command = 'stats' if opts.stats else opts.ctl
+        try:
+            reply = control_socket.query(opts.ctlSocket, command)
+        except OSError as e:
+            sys.exit(f'service not running on {opts.ctlSocket}: {e}')
+        print(json.dumps(reply, indent=2))
+        return
+
+    sock = EARLY_SOCKET
+    if sock is None:
+        sock = startup_profile.earlyBind(argv, 'parll', opts.port)
+    loop = newEventLoop(opts.loop)
     loop.set_exception_handler(custom_except_hook)
-    loop.run_until_complete(runFODO(loop, opts))
+    loop.run_until_complete(runFODO(loop, opts, sock))
     try:
         loop.run_forever()
     except KeyboardInterrupt:
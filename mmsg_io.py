@@ -0,0 +1,265 @@
+#!/usr/bin/python3
+# mmsg_io.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Batched datagram I/O (recvmmsg/sendmmsg) through ctypes for JHU's Rocket Lab.
+###############################################################################
+# Python's socket module has no recvmmsg/sendmmsg, so the libc calls are made
+# through ctypes. All message headers, iovecs, address structs and packet
+# buffers are allocated once; a call only fills in lengths.
+#
+# mmsgReceiver.recv() returns the number of datagrams read (0 if the socket
+# would block) and mmsgReceiver.packet(i) returns ((ip, port), memoryview).
+# The memoryviews point into the receive buffers and are only valid until the
+# next recv(). With timestamps=True the socket gets SO_TIMESTAMPNS and
+# mmsgReceiver.timestamp(i) is the kernel receive time of datagram i.
+# Datagrams longer than bufSize come back cut short with MSG_TRUNC; recv()
+# drops them, counts them in mmsgReceiver.truncated and only returns the
+# whole ones.
+#
+# gatherSender sends each datagram from two buffers: a small header buffer of
+# its own and a payload buffer from a bufferVector that several senders can
+# share, so a payload sent to many destinations is only copied once.
+###############################################################################
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import socket
+
+import rx_timestamp
+
+MSG_TRUNC = 0x20
+MSG_DONTWAIT = 0x40
+DEFAULT_BATCH = 64
+DEFAULT_BUF_SIZE = 2048
+
+class iovec(ctypes.Structure):
+    _fields_ = [('iov_base', ctypes.c_void_p),
+                ('iov_len', ctypes.c_size_t)]
+
+class msghdr(ctypes.Structure):
+    _fields_ = [('msg_name', ctypes.c_void_p),
+                ('msg_namelen', ctypes.c_uint32),
+                ('msg_iov', ctypes.POINTER(iovec)),
+                ('msg_iovlen', ctypes.c_size_t),
+                ('msg_control', ctypes.c_void_p),
+                ('msg_controllen', ctypes.c_size_t),
+                ('msg_flags', ctypes.c_int)]
+
+class mmsghdr(ctypes.Structure):
+    _fields_ = [('msg_hdr', msghdr),
+                ('msg_len', ctypes.c_uint)]
+
+class sockaddr_in(ctypes.Structure):
+    _fields_ = [('sin_family', ctypes.c_ushort),
+                ('sin_port', ctypes.c_uint16),  # network byte order
+                ('sin_addr', ctypes.c_uint8 * 4),
+                ('sin_zero', ctypes.c_uint8 * 8)]
+
+SOCKADDR_IN_LEN = ctypes.sizeof(sockaddr_in)
+MMSGHDR_LEN = ctypes.sizeof(mmsghdr)
+
+_libc = None
+_recvmmsg = None
+_sendmmsg = None
+
+def _loadLibc():
+    global _libc, _recvmmsg, _sendmmsg
+    if _libc is not None:
+        return
+    _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    try:
+        _recvmmsg = _libc.recvmmsg
+        _recvmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p,
+                              ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+        _recvmmsg.restype = ctypes.c_int
+        _sendmmsg = _libc.sendmmsg
+        _sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p,
+                              ctypes.c_uint, ctypes.c_int]
+        _sendmmsg.restype = ctypes.c_int
+    except AttributeError:
+        _recvmmsg = None
+        _sendmmsg = None
+
+def available():
+    """True if this libc provides recvmmsg() and sendmmsg()."""
+    try:
+        _loadLibc()
+    except OSError:
+        return False
+    return _recvmmsg is not None and _sendmmsg is not None
+
+def _raiseErrno(sent=None):
+    # `sent`: datagrams of the batch that went out before the error
+    err = ctypes.get_errno()
+    e = OSError(err, os.strerror(err))
+    e.sent = sent
+    raise e
+
+class mmsgReceiver:
+    def __init__(self, sock, batchSize=DEFAULT_BATCH,
+                 bufSize=DEFAULT_BUF_SIZE, timestamps=False):
+        if not available():
+            raise OSError(errno.ENOSYS, 'recvmmsg/sendmmsg not available')
+        self.batchSize = batchSize
+        self.bufSize = bufSize
+        self.msgs = (mmsghdr * batchSize)()
+        self.msgsAddr = ctypes.addressof(self.msgs)
+        self.iovs = (iovec * batchSize)()
+        self.names = (sockaddr_in * batchSize)()
+        self.bufs = [(ctypes.c_char * bufSize)() for _ in range(batchSize)]
+        self.views = [memoryview(buf).cast('B') for buf in self.bufs]
+
+        for i in range(batchSize):
+            self.iovs[i].iov_base = ctypes.addressof(self.bufs[i])
+            self.iovs[i].iov_len = bufSize
+            hdr = self.msgs[i].msg_hdr
+            hdr.msg_name = ctypes.addressof(self.names[i])
+            hdr.msg_namelen = SOCKADDR_IN_LEN
+            hdr.msg_iov = ctypes.pointer(self.iovs[i])
+            hdr.msg_iovlen = 1
+
+        self.fd = sock.fileno()
+        self.lastCount = 0
+        self.index = None  # slots of the whole datagrams, None = all of them
+        self.truncated = 0  # datagrams dropped for not fitting in bufSize
+        self.timestamps = timestamps
+        self.controls = None
+        if timestamps:
+            rx_timestamp.enable(sock)
+            self.controls = [(ctypes.c_char * rx_timestamp.CONTROL_SIZE)()
+                             for _ in range(batchSize)]
+            for i in range(batchSize):
+                hdr = self.msgs[i].msg_hdr
+                hdr.msg_control = ctypes.addressof(self.controls[i])
+                hdr.msg_controllen = rx_timestamp.CONTROL_SIZE
+
+    def recv(self, flags=MSG_DONTWAIT):
+        msgs = self.msgs
+        while True:
+            # msg_namelen is value-result, reset the ones the last call used
+            for i in range(self.lastCount):
+                msgs[i].msg_hdr.msg_namelen = SOCKADDR_IN_LEN
+            if self.controls is not None:
+                for i in range(self.lastCount):
+                    msgs[i].msg_hdr.msg_controllen = rx_timestamp.CONTROL_SIZE
+
+            n = _recvmmsg(self.fd, self.msgsAddr, self.batchSize, flags, None)
+            if n < 0:
+                self.lastCount = 0
+                if ctypes.get_errno() in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return 0
+                _raiseErrno()
+            self.lastCount = n
+            whole = [i for i in range(n)
+                     if not msgs[i].msg_hdr.msg_flags & MSG_TRUNC]
+            if len(whole) == n:
+                self.index = None
+                return n
+            self.truncated += n - len(whole)
+            if whole:
+                self.index = whole
+                return len(whole)
+            # all of them truncated, the socket may still have more
+
+    def packet(self, i):
+        if self.index is not None:
+            i = self.index[i]
+        name = self.names[i]
+        addr = (socket.inet_ntoa(bytes(name.sin_addr)),
+                socket.ntohs(name.sin_port))
+        return addr, self.views[i][:self.msgs[i].msg_len]
+
+    def timestamp(self, i):
+        """Kernel receive time of datagram i, or None."""
+        if self.controls is None:
+            return None
+        if self.index is not None:
+            i = self.index[i]
+        return rx_timestamp.fromControl(self.controls[i],
+                                        self.msgs[i].msg_hdr.msg_controllen)
+
+class bufferVector:
+    """Preallocated payload buffers shared by gatherSenders."""
+    def __init__(self, batchSize=DEFAULT_BATCH, bufSize=DEFAULT_BUF_SIZE):
+        self.batchSize = batchSize
+        self.bufSize = bufSize
+        self.bufs = [(ctypes.c_char * bufSize)() for _ in range(batchSize)]
+        self.views = [memoryview(buf).cast('B') for buf in self.bufs]
+
+class gatherSender:
+    def __init__(self, sock, dest, payloads, headerSize):
+        if not available():
+            raise OSError(errno.ENOSYS, 'recvmmsg/sendmmsg not available')
+        batchSize = payloads.batchSize
+        self.fd = sock.fileno()
+        self.batchSize = batchSize
+        self.headerSize = headerSize
+        self.payloads = payloads
+        self.msgs = (mmsghdr * batchSize)()
+        self.msgsAddr = ctypes.addressof(self.msgs)
+        self.iovs = (iovec * (2 * batchSize))()
+        self.name = sockaddr_in()
+        self.name.sin_family = socket.AF_INET
+        self.name.sin_port = socket.htons(dest[1])
+        self.name.sin_addr[:] = list(socket.inet_aton(dest[0]))
+        self.headers = [(ctypes.c_char * headerSize)()
+                        for _ in range(batchSize)]
+        self.headerViews = [memoryview(buf).cast('B')
+                            for buf in self.headers]
+
+        for i in range(batchSize):
+            self.iovs[2 * i].iov_base = ctypes.addressof(self.headers[i])
+            self.iovs[2 * i].iov_len = headerSize
+            self.iovs[2 * i + 1].iov_base = \
+                ctypes.addressof(payloads.bufs[i])
+            hdr = self.msgs[i].msg_hdr
+            hdr.msg_name = ctypes.addressof(self.name)
+            hdr.msg_namelen = SOCKADDR_IN_LEN
+            hdr.msg_iov = ctypes.pointer(self.iovs[2 * i])
+            hdr.msg_iovlen = 2
+
+    def send(self, lengths, flags=0):
+        """Send header + payload 0..len(lengths)-1; return the number sent.
+
+        `lengths` are the payload lengths; the headers are always headerSize.
+        On an error the OSError's `sent` is the number already sent.
+        """
+        iovs = self.iovs
+        count = len(lengths)
+        for i in range(count):
+            iovs[2 * i + 1].iov_len = lengths[i]
+
+        sent = 0
+        while sent < count:
+            n = _sendmmsg(self.fd, self.msgsAddr + sent * MMSGHDR_LEN,
+                          count - sent, flags)
+            if n < 0:
+                _raiseErrno(sent)
+            sent += n
+        return sent
+
+class batchStats:
+    """Histogram of datagrams per recvmmsg() call."""
+    def __init__(self, batchSize):
+        self.batchSize = batchSize
+        self.hist = [0] * (batchSize + 1)
+        self.calls = 0
+        self.datagrams = 0
+
+    def record(self, count):
+        self.hist[count] += 1
+        self.calls += 1
+        self.datagrams += count
+
+    def mean(self):
+        return self.datagrams / self.calls if self.calls else 0.0
+
+    def summary(self):
+        nonzero = {size: n for size, n in enumerate(self.hist) if n}
+        return f'calls={self.calls} datagrams={self.datagrams} ' \
+               f'mean={self.mean():.2f} hist={nonzero}'
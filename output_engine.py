@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+# output_engine.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Threaded shift register output for VIM-PARLL for JHU's Rocket Lab.
+###############################################################################
+# In the thread output mode the GPIO writer runs in its own thread and pulls
+# photons from a photonRing, so the SNAP_FIFO_READ handshake never holds up
+# the event loop and socket reads never hold up the handshake. The asyncio
+# side only decodes packets and pushes photon blocks into the ring.
+###############################################################################
+
+import logging
+import threading
+
+from photon_ring import photonRing
+
+CHUNK_PHOTONS = 256  # photons taken from the ring per get()
+WAKE_TIME = 0.1  # seconds between stop-flag checks while the ring is empty
+
+class threadedOutput:
+    def __init__(self, shiftReg, ring, setup=None):
+        self.logger = logging.getLogger('parll')
+        self.shiftReg = shiftReg
+        self.ring = ring
+        self.setup = setup  # called first in the output thread
+        self.thread = None
+        self.running = False
+        self.photonCount = 0
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run,
+                                       name='parll-output',
+                                       daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=1):
+        self.running = False
+        self.ring.dataReady.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def run(self):
+        self.logger.debug('Output thread started')
+        if self.setup is not None:
+            self.setup()
+        handleData = self.shiftReg.handleDataSync
+        ring = self.ring
+        while self.running:
+            xs, ys = ring.get(CHUNK_PHOTONS, WAKE_TIME)
+            for x, y in zip(xs, ys):
+                handleData(x, y)
+            self.photonCount += len(xs)
+            self.shiftReg.photonsOut.value += len(xs)
+            if not ring.qsize():
+                self.shiftReg.flushSync()
+        self.logger.debug('Output thread stopped')
+
+    def summary(self):
+        ring = self.ring
+        return f'out={self.photonCount} depth={ring.qsize()} ' \
+               f'highWater={ring.highWater} overruns={ring.overruns} ' \
+               f'dropped={ring.droppedPhotons}'
@@ -9,115 +9,121 @@
 
 import logging
 import asyncio
-import socket
-import struct
-import subprocess
 import time
 
-SLEEP_TIME = 0.000001  # for short sleeps at the end of loops
+import arp_announcer
+import metrics
+import packet_trace
+from arp_announcer import arpAnnouncer
+import bcast_forwarder
+from bcast_forwarder import rawForwarder
+
 ARPING_TIME = 5  # if time b/w packets is > this, then send ping
+ARP_IFACE = 'eth0'
 
 class packetHandler:
-    def __init__(self, qPacket, qXmit, bcastIP, bcastPort):
+    def __init__(self, qPacket, qXmit, destinations,
+                 localIP='127.0.0.1', srcIP='127.0.0.1',
+                 arpIdleTime=ARPING_TIME,
+                 arpInterval=arp_announcer.INTERVAL,
+                 arpBackoff=arp_announcer.BACKOFF,
+                 arpMaxInterval=arp_announcer.MAX_INTERVAL,
+                 ttl=bcast_forwarder.IP_TTL, mtu=bcast_forwarder.MTU,
+                 udpChecksum=True, ipId=1):
         self.logger = logging.getLogger('bcast')
         self.qPacket = qPacket
         self.qXmit = qXmit
         self.packetCount = 0
-        self.bcastIP = bcastIP
-        self.bcastPort = bcastPort
-        
-        # on rocket network (192) or IDG-LAB (172)?
-        if self.bcastIP[:3] == '192':
-            self.srcIP = '192.168.1.10'
-            self.localIP = '192.168.1.100'
-        elif self.bcastIP[:3] == '172':  
-            self.srcIP = '172.16.0.171'  # GRAY-MAC
-            self.localIP = '172.16.1.125'
+        self.destinations = destinations  # [(ip, port), ...]
+        self.srcIP = srcIP  # detector, announced to when idle
+        self.localIP = localIP
+
+        # one raw socket per destination for the life of the handler
+        self.forwarder = rawForwarder(destinations, ttl=ttl, ifaceIP=localIP,
+                                      mtu=mtu, udpChecksum=udpChecksum,
+                                      ipId=ipId)
+        self.packet_timer = time.perf_counter()
+
+        self.metrics = metrics.getRegistry('bcast')
+        self.enqueueToHandle = self.metrics.histogram('enqueue_to_handle')
+        self.handleToSend = self.metrics.histogram('handle_to_send')
+        self.rxToSend = self.metrics.histogram('rx_to_send')
+        self.sendTrace = packet_trace.getTracer('bcast').point('send')
+        self.metrics.gauge('tx_packets', lambda: self.forwarder.sentCount)
+        self.metrics.gauge('tx_errors', lambda: self.forwarder.errorCount)
+        self.metrics.gauge('tx_fragmented',
+                           lambda: self.forwarder.fragmentCount)
+        self.metrics.gauge('destinations', self.forwarder.summary)
+
+        try:
+            self.announcer = arpAnnouncer(ARP_IFACE, self.localIP, self.srcIP,
+                                          idleTime=arpIdleTime,
+                                          interval=arpInterval,
+                                          backoff=arpBackoff,
+                                          maxInterval=arpMaxInterval)
+        except OSError as e:
+            self.logger.error(f'ARP announcer disabled: \'{e}\'')
+            self.announcer = None
+        else:
+            self.metrics.gauge('arp_sent', lambda: self.announcer.sentCount)
 
     async def start(self):
-        packet_timer = time.perf_counter()  # start a packet timer
+        self.packet_timer = time.perf_counter()  # start a packet timer
         while True:
-            if not self.qPacket.empty():
-                pkt = await self.qPacket.get()
-                retData = await self.handlePacket(pkt)
-                if retData != None:
-                    await self.enqueue_xmit(retData)
-                packet_timer = time.perf_counter()  # reset packet timer
-            else:
-                packet_timer_check = time.perf_counter() - packet_timer
-                if packet_timer_check > ARPING_TIME:  # check the packet timer
-                    # announce local IP to zero-order detector
-                    subprocess.run(["arping", "-U", 
-                            "-c", "1",
-                            "-I", "eth0",
-                            "-s", self.localIP, 
-                            self.srcIP], 
-                            stdout=subprocess.PIPE)
-                    await asyncio.sleep(2)
-            await asyncio.sleep(SLEEP_TIME) # very small wait time necessary
+            pkt = await self.qPacket.get()
+            handle_time = time.time()
+            retData = await self.handlePacket(pkt)
+            if retData != None:
+                await self.enqueue_xmit(retData)
+            send_time = time.time()
+            self.enqueueToHandle.record(handle_time - pkt[3])
+            self.handleToSend.record(send_time - handle_time)
+            self.rxToSend.record(send_time - pkt[0])
+            self.packet_timer = time.perf_counter()  # reset packet timer
+
+    async def idleAnnounce(self):
+        # announce local IP to zero-order detector when no packets arrive
+        if self.announcer is not None:
+            await self.announcer.run(lambda: self.packet_timer)
 
     async def handlePacket(self, pkt):
         try:
-            rcv_time, addr, data = pkt
+            rcv_time, addr, data, enq_time = pkt
             #  encode data if it isn't already
             if isinstance(data, bytes):
                 udp_payload = data
             else:
                 udp_payload = data.encode('utf-8')
-            
-            # build a new header with the source IP address
-            udp_header = struct.pack(">HHHH", 
-                                     addr[1], 
-                                     self.bcastPort, 
-                                     8 + len(udp_payload), 
-                                     0)
-            ip_payload = udp_header + udp_payload
-
-            ip_header = struct.pack(">BBH", 69, 0, 20 + len(ip_payload))
-            ip_header += struct.pack(">HH", 12345, 0)
-            ip_header += struct.pack(">BBH", 20, 17, 0)
-            
-            srcIP_split = addr[0].split('.')
-            ip_header += struct.pack(">BBBB", 
-                                     int(srcIP_split[0]),
-                                     int(srcIP_split[1]),
-                                     int(srcIP_split[2]),
-                                     int(srcIP_split[3]))
-            
-            bcastIP_split = self.bcastIP.split('.')
-            ip_header += struct.pack(">BBBB", 
-                                     int(bcastIP_split[0]), 
-                                     int(bcastIP_split[1]), 
-                                     int(bcastIP_split[2]),
-                                     int(bcastIP_split[3]))
-
-            ip_pkt = ip_header + ip_payload
-
-            sock = socket.socket(socket.AF_INET, 
-                                 socket.SOCK_RAW, 
-                                 socket.IPPROTO_RAW)
-            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
-            sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-            
-            self.logger.debug(f'Sending: \'{udp_payload}\'' \
-                              f'to \'{(self.bcastIP, self.bcastPort)}\'' \
-                              f'from \'{addr}\'')
-            
-            sock.sendto(ip_pkt, (self.bcastIP, self.bcastPort))
-        except:
-            pass
+
+            if self.sendTrace.enabled:
+                self.sendTrace.record(len(udp_payload), addr, udp_payload)
+
+            # rebuild the header with the source IP address and send it to
+            # every destination
+            self.forwarder.forward(addr, udp_payload)
+        except (OSError, ValueError) as e:
+            self.logger.warn(f'Forwarding failed: \'{e}\'')
+
+    def handleBatch(self, receiver, count):
+        # batched I/O mode: called straight from the socket reader callback
+        self.packet_timer = time.perf_counter()  # reset packet timer
+        self.forwarder.forwardBatch(receiver, count)
 
     async def enqueue_xmit(self, data):
-        if self.qXmit.full():
-            self.logger.warn(f'Transmit Data Queue is FULL')
-        else:
-            await self.qXmit.put(data)
+        # the queue applies its overflow policy and reports drops
+        self.qXmit.put_nowait(data)
 
-async def runPktHandlerTest(loop):
+async def runPktHandlerTest(loop, destinations, numPackets):
+    # forward a few synthetic packets; watch them with listeners on the ports
     pktHandler = packetHandler(qPacket=asyncio.Queue(),
-                               qXmit=asyncio.Queue()
+                               qXmit=asyncio.Queue(),
+                               destinations=destinations,
                                )
-    await asyncio.gather(pktHandler.start())
+    for seq in range(numPackets):
+        now = time.time()
+        data = f'test packet {seq}'.encode('utf-8')
+        await pktHandler.qPacket.put((now, ('127.0.0.1', 1025), data, now))
+    await asyncio.gather(pktHandler.start(), pktHandler.idleAnnounce())
 
 if __name__ == "__main__":
     LOG_FORMAT = '%(asctime)s.%(msecs)03dZ %(name)-10s %(levelno)s \
@@ -127,8 +133,12 @@ if __name__ == "__main__":
     logger.setLevel(logging.DEBUG)
     logger.debug('~~~~~~starting log~~~~~~')
 
+    destinations = [('127.0.0.1', 60001), ('127.0.0.1', 60002)]
+    numPackets = 10
+
     loop = asyncio.get_event_loop()
     try:
-        loop.run_until_complete(runPktHandlerTest(loop))
+        loop.run_until_complete(runPktHandlerTest(loop, destinations,
+                                                  numPackets))
     except KeyboardInterrupt:
-        print('Exiting Program...')
\ No newline at end of file
+        print('Exiting Program...')
@@ -9,93 +9,137 @@
 
 import logging
 import asyncio
+import struct
+import time
 
-SLEEP_TIME = 0.000001  # for short sleeps at the end of loops
+from photon_decoder import parseHeader, decodePhotons, buildPacket, \
+                           PHOTON_SIZE
+from photon_fifo import photonBlock, photonFIFO
+from sequence_tracker import sequenceTracker
+import metrics
+import packet_trace
+
+STATS_TIME = 60  # seconds between sequence statistics log lines
 
 class packetHandler:
-    def __init__(self, qPacket, qFIFO):
+    def __init__(self, qPacket, qFIFO, reorderWindow=0, reorderBudget=0.005,
+                 decimator=None, image=None):
         self.logger = logging.getLogger('parll')
         self.qPacket = qPacket
         self.qFIFO = qFIFO
-        self.packetCount = 0
+        self.tracker = sequenceTracker(window=reorderWindow,
+                                       budget=reorderBudget)
+        self.decimator = decimator  # photonDecimator or None
+        self.image = image  # photonImage or None
+
+        self.metrics = metrics.getRegistry('parll')
+        self.rxToDecode = self.metrics.histogram('rx_to_decode')
+        self.decodeTime = self.metrics.histogram('decode')
+        self.photonCount = self.metrics.counter('decoded_photons')
+        tracer = packet_trace.getTracer('parll')
+        self.malformedTrace = tracer.point('malformed')
+        self.decodeTrace = tracer.point('decode')
+        for name in ('lost', 'duplicates', 'late', 'reordered', 'resyncs',
+                     'malformed'):
+            self.metrics.gauge(f'seq_{name}',
+                               lambda name=name: getattr(self.tracker, name))
+        for i, name in enumerate(('lossPerSec', 'lossFraction')):
+            self.metrics.gauge(f'seq_{name}', lambda i=i:
+                               self.tracker.rates(time.perf_counter())[i])
+        if decimator is not None:
+            self.metrics.gauge('decimation', decimator.summary)
 
     async def start(self):
+        tracker = self.tracker
         while True:
-            if not self.qPacket.empty():
+            timeout = tracker.timeUntilExpire(time.perf_counter())
+            if timeout is None:
                 pkt = await self.qPacket.get()
-                retData = await self.handlePacket(pkt)
-                if retData != None:
-                    for photon in retData:
-                        await self.enqueue_FIFO(photon)
-            await asyncio.sleep(SLEEP_TIME) # very small wait time necessary
+            else:
+                # packets are held for reordering, wake up to release them
+                try:
+                    pkt = await asyncio.wait_for(self.qPacket.get(), timeout)
+                except asyncio.TimeoutError:
+                    await self.handleReady(tracker.expire(time.perf_counter()))
+                    continue
+            await self.handleReady(self.sequencePacket(pkt))
 
-    async def handlePacket(self, pkt):
+    async def handleReady(self, packets):
+        for rcv_time, addr, pkt, enq_time in packets:
+            decode_time = time.time()
+            retData = await self.handlePacket(pkt)
+            self.decodeTime.record(time.time() - decode_time)
+            self.rxToDecode.record(decode_time - rcv_time)
+            if retData != None:
+                block = photonBlock(*retData, rcvTime=rcv_time)
+                self.photonCount.value += block.count
+                if self.image is not None:
+                    self.image.add(block)
+                if self.decimator is not None:
+                    block = self.decimator.thin(block)
+                self.enqueue_FIFO(block)
+
+    def sequencePacket(self, item):
+        # check the header, return the packets that are now in order
+        pkt = item[2]
         try:
-            self.logger.debug(f'PACKET_SIZE: {len(pkt)}')
-            if len(pkt) <= 62:
-                self.logger.debug(f'PACKET: {pkt}')
-            else:
-                self.logger.debug(f'PACKET: {pkt[:62]} ... ')
-
-            pktCount = (pkt[3]<<8) + pkt[2]
-
-            # Make sure the data is aligned properly and is newest packet            
-            if (pkt[4] == 0) and pkt[5] == 0 and (pktCount > self.packetCount):
-                numPhotons = (pkt[1]<<8) + pkt[0]
-                numPhotonBytes = numPhotons * 6
-                self.logger.debug(f'NUM_PHOTONS: {numPhotons} ({numPhotonBytes}B)')
-
-                if numPhotons > 0:
-                    # Split the packet into photons (X, Y, P) each consisting of 2 bytes
-                    pktData = pkt[6:]
-                    photonList = [pktData[i:i+6] for i in range(0, numPhotonBytes, 6)]
-                
-                    if len(photonList) <= 10:
-                        self.logger.debug(f'PHOTON_LIST: {photonList}')
-                    else:
-                        self.logger.debug(f'PHOTON_LIST: {photonList[:10]} ... ')
-
-                    photonQueue = []
-                    pNum = 0
-                    for photon in photonList:
-                        self.logger.debug(f'PHOTON[{pNum}]: {photon}')
-                        
-                        # self.logger.debug(f'xA = {photon[1]} << 3')
-                        # self.logger.debug(f'xB = {photon[0]} >> 5')
-                        xA = photon[1]<<3
-                        xB = photon[0]>>5
-                        yA = photon[3]<<3
-                        yB = photon[2]>>5
-
-                        x = (xA + xB) & 255
-                        y = (yA + yB) & 255
-                        # p = photon[4]
-                        
-                        # self.logger.debug(f'x={xA}+{xB}')
-                        # self.logger.debug(f'y={yA}+{yB}')
-                        
-                        photonQueue.append((x, y))
-                        pNum+=1            
-                    
-                    return photonQueue
-                else:
-                    self.logger.debug(f'NO PHOTONS')
-                    await asyncio.sleep(SLEEP_TIME)
-                    return None
-        except:
-            pass
-
-    async def enqueue_FIFO(self, data):
-        if self.qFIFO.full():
-            self.logger.warn(f'Transmit Data Queue is FULL')
-        else:
-            await self.qFIFO.put(data)
-
-async def runPktHandlerTest(loop):
+            numPhotons, pktCount, align = parseHeader(pkt)
+        except struct.error:
+            align = None
+        # Make sure the data is aligned properly
+        if align != 0:
+            self.tracker.malformed += 1
+            if self.malformedTrace.enabled:
+                self.malformedTrace.record(len(pkt), pkt)
+            return ()
+
+        now = time.perf_counter()
+        ready = self.tracker.accept(pktCount, item, now)
+        self.tracker.updateRates(now)
+        return ready
+
+    async def handlePacket(self, pkt):
+        numPhotons = parseHeader(pkt)[0]
+        if numPhotons > 0:
+            # x and y of every photon, in one pass over the payload
+            x, y = decodePhotons(pkt, numPhotons)
+            if self.decodeTrace.enabled:
+                self.decodeTrace.record(len(pkt), numPhotons, x, y)
+            return x, y
+        if self.decodeTrace.enabled:
+            self.decodeTrace.record(len(pkt), 0)
+        return None
+
+    async def logStats(self):
+        while True:
+            await asyncio.sleep(STATS_TIME)
+            self.tracker.updateRates(time.perf_counter())
+            self.logger.info(f'SEQUENCE_STATS: {self.tracker.summary()}')
+            if self.decimator is not None:
+                self.logger.info(f'DECIMATION: {self.decimator.summary()}')
+
+    def enqueue_FIFO(self, block):
+        # the FIFO applies its overflow policy and reports the drops
+        self.qFIFO.put_nowait(block)
+
+async def logFIFO(qFIFO):
+    logger = logging.getLogger('parll')
+    while True:
+        block = await qFIFO.get()
+        logger.info(f'PHOTON_BLOCK: {block.count} photons ' \
+                    f'x={list(block.x[:4])} y={list(block.y[:4])} ...')
+
+async def runPktHandlerTest(loop, numPackets):
+    # decode a few synthetic zero-order packets and log the photon blocks
     pktHandler = packetHandler(qPacket=asyncio.Queue(),
-                               qFIFO=asyncio.Queue()
+                               qFIFO=photonFIFO()
                                )
-    await asyncio.gather(pktHandler.start())
+    for seq in range(numPackets):
+        photons = [(x << 5, x << 5, 0) for x in range(seq * 10)]
+        now = time.time()
+        await pktHandler.qPacket.put((now, ('127.0.0.1', 60000),
+                                      buildPacket(seq, photons), now))
+    await asyncio.gather(pktHandler.start(), logFIFO(pktHandler.qFIFO))
 
 if __name__ == "__main__":
     LOG_FORMAT = '%(asctime)s.%(msecs)03dZ %(name)-10s %(levelno)s \
@@ -105,8 +149,10 @@ if __name__ == "__main__":
     logger.setLevel(logging.DEBUG)
     logger.debug('~~~~~~starting log~~~~~~')
 
+    numPackets = 5
+
     loop = asyncio.get_event_loop()
     try:
-        loop.run_until_complete(runPktHandlerTest(loop))
+        loop.run_until_complete(runPktHandlerTest(loop, numPackets))
     except KeyboardInterrupt:
-        print('Exiting Program...')
\ No newline at end of file
+        print('Exiting Program...')
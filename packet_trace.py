@@ -0,0 +1,153 @@
+#!/usr/bin/python3
+# packet_trace.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Sampled trace points for JHU's Rocket Lab services.
+###############################################################################
+# Tracers are looked up by name like loggers, and hand out trace points:
+#
+#   tracer = packet_trace.getTracer('parll')
+#   rxTrace = tracer.point('rx')
+#   ...
+#   if rxTrace.enabled:
+#       rxTrace.record(data, addr)
+#
+# A disabled point costs one attribute test. When enabled, the tracer samples
+# every Nth event of each point ('every:N') or the first M events of each
+# point per second ('rate:M'), optionally only for some points
+# ('every:100@rx,decode'). Samples go into a ring of the last `capacity`
+# records; bytes are cut to TRACE_BYTES and arrays to TRACE_ITEMS, and
+# nothing is formatted until the ring is dumped (JSON lines, bytes as hex).
+###############################################################################
+
+import json
+import time
+from collections import deque
+
+TRACE_CAPACITY = 1024
+TRACE_BYTES = 64  # bytes kept of each bytes-like field
+TRACE_ITEMS = 16  # items kept of each array field
+
+def freeze(value):
+    # copy what is needed of a field now; format it at dump time
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value[:TRACE_BYTES])
+    if hasattr(value, 'tolist'):
+        return value[:TRACE_ITEMS].tolist()
+    return value
+
+def thaw(value):
+    if isinstance(value, bytes):
+        return value.hex()
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+class tracePoint:
+    __slots__ = ('tracer', 'name', 'enabled', 'count', 'every', 'perSecond',
+                 'window', 'windowCount')
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+        self.enabled = False
+        self.count = 0
+        self.every = 0
+        self.perSecond = 0
+        self.window = 0.0
+        self.windowCount = 0
+
+    def record(self, *fields):
+        self.count += 1
+        if self.every:
+            if self.count % self.every:
+                return
+        else:
+            now = time.monotonic()
+            if now - self.window >= 1.0:
+                self.window = now
+                self.windowCount = 0
+            if self.windowCount >= self.perSecond:
+                return
+            self.windowCount += 1
+        self.tracer.ring.append((time.time(), self.name, self.count,
+                                 tuple(freeze(field) for field in fields)))
+
+class tracer:
+    def __init__(self, name, capacity=TRACE_CAPACITY):
+        self.name = name
+        self.ring = deque(maxlen=capacity)
+        self.points = {}
+        self.spec = 'off'
+
+    def point(self, name):
+        if name not in self.points:
+            self.points[name] = tracePoint(self, name)
+            self.applyTo(self.points[name])
+        return self.points[name]
+
+    def setCapacity(self, capacity):
+        self.ring = deque(self.ring, maxlen=capacity)
+
+    def configure(self, spec):
+        """'off', 'every:N' or 'rate:M', optionally '@point,point'."""
+        mode, _, points = spec.partition('@')
+        kind, _, value = mode.partition(':')
+        if kind not in ('off', 'every', 'rate'):
+            raise ValueError(f'bad trace spec \'{spec}\'')
+        if kind != 'off' and int(value) <= 0:
+            raise ValueError(f'bad trace spec \'{spec}\'')
+        self.spec = spec
+        for point in self.points.values():
+            self.applyTo(point)
+
+    def applyTo(self, point):
+        mode, _, points = self.spec.partition('@')
+        kind, _, value = mode.partition(':')
+        selected = not points or point.name in points.split(',')
+        point.enabled = kind != 'off' and selected
+        point.every = int(value) if kind == 'every' else 0
+        point.perSecond = int(value) if kind == 'rate' else 0
+
+    def records(self, last=None):
+        records = list(self.ring)
+        if last is not None:
+            records = records[-last:]
+        return [{'time': t, 'point': name, 'n': n,
+                 'fields': [thaw(field) for field in fields]}
+                for t, name, n, fields in records]
+
+    def dumpFile(self, path):
+        """Write the ring as JSON lines; return the number of records."""
+        records = self.records()
+        with open(path, 'w') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+        return len(records)
+
+    def summary(self):
+        return {'spec': self.spec, 'records': len(self.ring),
+                'capacity': self.ring.maxlen,
+                'points': {name: point.count
+                           for name, point in self.points.items()}}
+
+    def command(self, args, dumpPath):
+        """Control socket 'trace' command: [spec | dump [path] | show [N]]."""
+        if not args:
+            return self.summary()
+        if args[0] == 'dump':
+            path = args[1] if len(args) > 1 else dumpPath
+            return {'path': path, 'records': self.dumpFile(path)}
+        if args[0] == 'show':
+            return self.records(int(args[1]) if len(args) > 1 else 20)
+        self.configure(args[0])
+        return self.summary()
+
+_tracers = {}
+
+def getTracer(name):
+    if name not in _tracers:
+        _tracers[name] = tracer(name)
+    return _tracers[name]
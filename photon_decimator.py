@@ -0,0 +1,134 @@
+#!/usr/bin/python3
+# photon_decimator.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Adaptive photon decimation ahead of the parallel output (VIM-PARLL).
+###############################################################################
+# The RIO handshake caps the photons/s VIM-PARLL can shift out. Rather than
+# letting the FIFO cut the end off every packet once it is full, the
+# decimator keeps a fraction `keep` of each packet's photons, spread over the
+# whole packet, so the RIO still sees a representative image:
+#   uniform - every (1/keep)th photon, with the phase carried across packets
+#   random  - each photon kept with probability keep
+#
+# Every RATE_INTERVAL seconds it compares the photons/s coming in with the
+# photons/s the output achieved. If the output queue is backed up or dropped
+# photons, the output ran flat out: keep becomes HEADROOM * output / input.
+# Otherwise keep grows back by RECOVERY per interval, up to 1.
+###############################################################################
+
+import random
+import time
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MODES = ('off', 'uniform', 'random')
+RATE_INTERVAL = 0.5  # seconds between rate measurements
+HEADROOM = 0.9  # fraction of the measured output rate to aim for
+RECOVERY = 1.25  # keep multiplier per interval when the output keeps up
+BACKLOG = 0.5  # output queue fill fraction counted as backed up
+MIN_KEEP = 0.001
+
+class photonDecimator:
+    def __init__(self, mode, outputCount, outputQueue, headroom=HEADROOM,
+                 interval=RATE_INTERVAL, seed=None):
+        if mode not in MODES[1:]:
+            raise ValueError(f'unknown decimation mode \'{mode}\'')
+        self.mode = mode
+        self.outputCount = outputCount  # callable: photons shifted out
+        self.outputQueue = outputQueue  # photonFIFO or photonRing
+        self.headroom = headroom
+        self.interval = interval
+        self.rng = random.Random(seed)
+        self.npRng = np.random.default_rng(seed) if np is not None else None
+
+        self.keep = 1.0
+        self.phase = 0.0
+        self.inPhotons = 0  # photons offered
+        self.keptPhotons = 0  # photons passed on
+        self.inRate = 0.0
+        self.outRate = 0.0
+        self.lastTime = None
+        self.lastIn = 0
+        self.lastOut = 0
+        self.lastDropped = 0
+
+    @property
+    def factor(self):
+        """Photons in per photon out."""
+        return 1 / self.keep
+
+    def update(self, now):
+        out = self.outputCount()
+        dropped = self.outputQueue.droppedPhotons
+        if self.lastTime is None:
+            self.lastTime, self.lastIn, self.lastOut = now, self.inPhotons, out
+            self.lastDropped = dropped
+            return
+        elapsed = now - self.lastTime
+        outDelta = out - self.lastOut
+        if outDelta < 0:
+            outDelta = out  # counter was reset
+        self.inRate = (self.inPhotons - self.lastIn) / elapsed
+        self.outRate = outDelta / elapsed
+        queue = self.outputQueue
+        saturated = dropped > self.lastDropped or \
+            queue.qsize() > BACKLOG * queue.capacity
+        if saturated and self.inRate > 0:
+            # the output ran flat out: aim a little below what it managed
+            keep = self.headroom * self.outRate / self.inRate
+            self.keep = min(max(keep, MIN_KEEP), 1.0)
+        else:
+            self.keep = min(self.keep * RECOVERY, 1.0)
+        self.lastTime, self.lastIn, self.lastOut = now, self.inPhotons, out
+        self.lastDropped = dropped
+
+    def thin(self, block):
+        """Return the block, or a thinned copy of it."""
+        now = time.perf_counter()
+        if self.lastTime is None or now - self.lastTime >= self.interval:
+            self.update(now)
+        count = block.count
+        self.inPhotons += count
+        keep = self.keep
+        if keep >= 1.0 or count == 0:
+            self.keptPhotons += count
+            return block
+
+        if self.mode == 'uniform':
+            # photon i is kept when floor(phase + keep * (i + 1)) steps up
+            start = self.phase
+            self.phase = (start + keep * count) % 1.0
+            if np is not None and isinstance(block.x, np.ndarray):
+                steps = np.floor(start + keep * np.arange(count + 1))
+                idx = np.flatnonzero(np.diff(steps))
+            else:
+                idx = [i for i in range(count)
+                       if int(start + keep * (i + 1)) > int(start + keep * i)]
+        else:
+            if np is not None and isinstance(block.x, np.ndarray):
+                idx = np.flatnonzero(self.npRng.random(count) < keep)
+            else:
+                rand = self.rng.random
+                idx = [i for i in range(count) if rand() < keep]
+
+        if np is not None and isinstance(block.x, np.ndarray):
+            x, y = block.x[idx], block.y[idx]
+        else:
+            x = array('B', [block.x[i] for i in idx])
+            y = array('B', [block.y[i] for i in idx])
+        self.keptPhotons += len(x)
+        return type(block)(x, y, block.rcvTime)
+
+    def summary(self):
+        return {'mode': self.mode, 'keep': round(self.keep, 4),
+                'factor': round(self.factor, 2),
+                'in_rate': round(self.inRate, 1),
+                'out_rate': round(self.outRate, 1),
+                'in_photons': self.inPhotons, 'kept_photons': self.keptPhotons}
@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+# photon_decoder.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Zero-order packet decoder for VIM-PARLL for JHU's Rocket Lab.
+###############################################################################
+# Packet layout (little-endian):
+#   [0:2] number of photons
+#   [2:4] packet sequence number
+#   [4:6] alignment, always 0
+#   [6: ] photons, 6 bytes each: X (2B), Y (2B), P (2B)
+#
+# The 8-bit output coordinates are bits 5-12 of X and Y:
+#   x = ((X[1] << 3) + (X[0] >> 5)) & 255 == (X >> 5) & 255
+#
+# decodePhotons() views the photon payload in place and returns the x and y
+# coordinates of the whole packet as two uint8 arrays (numpy arrays when numpy
+# is installed, array.array('B') otherwise).
+###############################################################################
+
+import sys
+import struct
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HEADER = struct.Struct('<HHH')  # number of photons, sequence, alignment
+HEADER_SIZE = HEADER.size
+PHOTON_SIZE = 6
+MTU = 1500
+MAX_PHOTONS = (MTU - 20 - 8 - HEADER_SIZE) // PHOTON_SIZE
+
+_swap = sys.byteorder != 'little'
+
+def parseHeader(pkt):
+    """Return (numPhotons, sequence, alignment) of a zero-order packet."""
+    return HEADER.unpack_from(pkt)
+
+def photonsInPacket(pkt, numPhotons):
+    """numPhotons, limited to the whole photons actually in the packet."""
+    return min(numPhotons, (len(pkt) - HEADER_SIZE) // PHOTON_SIZE)
+
+def emptyPhotons():
+    if np is not None:
+        return np.empty(0, np.uint8), np.empty(0, np.uint8)
+    return array('B'), array('B')
+
+def _decodeNumpy(pkt, count):
+    words = np.frombuffer(pkt, dtype='<u2', count=3 * count,
+                          offset=HEADER_SIZE)
+    x = (words[0::3] >> 5).astype(np.uint8)
+    y = (words[1::3] >> 5).astype(np.uint8)
+    return x, y
+
+def _decodeArray(pkt, count):
+    words = array('H')
+    words.frombytes(memoryview(pkt)[HEADER_SIZE:HEADER_SIZE + 6 * count])
+    if _swap:
+        words.byteswap()
+    x = array('B', [(w >> 5) & 255 for w in words[0::3]])
+    y = array('B', [(w >> 5) & 255 for w in words[1::3]])
+    return x, y
+
+_decode = _decodeNumpy if np is not None else _decodeArray
+
+def decodePhotons(pkt, numPhotons):
+    """Decode the photons of a packet into (x, y) uint8 arrays."""
+    count = photonsInPacket(pkt, numPhotons)
+    if count <= 0:
+        return emptyPhotons()
+    return _decode(pkt, count)
+
+def buildPacket(seq, photons):
+    """Build a zero-order packet from (X, Y, P) 16-bit tuples."""
+    body = b''.join(struct.pack('<HHH', *photon) for photon in photons)
+    return HEADER.pack(len(photons), seq & 0xFFFF, 0) + body
@@ -0,0 +1,144 @@
+#!/usr/bin/python3
+# photon_fifo.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Photon FIFO between the packet handler and the shift register (VIM-PARLL).
+###############################################################################
+# The FIFO carries photonBlocks (the decoded x/y arrays of one packet) rather
+# than one (x, y) tuple per photon, and its capacity is counted in photons.
+# On overflow the queue_policy policy decides what goes:
+#   drop-newest - the new block is cut to the free space (the default)
+#   drop-oldest - whole blocks are evicted from the front until it fits
+#   keep-latest - the FIFO is flushed for the new block
+#   deadline    - blocks older than maxAge are expired first, then as
+#                 drop-oldest
+# A block larger than the whole FIFO keeps its first photons under
+# drop-newest and its last photons otherwise. Everything that does not make
+# it out is counted in droppedPhotons (by reason in `drops`).
+###############################################################################
+
+import asyncio
+import time
+from collections import deque
+
+from queue_policy import dropReporter, checkPolicy, DROP_NEWEST, \
+                         KEEP_LATEST, DEADLINE, MAX_AGE
+
+PHOTON_CAPACITY = 1024
+
+class photonBlock:
+    __slots__ = ('x', 'y', 'count', 'rcvTime')
+
+    def __init__(self, x, y, rcvTime=0.0):
+        self.x = x
+        self.y = y
+        self.count = len(x)
+        self.rcvTime = rcvTime  # time.time() the packet was received
+
+    def head(self, count):
+        """A block with only the first `count` photons."""
+        return photonBlock(self.x[:count], self.y[:count], self.rcvTime)
+
+    def tail(self, count):
+        """A block with only the last `count` photons."""
+        start = self.count - count
+        return photonBlock(self.x[start:], self.y[start:], self.rcvTime)
+
+    def photons(self):
+        """Iterate over (x, y) as plain ints."""
+        return zip(self.x.tolist(), self.y.tolist())
+
+class photonFIFO:
+    def __init__(self, capacity=PHOTON_CAPACITY, policy=DROP_NEWEST,
+                 maxAge=MAX_AGE):
+        self.capacity = capacity
+        self.policy = checkPolicy(policy)
+        self.maxAge = maxAge
+        self.blocks = deque()
+        self.photonCount = 0
+        self.highWater = 0
+        self.putPhotons = 0
+        self.droppedBlocks = 0  # blocks refused completely
+        self.drops = dropReporter('parll', 'Photon FIFO', 'photons')
+        self.notEmpty = asyncio.Event()
+
+    @property
+    def droppedPhotons(self):
+        return self.drops.total
+
+    def qsize(self):
+        return self.photonCount
+
+    def empty(self):
+        return not self.blocks
+
+    def full(self):
+        return self.photonCount >= self.capacity
+
+    def evict(self, reason):
+        block = self.blocks.popleft()
+        self.photonCount -= block.count
+        self.drops.drop(reason, block.count)
+        if not self.blocks:
+            self.notEmpty.clear()
+
+    def expire(self, now):
+        deadline = now - self.maxAge
+        while self.blocks and self.blocks[0].rcvTime < deadline:
+            self.evict('expired')
+
+    def put_nowait(self, block):
+        """Queue a block under the policy; return the photons accepted."""
+        policy = self.policy
+        if policy == DEADLINE:
+            self.expire(time.time())
+        count = block.count
+        space = self.capacity - self.photonCount
+        if count > space:
+            if policy == DROP_NEWEST:
+                self.drops.drop('rejected', count - max(space, 0))
+                if space <= 0:
+                    self.droppedBlocks += 1
+                    return 0
+                block = block.head(space)
+            else:
+                if policy == KEEP_LATEST:
+                    while self.blocks:
+                        self.evict('evicted')
+                else:
+                    while self.blocks and \
+                          self.capacity - self.photonCount < count:
+                        self.evict('evicted')
+                if count > self.capacity:
+                    self.drops.drop('rejected', count - self.capacity)
+                    block = block.tail(self.capacity)
+        if block.count == 0:
+            return 0
+
+        self.blocks.append(block)
+        self.photonCount += block.count
+        self.putPhotons += block.count
+        if self.photonCount > self.highWater:
+            self.highWater = self.photonCount
+        self.notEmpty.set()
+        return block.count
+
+    def get_nowait(self):
+        if self.policy == DEADLINE:
+            self.expire(time.time())
+        block = self.blocks.popleft()  # IndexError when empty
+        self.photonCount -= block.count
+        if not self.blocks:
+            self.notEmpty.clear()
+        return block
+
+    async def get(self):
+        while True:
+            while not self.blocks:
+                await self.notEmpty.wait()
+            try:
+                return self.get_nowait()
+            except IndexError:
+                pass  # everything had expired
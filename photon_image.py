@@ -0,0 +1,246 @@
+#!/usr/bin/python3
+# photon_image.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# 256x256 quick-look photon image for VIM-PARLL for JHU's Rocket Lab.
+###############################################################################
+# The packet handler only appends each decoded photonBlock to a pending list.
+# Every BIN_INTERVAL seconds run() bins everything pending into the frame
+# being integrated, with one np.bincount over y * 256 + x (np.add.at for
+# small batches). After `window` seconds the frames are swapped: the
+# finished frame becomes the snapshot and the other buffer is cleared for the
+# next window, so readers always see a complete integration.
+#
+# Snapshots are published to a memory-mapped file (and summarized by the
+# 'image' control command). Layout (little-endian):
+#   [0:64]   IMAGE_HEADER: magic, version, size, window, update sequence,
+#            frame number, frame start and end (time.time()), photons
+#   [64: ]   size * size uint32 counts, row y, column x
+# The update sequence is odd while a frame is being written; readImage()
+# retries until it reads the same even sequence before and after the copy.
+#
+#   ./photon_image.py /dev/shm/vim-parll.img
+###############################################################################
+
+import sys
+import os
+import mmap
+import struct
+import asyncio
+import time
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAGIC = b'VIMIMG01'
+VERSION = 1
+IMAGE_SIZE = 256
+PIXELS = IMAGE_SIZE * IMAGE_SIZE
+IMAGE_HEADER = struct.Struct('<8sHHdQQddQ4x')  # 64 bytes
+SEQUENCE = struct.Struct('<Q')
+SEQUENCE_OFFSET = 20
+WINDOW = 1.0  # seconds integrated per frame
+BIN_INTERVAL = 0.1  # seconds between binning passes
+BINCOUNT_MIN = 4096  # photons per pass from which bincount beats add.at
+MAX_PENDING = 1 << 20  # photons held before binning early
+READ_RETRIES = 100
+
+def emptyFrame():
+    if np is not None:
+        return np.zeros(PIXELS, np.uint32)
+    return array('I', bytes(4 * PIXELS))
+
+class photonImage:
+    def __init__(self, path=None, window=WINDOW, interval=BIN_INTERVAL):
+        self.path = path
+        self.window = window
+        self.interval = interval
+        self.frame = emptyFrame()  # being integrated
+        self.snapshot = emptyFrame()  # last complete frame
+        self.pending = []
+        self.pendingPhotons = 0
+        self.frameStart = time.time()
+        self.frameNumber = 0
+        self.framePhotons = 0
+        self.snapshotInfo = None
+        self.binTime = 0.0  # seconds spent binning
+        self.map = None
+        if path is not None:
+            self.map = self.openMap(path)
+
+    def openMap(self, path):
+        size = IMAGE_HEADER.size + 4 * PIXELS
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            imageMap = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        IMAGE_HEADER.pack_into(imageMap, 0, MAGIC, VERSION, IMAGE_SIZE,
+                               self.window, 0, 0, 0.0, 0.0, 0)
+        return imageMap
+
+    def add(self, block):
+        """Queue a photonBlock for binning (called per packet)."""
+        self.pending.append(block)
+        self.pendingPhotons += block.count
+        if self.pendingPhotons >= MAX_PENDING:
+            self.binPending()
+
+    def binPending(self):
+        if not self.pending:
+            return
+        t0 = time.perf_counter()
+        blocks = self.pending
+        self.pending = []
+        count = self.pendingPhotons
+        self.pendingPhotons = 0
+        frame = self.frame
+        if np is not None:
+            x = np.concatenate([block.x for block in blocks])
+            y = np.concatenate([block.y for block in blocks])
+            pixels = (y.astype(np.intp) << 8) | x
+            if count >= BINCOUNT_MIN:
+                frame += np.bincount(pixels, minlength=PIXELS) \
+                         .astype(np.uint32, copy=False)
+            else:
+                np.add.at(frame, pixels, 1)
+        else:
+            for block in blocks:
+                for x, y in zip(block.x, block.y):
+                    frame[(y << 8) | x] += 1
+        self.framePhotons += count
+        self.binTime += time.perf_counter() - t0
+
+    def swap(self, now):
+        """Finish the frame being integrated and start the next one."""
+        self.binPending()
+        self.frame, self.snapshot = self.snapshot, self.frame
+        if np is not None:
+            self.frame.fill(0)
+        else:
+            self.frame = emptyFrame()
+        self.frameNumber += 1
+        self.snapshotInfo = {'frame': self.frameNumber,
+                             'start': self.frameStart, 'end': now,
+                             'photons': self.framePhotons}
+        self.frameStart = now
+        self.framePhotons = 0
+        if self.map is not None:
+            self.publish()
+
+    def publish(self):
+        imageMap = self.map
+        sequence = SEQUENCE.unpack_from(imageMap, SEQUENCE_OFFSET)[0] + 1
+        SEQUENCE.pack_into(imageMap, SEQUENCE_OFFSET, sequence)  # odd: busy
+        start = IMAGE_HEADER.size
+        imageMap[start:start + 4 * PIXELS] = memoryview(self.snapshot) \
+                                             .cast('B')
+        info = self.snapshotInfo
+        IMAGE_HEADER.pack_into(imageMap, 0, MAGIC, VERSION, IMAGE_SIZE,
+                               self.window, sequence + 1, info['frame'],
+                               info['start'], info['end'], info['photons'])
+
+    def clear(self):
+        self.pending = []
+        self.pendingPhotons = 0
+        self.frame = emptyFrame()
+        self.frameStart = time.time()
+        self.framePhotons = 0
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.time()
+            if now - self.frameStart >= self.window:
+                self.swap(now)
+            else:
+                self.binPending()
+
+    def summary(self):
+        summary = {'window': self.window, 'frames': self.frameNumber,
+                   'photons': self.framePhotons + self.pendingPhotons,
+                   'bin_time_s': round(self.binTime, 6),
+                   'file': self.path}
+        if self.snapshotInfo is not None:
+            info = self.snapshotInfo
+            peak = self.snapshot.max() if np is not None else \
+                   max(self.snapshot)
+            summary['last'] = dict(info, peak=int(peak),
+                                   duration=round(info['end'] -
+                                                  info['start'], 6))
+        return summary
+
+    def command(self, args):
+        """Control socket 'image' command: [window <s> | clear]."""
+        if not args:
+            return self.summary()
+        if args[0] == 'window' and len(args) == 2:
+            window = float(args[1])
+            if window <= 0:
+                raise ValueError('window must be positive')
+            self.window = window
+            return self.summary()
+        if args[0] == 'clear':
+            self.clear()
+            return self.summary()
+        raise ValueError('usage: image [window <seconds> | clear]')
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+def readImage(path):
+    """Return (info, counts) of the last frame in a photon image file."""
+    with open(path, 'rb') as f:
+        imageMap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        for _ in range(READ_RETRIES):
+            (magic, version, size, window, sequence, frame, start, end,
+             photons) = IMAGE_HEADER.unpack_from(imageMap, 0)
+            if magic != MAGIC:
+                raise ValueError(f'\'{path}\' is not a photon image file')
+            if sequence & 1:
+                time.sleep(0.001)
+                continue
+            data = imageMap[IMAGE_HEADER.size:
+                            IMAGE_HEADER.size + 4 * size * size]
+            if SEQUENCE.unpack_from(imageMap, SEQUENCE_OFFSET)[0] == sequence:
+                break
+        else:
+            raise TimeoutError(f'\'{path}\' is being rewritten')
+    finally:
+        imageMap.close()
+    info = {'size': size, 'window': window, 'frame': frame,
+            'start': start, 'end': end, 'photons': photons}
+    if np is not None:
+        counts = np.frombuffer(data, np.uint32).reshape(size, size)
+    else:
+        counts = array('I')
+        counts.frombytes(data)
+    return info, counts
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if not argv:
+        print(f'usage: {sys.argv[0]} <image file>')
+        return
+    info, counts = readImage(argv[0])
+    print(info)
+    if np is not None and info['photons']:
+        y, x = np.unravel_index(int(np.argmax(counts)), counts.shape)
+        rows, cols = np.indices(counts.shape)
+        total = counts.sum()
+        print(f'peak {int(counts[y, x])} at x={x} y={y}, ' \
+              f'centroid x={(cols * counts).sum() / total:.1f} ' \
+              f'y={(rows * counts).sum() / total:.1f}')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+# photon_ring.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Single-producer/single-consumer photon ring buffer (VIM-PARLL).
+###############################################################################
+# Hands photons from the asyncio packet handler to the output thread. x and y
+# live in two preallocated bytearrays; `head` is only written by the producer
+# and `tail` only by the consumer, each after the data it covers has been
+# copied, so no lock is needed. The producer side has the same put_nowait()
+# and drop counters as photonFIFO, so the packet handler can feed either.
+###############################################################################
+
+import threading
+
+from queue_policy import dropReporter
+
+RING_CAPACITY = 4096
+
+def roundUpPow2(n):
+    return 1 << max(n - 1, 1).bit_length()
+
+class photonRing:
+    def __init__(self, capacity=RING_CAPACITY):
+        self.capacity = roundUpPow2(capacity)
+        self.mask = self.capacity - 1
+        self.xs = bytearray(self.capacity)
+        self.ys = bytearray(self.capacity)
+        self.head = 0  # total photons written (producer)
+        self.tail = 0  # total photons read (consumer)
+        self.dataReady = threading.Event()
+        self.highWater = 0
+        self.putPhotons = 0
+        self.droppedPhotons = 0  # photons lost to overruns
+        self.overruns = 0  # blocks that did not fit completely
+        self.drops = dropReporter('parll', 'Photon Ring', 'photons')
+
+    def qsize(self):
+        return self.head - self.tail
+
+    def empty(self):
+        return self.head == self.tail
+
+    def full(self):
+        return self.head - self.tail >= self.capacity
+
+    def put_nowait(self, block):
+        """Copy a photonBlock in; return the number of photons accepted."""
+        head = self.head
+        count = block.count
+        space = self.capacity - (head - self.tail)
+        if count > space:
+            self.overruns += 1
+            self.droppedPhotons += count - space
+            self.drops.drop('rejected', count - space)
+            count = space
+        if count <= 0:
+            return 0
+
+        start = head & self.mask
+        first = min(count, self.capacity - start)
+        x = memoryview(block.x).cast('B')
+        y = memoryview(block.y).cast('B')
+        self.xs[start:start + first] = x[:first]
+        self.ys[start:start + first] = y[:first]
+        if first < count:
+            self.xs[:count - first] = x[first:count]
+            self.ys[:count - first] = y[first:count]
+
+        self.head = head + count
+        self.putPhotons += count
+        depth = self.head - self.tail
+        if depth > self.highWater:
+            self.highWater = depth
+        self.dataReady.set()
+        return count
+
+    def get(self, maxCount, timeout=None):
+        """Wait for photons; return (xs, ys) bytes of up to maxCount."""
+        while self.head == self.tail:
+            self.dataReady.clear()
+            if self.head != self.tail:
+                break
+            if not self.dataReady.wait(timeout):
+                return b'', b''
+
+        tail = self.tail
+        start = tail & self.mask
+        count = min(self.head - tail, maxCount, self.capacity - start)
+        xs = bytes(self.xs[start:start + count])
+        ys = bytes(self.ys[start:start + count])
+        self.tail = tail + count
+        return xs, ys
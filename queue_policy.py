@@ -0,0 +1,168 @@
+#!/usr/bin/python3
+# queue_policy.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Bounded queues with overflow policies for JHU's Rocket Lab.
+###############################################################################
+# What happens when a queue is full (or its data is too old):
+#   drop-newest - the new item is refused (the old asyncio.Queue behavior)
+#   drop-oldest - the oldest items are evicted to make room
+#   keep-latest - the whole backlog is flushed, only the new item is kept
+#   deadline    - items older than maxAge (by receive time) are expired on put
+#                 and get; if still full, the oldest are evicted
+#
+# packetQueue holds (rcv_time, ...) tuples and has the asyncio.Queue methods
+# the services use. put_nowait() applies the policy and never blocks; put()
+# waits for space instead (replay, tests). Drops are counted per reason and
+# reported by a dropReporter at most once per DROP_LOG_TIME seconds.
+###############################################################################
+
+import asyncio
+import logging
+import time
+from collections import deque
+
+DROP_NEWEST = 'drop-newest'
+DROP_OLDEST = 'drop-oldest'
+KEEP_LATEST = 'keep-latest'
+DEADLINE = 'deadline'
+POLICIES = (DROP_NEWEST, DROP_OLDEST, KEEP_LATEST, DEADLINE)
+
+PACKET_CAPACITY = 32
+MAX_AGE = 0.1  # seconds, for the deadline policy
+DROP_LOG_TIME = 1  # minimum seconds between drop warnings
+
+def checkPolicy(policy):
+    if policy not in POLICIES:
+        raise ValueError(f'unknown queue policy \'{policy}\'')
+    return policy
+
+class dropReporter:
+    """Counts drops by reason and logs a summary at most every interval."""
+    def __init__(self, loggerName, name, unit='packets',
+                 interval=DROP_LOG_TIME):
+        self.logger = logging.getLogger(loggerName)
+        self.name = name
+        self.unit = unit
+        self.interval = interval
+        self.rejected = 0  # new data refused
+        self.evicted = 0  # old data pushed out
+        self.expired = 0  # data older than the deadline
+        self.lastLog = 0
+        self.lastTotal = 0
+
+    @property
+    def total(self):
+        return self.rejected + self.evicted + self.expired
+
+    def drop(self, reason, count=1):
+        setattr(self, reason, getattr(self, reason) + count)
+        now = time.perf_counter()
+        if now - self.lastLog >= self.interval:
+            total = self.total
+            self.logger.warn(f'{self.name}: dropped {total - self.lastTotal} ' \
+                             f'{self.unit} (rejected={self.rejected} ' \
+                             f'evicted={self.evicted} expired={self.expired})')
+            self.lastLog = now
+            self.lastTotal = total
+
+    def summary(self):
+        return {'rejected': self.rejected, 'evicted': self.evicted,
+                'expired': self.expired}
+
+class packetQueue:
+    def __init__(self, capacity=PACKET_CAPACITY, policy=DROP_NEWEST,
+                 maxAge=MAX_AGE, loggerName='bcast',
+                 name='Incoming Packet Queue'):
+        self.capacity = capacity
+        self.policy = checkPolicy(policy)
+        self.maxAge = maxAge
+        self.items = deque()
+        self.highWater = 0
+        self.drops = dropReporter(loggerName, name)
+        self.notEmpty = asyncio.Event()
+        self.notFull = asyncio.Event()
+        self.notFull.set()
+
+    def qsize(self):
+        return len(self.items)
+
+    def empty(self):
+        return not self.items
+
+    def setCapacity(self, capacity):
+        # items over a smaller capacity stay until they are taken
+        self.capacity = capacity
+        if len(self.items) < capacity:
+            self.notFull.set()
+        else:
+            self.notFull.clear()
+
+    def full(self):
+        return len(self.items) >= self.capacity
+
+    def expire(self, now):
+        items = self.items
+        deadline = now - self.maxAge
+        expired = 0
+        while items and items[0][0] < deadline:
+            items.popleft()
+            expired += 1
+        if expired:
+            self.drops.drop('expired', expired)
+            if len(items) < self.capacity:
+                self.notFull.set()
+            if not items:
+                self.notEmpty.clear()
+
+    def put_nowait(self, item):
+        """Queue an item under the policy; False if it was refused."""
+        items = self.items
+        if self.policy == DEADLINE:
+            self.expire(time.time())
+        if len(items) >= self.capacity:
+            if self.policy == DROP_NEWEST:
+                self.drops.drop('rejected')
+                return False
+            if self.policy == KEEP_LATEST:
+                self.drops.drop('evicted', len(items))
+                items.clear()
+            else:
+                evicted = len(items) - self.capacity + 1
+                for _ in range(evicted):
+                    items.popleft()
+                self.drops.drop('evicted', evicted)
+        items.append(item)
+        if len(items) > self.highWater:
+            self.highWater = len(items)
+        if len(items) >= self.capacity:
+            self.notFull.clear()
+        self.notEmpty.set()
+        return True
+
+    async def put(self, item):
+        """Wait for space rather than dropping."""
+        while len(self.items) >= self.capacity:
+            await self.notFull.wait()
+        self.put_nowait(item)
+
+    def get_nowait(self):
+        if self.policy == DEADLINE:
+            self.expire(time.time())
+        item = self.items.popleft()  # IndexError when empty
+        if not self.items:
+            self.notEmpty.clear()
+        if len(self.items) < self.capacity:
+            self.notFull.set()
+        return item
+
+    async def get(self):
+        while True:
+            while not self.items:
+                await self.notEmpty.wait()
+            try:
+                return self.get_nowait()
+            except IndexError:
+                self.notEmpty.clear()  # everything had expired
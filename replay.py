@@ -0,0 +1,170 @@
+#!/usr/bin/python3
+# replay.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Replays a capture_ring file into a VIM-BCAST or VIM-PARLL packetHandler.
+###############################################################################
+# Datagrams are fed to packetHandler.qPacket in capture order, restamped with
+# the replay time:
+#   --speed 1    original inter-arrival times
+#   --speed N    N times faster (0.5 = half speed)
+#   --speed 0    as fast as the handler takes them
+# The queue is never dropped from (the feeder waits for space), so repeated
+# replays of one capture see the same packets in the same order.
+#
+# parll decodes into a photonFIFO drained by the shift register on a fake
+# GPIO backend (--shiftOut fake) or simply discarded (--shiftOut none). bcast
+# forwards to --bcastIP:--bcastPort (raw socket, root). The service metrics
+# are printed as JSON at the end; --profile writes cProfile stats.
+#
+#   ./replay.py /var/tmp/vim-parll.cap --service parll --speed 0 \
+#               --profile replay.prof
+###############################################################################
+
+import sys
+import argparse
+import shlex
+import asyncio
+import cProfile
+import json
+import logging
+import time
+
+import metrics
+import gpio_backend
+from capture_ring import readCapture, captureInfo
+from photon_fifo import photonFIFO, PHOTON_CAPACITY
+
+DRAIN_POLL = 0.01  # seconds between checks that the handler is done
+
+async def feed(qPacket, capture, speed, srcIP, limit):
+    count = 0
+    t0 = None
+    start = time.perf_counter()
+    for rcvTime, addr, data in capture:
+        if srcIP is not None and addr[0] != srcIP:
+            continue
+        if limit and count >= limit:
+            break
+        if speed > 0:
+            if t0 is None:
+                t0 = rcvTime
+            delay = start + (rcvTime - t0) / speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        now = time.time()
+        await qPacket.put((now, addr, data, now))
+        count += 1
+    return count
+
+async def discardFIFO(qFIFO):
+    while True:
+        await qFIFO.get()
+
+def makeParll(opts):
+    from packet_handler_parll import packetHandler
+    from shift_register import GPIO_to_cRIO
+
+    qFIFO = photonFIFO(capacity=opts.fifoPhotons)
+    pktHandler = packetHandler(qPacket=asyncio.Queue(maxsize=32),
+                               qFIFO=qFIFO,
+                               reorderWindow=opts.reorderWindow)
+    tasks = [pktHandler.start()]
+    if opts.shiftOut == 'fake':
+        pins = [1, 2, 3, 5, 6, 13, 14, 15]  # as in main_parll.PIN_LIST
+        gpio = gpio_backend.fakeGPIO(pins[0], pins[1], pins[2], pins[3],
+                                     pins[4], pins[6], pins[7], keep=0)
+        shiftReg = GPIO_to_cRIO(qFIFO=qFIFO,
+                                inputPin=pins[0], clockPin=pins[1],
+                                latchPin=pins[2], clearPin=pins[3],
+                                outEnPin=pins[4], snapFullPin=pins[5],
+                                snapEmptyPin=pins[6], snapReadPin=pins[7],
+                                order=gpio_backend.MSBFIRST, gpio=gpio)
+        tasks.append(shiftReg.start())
+    else:
+        tasks.append(discardFIFO(qFIFO))
+    return pktHandler, tasks, lambda: qFIFO.empty()
+
+def makeBcast(opts):
+    from packet_handler_bcast import packetHandler
+
+    pktHandler = packetHandler(qPacket=asyncio.Queue(maxsize=32),
+                               qXmit=asyncio.Queue(maxsize=32),
+                               destinations=[(opts.bcastIP,
+                                              opts.bcastPort)])
+    return pktHandler, [pktHandler.start()], lambda: True
+
+async def replay(opts):
+    if opts.service == 'parll':
+        pktHandler, tasks, outputIdle = makeParll(opts)
+    else:
+        pktHandler, tasks, outputIdle = makeBcast(opts)
+    workers = [asyncio.ensure_future(task) for task in tasks]
+
+    start = time.perf_counter()
+    count = await feed(pktHandler.qPacket, readCapture(opts.capture),
+                       opts.speed, opts.srcIP, opts.limit)
+    while not (pktHandler.qPacket.empty() and outputIdle()):
+        await asyncio.sleep(DRAIN_POLL)
+    await asyncio.sleep(DRAIN_POLL)  # let the last packet finish
+    elapsed = time.perf_counter() - start
+
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    return {'capture': dict(captureInfo(opts.capture), path=opts.capture),
+            'service': opts.service,
+            'speed': opts.speed,
+            'packets': count,
+            'elapsed_s': round(elapsed, 6),
+            'packets_per_s': round(count / elapsed, 1) if elapsed else 0.0,
+            'metrics': metrics.getRegistry(opts.service).snapshot()}
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if isinstance(argv, str):
+        argv = shlex.split(argv)
+
+    parser = argparse.ArgumentParser(sys.argv[0])
+    parser.add_argument('capture', type=str, help='capture_ring file')
+    parser.add_argument('--service', type=str, default='parll',
+                        choices=['bcast', 'parll'])
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='replay speed, 1=original, 0=as fast as possible')
+    parser.add_argument('--srcIP', type=str, default=None,
+                        help='only replay datagrams from this address')
+    parser.add_argument('--limit', type=int, default=0,
+                        help='stop after this many datagrams, 0=all')
+    parser.add_argument('--shiftOut', type=str, default='fake',
+                        choices=['fake', 'none'],
+                        help='parll: shift out on a fake GPIO or discard')
+    parser.add_argument('--fifoPhotons', type=int, default=PHOTON_CAPACITY)
+    parser.add_argument('--reorderWindow', type=int, default=0)
+    parser.add_argument('--bcastIP', type=str, default='127.0.0.1',
+                        help='bcast: address to forward to')
+    parser.add_argument('--bcastPort', type=int, default=60001,
+                        help='bcast: UDP port to forward to')
+    parser.add_argument('--profile', type=str, default=None,
+                        help='write cProfile stats of the replay here')
+    parser.add_argument('--logLevel', type=int, default=logging.WARN)
+    opts = parser.parse_args(argv)
+
+    logging.basicConfig(datefmt = "%Y-%m-%d %H:%M:%S",
+                        format = '%(asctime)s.%(msecs)03dZ ' \
+                                 '%(name)-10s %(levelno)s ' \
+                                 '%(filename)s:%(lineno)d %(message)s')
+    logging.getLogger(opts.service).setLevel(opts.logLevel)
+
+    if opts.profile is not None:
+        profiler = cProfile.Profile()
+        result = profiler.runcall(asyncio.run, replay(opts))
+        profiler.dump_stats(opts.profile)
+    else:
+        result = asyncio.run(replay(opts))
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/python3
+# rt_profile.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Opt-in real-time profile (--rt) for VIM-BCAST and VIM-PARLL.
+###############################################################################
+# Applied by main_*.py before the sockets are opened:
+#   CPU pinning  - the event loop thread (and the VIM-PARLL output thread) on
+#                  their own cores, see --rtCPUs. Core 0 is left to the OS.
+#   SCHED_FIFO   - the pinned threads at --rtPriority, above cron, logging
+#                  and every other SCHED_OTHER task
+#   mlockall     - current and future pages locked, so no page faults on the
+#                  packet path
+#   GC control   - after start-up everything allocated so far is frozen out of
+#                  the collector (gc.freeze) and automatic collection is off.
+#                  collectIdle() runs from a loop timer, so collections land
+#                  between packets rather than inside a handler: while busy
+#                  only the young generations, in GC_YOUNG object steps; the
+#                  older ones once no packet has arrived for --gcIdle
+#                  seconds, and a full collection after GC_FULL_IDLE.
+# Each step that the kernel refuses (no CAP_SYS_NICE, RLIMIT_MEMLOCK, ...) is
+# logged and skipped; the 'rt' stats gauge shows what was applied. Collector
+# pauses are the 'gc_pause' histogram.
+#
+#   ./bench_jitter.py compares timer wake-up latency with and without it.
+###############################################################################
+
+import os
+import gc
+import time
+import asyncio
+import logging
+import ctypes
+import ctypes.util
+
+import metrics
+
+MCL_CURRENT = 1
+MCL_FUTURE = 2
+PRIORITY = 50  # SCHED_FIFO priority, 1-99
+GC_IDLE = 0.2  # seconds without packets before an idle collection
+GC_FULL_IDLE = 5  # seconds without packets before a full collection
+GC_IDLE_MIN = 100  # young objects worth an idle collection
+GC_YOUNG = 2000  # young objects collected in one step while busy
+GC_OLDER = 10  # busy young collections per generation 1 collection
+IDLE_CHECK = 0.01  # seconds between collector checks
+
+def parseCPUs(spec):
+    """'2,3' -> [2, 3]; '' -> []."""
+    return [int(cpu) for cpu in spec.split(',') if cpu.strip()]
+
+def lockMemory():
+    """mlockall(MCL_CURRENT | MCL_FUTURE)."""
+    libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    if libc.mlockall(MCL_CURRENT | MCL_FUTURE) != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+
+class rtProfile:
+    def __init__(self, name, cpus=(), priority=PRIORITY, lock=True,
+                 gcIdle=GC_IDLE):
+        self.name = name
+        self.logger = logging.getLogger(name)
+        self.metrics = metrics.getRegistry(name)
+        self.cpus = list(cpus)  # event loop, output thread
+        self.priority = priority
+        self.lock = lock
+        self.gcIdle = gcIdle
+        self.applied = {}  # step: True or the reason it was skipped
+        self.gcPause = self.metrics.histogram('gc_pause')
+        self.gcIdleCount = self.metrics.counter('gc_idle')
+        self.gcBusyCount = self.metrics.counter('gc_busy')
+        self.gcStart = None
+        self.metrics.gauge('rt', self.summary)
+
+    def step(self, name, action):
+        try:
+            action()
+        except (OSError, AttributeError, ValueError) as e:
+            self.applied[name] = str(e)
+            self.logger.warn(f'RT_PROFILE: {name} not applied: \'{e}\'')
+            return False
+        self.applied[name] = True
+        return True
+
+    def applyThread(self, role, index):
+        """Pin and prioritize the calling thread as cpus[index]."""
+        if index < len(self.cpus):
+            cpu = self.cpus[index]
+            if cpu >= os.cpu_count():
+                self.applied[f'{role}_cpu'] = f'no CPU {cpu}'
+                self.logger.warn(f'RT_PROFILE: no CPU {cpu} for the {role}')
+            else:
+                # pid 0 is the calling thread for both calls on Linux
+                self.step(f'{role}_cpu',
+                          lambda: os.sched_setaffinity(0, {cpu}))
+        if self.priority:
+            self.step(f'{role}_fifo',
+                      lambda: os.sched_setscheduler(
+                          0, os.SCHED_FIFO, os.sched_param(self.priority)))
+
+    def apply(self):
+        """Pin the event loop thread, lock memory and time GC pauses."""
+        self.applyThread('loop', 0)
+        if self.lock:
+            self.step('mlockall', lockMemory)
+        gc.callbacks.append(self.onCollect)
+        self.logger.info(f'RT_PROFILE: {self.summary()}')
+
+    def outputThread(self):
+        """threadedOutput start-up hook for the VIM-PARLL output thread."""
+        self.applyThread('output', 1)
+
+    def freezeGC(self):
+        """Call when start-up is done: freeze its objects, stop auto GC."""
+        gc.collect()
+        if hasattr(gc, 'freeze'):
+            gc.freeze()
+            self.applied['gc_freeze'] = gc.get_freeze_count()
+        gc.disable()
+        self.applied['gc_auto'] = False
+
+    def onCollect(self, phase, info):
+        if phase == 'start':
+            self.gcStart = time.perf_counter()
+        elif self.gcStart is not None:
+            self.gcPause.record(time.perf_counter() - self.gcStart)
+            self.gcStart = None
+
+    async def collectIdle(self, activity):
+        """Collect while `activity()` (e.g. rx_packets) stands still."""
+        last = activity()
+        quietSince = time.perf_counter()
+        fullDone = False
+        while True:
+            await asyncio.sleep(IDLE_CHECK)
+            now = time.perf_counter()
+            count = activity()
+            young, youngRuns, _ = gc.get_count()
+            if count != last:
+                last = count
+                quietSince = now
+                fullDone = False
+                if young >= GC_YOUNG:
+                    gc.collect(1 if youngRuns >= GC_OLDER else 0)
+                    self.gcBusyCount.value += 1
+                continue
+            quiet = now - quietSince
+            if quiet >= GC_FULL_IDLE and not fullDone:
+                gc.collect()
+                fullDone = True
+                self.gcIdleCount.value += 1
+            elif quiet >= self.gcIdle and young >= GC_IDLE_MIN:
+                gc.collect(1)
+                self.gcIdleCount.value += 1
+
+    def summary(self):
+        return {'cpus': self.cpus, 'priority': self.priority,
+                'applied': self.applied}
@@ -0,0 +1,102 @@
+#!/usr/bin/python3
+# rx_timestamp.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Kernel receive timestamps (SO_TIMESTAMPNS) for JHU's Rocket Lab.
+###############################################################################
+# time.time() in datagram_received() is taken after the datagram has waited
+# in the socket buffer and for the event loop, so bursts that pile up there
+# do not show in the latency numbers. With SO_TIMESTAMPNS the kernel stamps
+# each datagram when it arrives (CLOCK_REALTIME, like time.time()) and hands
+# the stamp over as SCM_TIMESTAMPNS ancillary data.
+#
+# asyncio's datagram transports use recvfrom() and drop ancillary data, so
+# timestampReader reads the socket with recvmsg() from a loop reader and
+# calls datagram_received(data, addr, rcvTime) with the kernel time. The
+# batch receiver (mmsg_io) reads the same control messages per datagram.
+# The stamp then travels as the rcv_time of the queued packet and the
+# rcvTime of its photonBlock.
+###############################################################################
+
+import socket
+import struct
+import time
+import logging
+
+SO_TIMESTAMPNS = getattr(socket, 'SO_TIMESTAMPNS', 35)  # Linux value
+SCM_TIMESTAMPNS = SO_TIMESTAMPNS
+TIMESPEC = struct.Struct('@ll')  # tv_sec, tv_nsec
+CMSG_HEADER = struct.Struct('@Nii')  # cmsg_len, cmsg_level, cmsg_type
+CMSG_ALIGN = struct.calcsize('@N')
+CONTROL_SIZE = socket.CMSG_SPACE(TIMESPEC.size)
+MAX_DATAGRAM = 65535
+READ_BURST = 16  # datagrams read per loop callback
+
+def enable(sock):
+    sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+
+def fromAncillary(ancdata):
+    """Kernel receive time from recvmsg() ancillary data, or None."""
+    for level, kind, data in ancdata:
+        if level == socket.SOL_SOCKET and kind == SCM_TIMESTAMPNS:
+            sec, nsec = TIMESPEC.unpack_from(data)
+            return sec + nsec * 1e-9
+    return None
+
+def cmsgAlign(length):
+    return (length + CMSG_ALIGN - 1) & ~(CMSG_ALIGN - 1)
+
+def fromControl(buf, length):
+    """Kernel receive time from a raw msg_control buffer, or None."""
+    offset = 0
+    while offset + CMSG_HEADER.size <= length:
+        cmsgLen, level, kind = CMSG_HEADER.unpack_from(buf, offset)
+        if cmsgLen < CMSG_HEADER.size:
+            break
+        if level == socket.SOL_SOCKET and kind == SCM_TIMESTAMPNS:
+            sec, nsec = TIMESPEC.unpack_from(
+                buf, offset + cmsgAlign(CMSG_HEADER.size))
+            return sec + nsec * 1e-9
+        offset += cmsgAlign(cmsgLen)
+    return None
+
+class timestampReader:
+    def __init__(self, sock, datagramReceived, loggerName,
+                 bufSize=MAX_DATAGRAM):
+        self.logger = logging.getLogger(loggerName)
+        self.sock = sock
+        self.datagramReceived = datagramReceived
+        self.bufSize = bufSize
+        self.loop = None
+        self.missing = 0  # datagrams that came without a kernel timestamp
+        enable(sock)
+        sock.setblocking(False)
+
+    def start(self, loop):
+        self.loop = loop
+        loop.add_reader(self.sock.fileno(), self.read)
+
+    def read(self):
+        recvmsg = self.sock.recvmsg
+        for _ in range(READ_BURST):
+            try:
+                data, ancdata, flags, addr = recvmsg(self.bufSize,
+                                                     CONTROL_SIZE)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                self.logger.error(f'Error received: \'{e}\'')
+                return
+            rcvTime = fromAncillary(ancdata)
+            if rcvTime is None:
+                self.missing += 1
+                rcvTime = time.time()
+            self.datagramReceived(data, addr, rcvTime)
+
+    def close(self):
+        if self.loop is not None:
+            self.loop.remove_reader(self.sock.fileno())
+            self.loop = None
+        self.sock.close()
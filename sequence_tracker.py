@@ -0,0 +1,200 @@
+#!/usr/bin/python3
+# sequence_tracker.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Zero-order packet sequence tracking for VIM-PARLL for JHU's Rocket Lab.
+###############################################################################
+# Follows the 16-bit packet sequence number (with wraparound) and counts lost,
+# duplicate and late (out-of-order) packets. Late packets are dropped, as the
+# old "newest packet" check did. The skipped sequence numbers are remembered
+# (up to MISSING_SEQS), so a late packet that fills a gap takes its loss back
+# and one that was never counted lost (older than the first packet seen)
+# does not.
+#
+# With window > 0, packets that arrive ahead of a gap are held for up to
+# `window` packets or `budget` seconds waiting for the missing ones, and are
+# then released in order. accept() and expire() return the packets that are
+# ready; the caller should call expire() once timeUntilExpire() runs out.
+#
+# A jump of more than RESYNC_DISTANCE in either direction is taken as a
+# detector restart: the tracker resyncs instead of counting the gap as lost.
+#
+# The loss rate is sampled over RATE_INTERVAL windows by updateRates(), per
+# packet and whenever it is read through rates(), so it drops back to 0 once
+# a window passes without new losses, packets or not.
+###############################################################################
+
+from collections import deque
+
+SEQ_MOD = 0x10000
+SEQ_HALF = 0x8000
+RESYNC_DISTANCE = 4096
+RECENT_SEQS = 128  # sequence numbers remembered for duplicate detection
+MISSING_SEQS = RESYNC_DISTANCE  # skipped sequence numbers remembered
+RATE_INTERVAL = 1.0  # seconds per loss-rate sample
+
+class sequenceTracker:
+    def __init__(self, window=0, budget=0.005):
+        self.window = window
+        self.budget = budget
+        self.nextSeq = None
+        self.held = {}  # seq -> (arrival time, item)
+        self.recent = deque(maxlen=RECENT_SEQS)
+        self.recentSet = set()
+        self.missing = {}  # skipped seq -> None, oldest first
+
+        self.received = 0
+        self.delivered = 0
+        self.lost = 0
+        self.duplicates = 0
+        self.late = 0
+        self.reordered = 0
+        self.resyncs = 0
+        self.malformed = 0
+
+        self.rateTime = None
+        self.rateLost = 0
+        self.rateDelivered = 0
+        self.lossPerSec = 0.0
+        self.lossFraction = 0.0
+
+    def remember(self, seq):
+        if len(self.recent) == self.recent.maxlen:
+            self.recentSet.discard(self.recent[0])
+        self.recent.append(seq)
+        self.recentSet.add(seq)
+
+    def skip(self, first, count):
+        """Count `count` sequence numbers from `first` as lost."""
+        self.lost += count
+        missing = self.missing
+        start = max(count - MISSING_SEQS, 0)
+        for i in range(start, count):
+            missing[(first + i) % SEQ_MOD] = None
+        while len(missing) > MISSING_SEQS:
+            del missing[next(iter(missing))]
+
+    def accept(self, seq, item, now):
+        """Register packet `seq`; return the list of items now in order."""
+        self.received += 1
+        if self.nextSeq is None:
+            self.nextSeq = seq
+
+        ahead = (seq - self.nextSeq) % SEQ_MOD
+        if ahead >= SEQ_HALF:
+            # behind the next expected packet
+            if seq in self.recentSet or seq in self.held:
+                self.duplicates += 1
+            elif SEQ_MOD - ahead > RESYNC_DISTANCE:
+                return self.resync(seq, item)
+            else:
+                self.late += 1
+                if seq in self.missing:
+                    # it was counted lost when we skipped it
+                    del self.missing[seq]
+                    self.lost -= 1
+                self.remember(seq)
+            return []
+
+        if ahead > RESYNC_DISTANCE:
+            return self.resync(seq, item)
+
+        if ahead == 0:
+            ready = [item]
+            self.advance(seq)
+            self.releaseHeld(ready)
+            return ready
+
+        if seq in self.held:
+            self.duplicates += 1
+            return []
+
+        if self.window == 0:
+            # no reordering: skip the gap straight away
+            self.skip(self.nextSeq, ahead)
+            self.advance(seq)
+            return [item]
+
+        self.held[seq] = (now, item)
+        ready = []
+        if len(self.held) > self.window:
+            self.skipToHeld(ready)
+        return ready
+
+    def advance(self, seq):
+        self.remember(seq)
+        self.delivered += 1
+        self.nextSeq = (seq + 1) % SEQ_MOD
+
+    def releaseHeld(self, ready):
+        held = self.held
+        while self.nextSeq in held:
+            seq = self.nextSeq
+            ready.append(held.pop(seq)[1])
+            self.reordered += 1
+            self.advance(seq)
+
+    def skipToHeld(self, ready):
+        # give up on the gap before the oldest held packet
+        first = min(self.held,
+                    key=lambda seq: (seq - self.nextSeq) % SEQ_MOD)
+        self.skip(self.nextSeq, (first - self.nextSeq) % SEQ_MOD)
+        self.nextSeq = first
+        self.releaseHeld(ready)
+
+    def resync(self, seq, item):
+        ready = [held[1] for _, held in
+                 sorted(self.held.items(),
+                        key=lambda kv: (kv[0] - self.nextSeq) % SEQ_MOD)]
+        self.held.clear()
+        self.missing.clear()
+        self.resyncs += 1
+        ready.append(item)
+        self.advance(seq)
+        return ready
+
+    def timeUntilExpire(self, now):
+        """Seconds until held packets must be released, None if none held."""
+        if not self.held:
+            return None
+        oldest = min(arrival for arrival, _ in self.held.values())
+        return max(oldest + self.budget - now, 0.0)
+
+    def expire(self, now):
+        """Release held packets that have waited longer than the budget."""
+        ready = []
+        while self.held:
+            oldest = min(arrival for arrival, _ in self.held.values())
+            if now - oldest < self.budget:
+                break
+            self.skipToHeld(ready)
+        return ready
+
+    def updateRates(self, now):
+        if self.rateTime is None:
+            self.rateTime = now
+            return
+        elapsed = now - self.rateTime
+        if elapsed < RATE_INTERVAL:
+            return
+        lost = self.lost - self.rateLost
+        delivered = self.delivered - self.rateDelivered
+        self.lossPerSec = lost / elapsed
+        self.lossFraction = lost / (lost + delivered) if lost + delivered else 0.0
+        self.rateTime = now
+        self.rateLost = self.lost
+        self.rateDelivered = self.delivered
+
+    def rates(self, now):
+        """(lossPerSec, lossFraction), brought up to date at `now`."""
+        self.updateRates(now)
+        return self.lossPerSec, self.lossFraction
+
+    def summary(self):
+        return f'received={self.received} delivered={self.delivered} ' \
+               f'lost={self.lost} dup={self.duplicates} late={self.late} ' \
+               f'reordered={self.reordered} resyncs={self.resyncs} ' \
+               f'malformed={self.malformed} ' \
+               f'loss={self.lossPerSec:.1f}/s ({100 * self.lossFraction:.2f}%)'
@@ -11,11 +11,29 @@
 #
 # Shift out 123 (b1111011, byte 0-255) to data pin 1, clock pin 2 
 #   wiringpi.shiftOut(1, 2, 0, 123)
+#
+# Pipelined output (pipelined=True): the 74HC595 latch keeps photon N on the
+# outputs while photon N+1 is shifted in behind it, so the shift overlaps the
+# RIO read:
+#   shift N+1 | wait SNAP_FIFO_READ (N) | snapEmpty HIGH, outEn HIGH |
+#   wait SNAP_FIFO_READ LOW | latch N+1, outEn LOW, snapEmpty LOW
+# N+1 is only latched after N was acknowledged and the RIO dropped READ, so
+# the handshake order is the serial one. The last photon is finished
+# (acknowledged and released) whenever the queue runs empty; `releasing`
+# stays set until READ is seen LOW, so the next photon, pipelined or not,
+# waits for that before it is latched and never mistakes a stale READ for
+# its own acknowledgement.
 ###############################################################################
 
 import logging
 import asyncio
-import wiringpi as gpio
+import time
+
+from gpio_backend import wiringPiGPIO, MSBFIRST
+from gpio_edge import handshakeStats, waitForLevel
+import metrics
+import packet_trace
+from photon_fifo import photonFIFO
 
 PIN_LIST  = [  1,   2,   3,   5,   6,  13,  14,  15,  16,  17,  18,  19,  20]
 
@@ -33,16 +51,37 @@ LOW = 0
 HIGH = 1
 INPUT = 0
 OUTPUT = 1
-SLEEP_TIME = 0.000001
-uSLEEP_TIME = 1
+POLL_MIN_TIME = 0.00001  # first back-off step for SNAP_FIFO_READ polling
+POLL_MAX_TIME = 0.001  # longest sleep between SNAP_FIFO_READ polls
+SPIN_POLLS = 100  # output thread: polls before it starts sleeping
+STATS_TIME = 60  # seconds between handshake statistics log lines
+PHOTON_SAMPLE = 16  # shift_out/rio_ack recorded for one photon in this many
+TIMEOUT_LOG_TIME = 1  # minimum seconds between handshake timeout warnings
 
 class GPIO_to_cRIO:
     def __init__(self, qFIFO, 
                  inputPin, clockPin, latchPin, clearPin, outEnPin, 
                  snapFullPin, snapEmptyPin, snapReadPin,
-                 order, clockTime=0):
+                 order, clockTime=0, gpio=None,
+                 edge=None, handshakeTimeout=None, pipelined=False):
         self.logger = logging.getLogger('parll')
         self.qFIFO = qFIFO
+        self.gpio = gpio if gpio is not None else wiringPiGPIO()
+        self.edge = edge  # SNAP_FIFO_READ edge events, see gpio_edge
+        self.handshakeTimeout = handshakeTimeout  # seconds, None = forever
+        self.metrics = metrics.getRegistry('parll')
+        self.handshake = handshakeStats(self.metrics.histogram('rio_ack'))
+        self.lastTimeoutLog = 0
+        self.lastTimeouts = 0
+        self.shiftOutTime = self.metrics.histogram('shift_out')
+        self.rxToShift = self.metrics.histogram('rx_to_shift')
+        self.photonsOut = self.metrics.counter('photons_out')
+        tracer = packet_trace.getTracer('parll')
+        self.blockTrace = tracer.point('block')
+        self.shiftTrace = tracer.point('shift')
+        self.metrics.gauge('handshake_timeouts',
+                           lambda: self.handshake.timeouts)
+        self.edgeEvent = None
         self.inputPin = inputPin
         self.clockPin = clockPin
         self.latchPin = latchPin
@@ -52,43 +91,293 @@ class GPIO_to_cRIO:
         self.snapEmptyPin = snapEmptyPin
         self.snapReadPin =  snapReadPin
         self.order = order
-        self.clockTime = clockTime
+        self.clockTime = clockTime  # seconds, minimum time between photons
+        self.nextShift = 0.0
+        self.pollMinTime = POLL_MIN_TIME
+        self.pollMaxTime = POLL_MAX_TIME
+        self.pipelined = pipelined
+        self.presentTime = None  # photon on the outputs awaiting its ack
+        self.releasing = False  # released, SNAP_FIFO_READ not seen LOW yet
+        self.photonSeq = 0
+        self.sample = False  # the presented photon's ack goes to rio_ack
 
-        gpio.wiringPiSetup()
+        self.gpio.setup()
+        self.gpio.configurePhoton(inputPin, clockPin, latchPin, outEnPin,
+                                  snapEmptyPin, order)
         self.setupShiftPins()
         self.setDefaultStates()
         self.clearData()
 
     async def start(self):
+        if self.edge is not None and self.edge.pollable:
+            self.edgeEvent = asyncio.Event()
+            asyncio.get_event_loop().add_reader(self.edge.fileno(),
+                                                self.onEdge)
         while True:
-            if not self.qFIFO.empty():
-                data = await self.qFIFO.get()
-                self.logger.debug(f'{data}')
-                await self.handleData(data)
-            await asyncio.sleep(SLEEP_TIME)
+            block = await self.qFIFO.get()
+            if block.rcvTime:
+                self.rxToShift.record(time.time() - block.rcvTime)
+            if self.blockTrace.enabled:
+                self.blockTrace.record(block.count, block.rcvTime)
+            for photon in block.photons():
+                await self.handleData(photon)
+            self.photonsOut.value += block.count
+            if self.presentTime is not None and not self.qFIFO.qsize():
+                await self.finishPhoton()
 
     async def handleData(self, photon):
         x = photon[0]
         y = photon[1]
+        if self.pipelined:
+            return await self.handlePipelined(x, y)
 
-        self.shiftDataOut(y)
-        self.shiftDataOut(x)
-        self.latchData()
-        
-        self.writeData(self.outEnPin, LOW)
+        if self.clockTime:
+            # pace the photons at least clockTime apart (--tickRate)
+            wait = self.nextShift - time.perf_counter()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        if self.releasing and not await self.waitForRelease():
+            self.handshakeTimedOut()
+        if self.edge is not None:
+            self.edge.drain()
+        self.photonSeq += 1
+        sample = not self.photonSeq % PHOTON_SAMPLE
+        t0 = time.perf_counter()
+        self.nextShift = t0 + self.clockTime
+
+        # shift y then x, latch, assert outEn and SNAP_FIFO_EMPTY
+        self.gpio.writePhoton(x, y)
         #self.writeData(self.snapFullPin, HIGH)
-        self.writeData(self.snapEmptyPin, LOW)
+        t1 = time.perf_counter()
+        if sample:
+            self.shiftOutTime.record(t1 - t0)
+        if self.shiftTrace.enabled:
+            self.shiftTrace.record(x, y, t1 - t0)
 
         # wait for the SNAP_FIFO_READ
-        while gpio.digitalRead(self.snapReadPin) == LOW:
-            await asyncio.sleep(SLEEP_TIME)
+        if await self.waitForRead():
+            if sample:
+                self.handshake.record(time.perf_counter() - t1)
+        else:
+            self.handshakeTimedOut()
 
-        self.writeData(self.snapEmptyPin, HIGH)
         #self.writeData(self.snapFullPin, LOW)
+        self.releasePhoton()
+
+    async def handlePipelined(self, x, y):
+        # shift y then x behind the latched photon the RIO is reading
+        self.photonSeq += 1
+        t0 = time.perf_counter()
+        self.gpio.shiftPhoton(x, y)
+        t1 = time.perf_counter()
+        if not self.photonSeq % PHOTON_SAMPLE:
+            self.shiftOutTime.record(t1 - t0)
+        if self.shiftTrace.enabled:
+            self.shiftTrace.record(x, y, t1 - t0)
+
+        if self.presentTime is not None:
+            await self.finishPhoton()
+        if self.releasing and not await self.waitForRelease():
+            self.handshakeTimedOut()
+        if self.clockTime:
+            wait = self.nextShift - time.perf_counter()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        self.presentPhoton()
+
+    def presentPhoton(self):
+        # latch, assert outEn and SNAP_FIFO_EMPTY
+        if self.edge is not None:
+            self.edge.drain()
+        self.gpio.presentPhoton()
+        self.presentTime = time.perf_counter()
+        self.sample = not self.photonSeq % PHOTON_SAMPLE
+        self.nextShift = self.presentTime + self.clockTime
+
+    async def finishPhoton(self):
+        # wait for the SNAP_FIFO_READ of the photon on the outputs
+        if await self.waitForRead():
+            if self.sample:
+                self.handshake.record(time.perf_counter() - self.presentTime)
+        else:
+            self.handshakeTimedOut()
+        self.releasePhoton()
+
+    def releasePhoton(self):
+        self.writeData(self.snapEmptyPin, HIGH)
         self.writeData(self.outEnPin, HIGH)
+        self.presentTime = None
+        self.releasing = True
+
+    async def waitForRelease(self):
+        # the RIO drops SNAP_FIFO_READ once SNAP_FIFO_EMPTY is deasserted
+        timeout = self.handshakeTimeout
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        digitalRead = self.gpio.digitalRead
+        self.releasing = False
+        pollTime = 0
+        while digitalRead(self.snapReadPin) != LOW:
+            if deadline is not None and time.perf_counter() > deadline:
+                return False
+            await asyncio.sleep(pollTime)
+            pollTime = min(max(pollTime * 2, self.pollMinTime),
+                           self.pollMaxTime)
+        return True
+
+    def onEdge(self):
+        self.edge.drain()
+        self.edgeEvent.set()
+
+    async def waitForRead(self):
+        # returns False if the RIO did not answer within handshakeTimeout
+        timeout = self.handshakeTimeout
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        digitalRead = self.gpio.digitalRead
+
+        if self.edgeEvent is not None:
+            while True:
+                self.edgeEvent.clear()
+                if digitalRead(self.snapReadPin) != LOW:
+                    return True
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        return False
+                try:
+                    await asyncio.wait_for(self.edgeEvent.wait(), remaining)
+                except asyncio.TimeoutError:
+                    return False
+
+        # yield to the loop on the first poll, then back off exponentially
+        # so a stalled RIO does not keep a core busy
+        pollTime = 0
+        while digitalRead(self.snapReadPin) == LOW:
+            if deadline is not None and time.perf_counter() > deadline:
+                return False
+            await asyncio.sleep(pollTime)
+            pollTime = min(max(pollTime * 2, self.pollMinTime),
+                           self.pollMaxTime)
+        return True
+
+    def handleDataSync(self, x, y):
+        # blocking version of handleData() for the output thread
+        if self.pipelined:
+            return self.handlePipelinedSync(x, y)
+        if self.clockTime:
+            wait = self.nextShift - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+        if self.releasing and not self.waitForReleaseSync():
+            self.handshakeTimedOut()
+        if self.edge is not None:
+            self.edge.drain()
+        self.photonSeq += 1
+        sample = not self.photonSeq % PHOTON_SAMPLE
+        t0 = time.perf_counter()
+        self.nextShift = t0 + self.clockTime
+
+        self.gpio.writePhoton(x, y)
+        t1 = time.perf_counter()
+        if sample:
+            self.shiftOutTime.record(t1 - t0)
+        if self.shiftTrace.enabled:
+            self.shiftTrace.record(x, y, t1 - t0)
+
+        if self.waitForReadSync():
+            if sample:
+                self.handshake.record(time.perf_counter() - t1)
+        else:
+            self.handshakeTimedOut()
+
+        self.releasePhoton()
+
+    def handlePipelinedSync(self, x, y):
+        self.photonSeq += 1
+        t0 = time.perf_counter()
+        self.gpio.shiftPhoton(x, y)
+        t1 = time.perf_counter()
+        if not self.photonSeq % PHOTON_SAMPLE:
+            self.shiftOutTime.record(t1 - t0)
+        if self.shiftTrace.enabled:
+            self.shiftTrace.record(x, y, t1 - t0)
+
+        if self.presentTime is not None:
+            self.finishPhotonSync()
+        if self.releasing and not self.waitForReleaseSync():
+            self.handshakeTimedOut()
+        if self.clockTime:
+            wait = self.nextShift - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+        self.presentPhoton()
+
+    def finishPhotonSync(self):
+        if self.waitForReadSync():
+            if self.sample:
+                self.handshake.record(time.perf_counter() - self.presentTime)
+        else:
+            self.handshakeTimedOut()
+        self.releasePhoton()
+
+    def flushSync(self):
+        """Finish the photon left on the outputs by the pipelined mode."""
+        if self.presentTime is not None:
+            self.finishPhotonSync()
+
+    def waitForReleaseSync(self):
+        digitalRead = self.gpio.digitalRead
+        self.releasing = False
+        for _ in range(SPIN_POLLS):
+            if digitalRead(self.snapReadPin) == LOW:
+                return True
+        timeout = self.handshakeTimeout
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        pollTime = self.pollMinTime
+        while digitalRead(self.snapReadPin) != LOW:
+            if deadline is not None and time.perf_counter() > deadline:
+                return False
+            time.sleep(pollTime)
+            pollTime = min(pollTime * 2, self.pollMaxTime)
+        return True
+
+    def waitForReadSync(self):
+        timeout = self.handshakeTimeout
+        if self.edge is not None:
+            return waitForLevel(self.edge, timeout)
+
+        digitalRead = self.gpio.digitalRead
+        for _ in range(SPIN_POLLS):
+            if digitalRead(self.snapReadPin) != LOW:
+                return True
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        pollTime = self.pollMinTime
+        while digitalRead(self.snapReadPin) == LOW:
+            if deadline is not None and time.perf_counter() > deadline:
+                return False
+            time.sleep(pollTime)
+            pollTime = min(pollTime * 2, self.pollMaxTime)
+        return True
+
+    def handshakeTimedOut(self):
+        self.handshake.timeout()
+        now = time.perf_counter()
+        if now - self.lastTimeoutLog >= TIMEOUT_LOG_TIME:
+            timeouts = self.handshake.timeouts
+            self.logger.warn(f'SNAP_FIFO_READ timed out after ' \
+                             f'{self.handshakeTimeout}s ' \
+                             f'{timeouts - self.lastTimeouts} times ' \
+                             f'({timeouts} total)')
+            self.lastTimeoutLog = now
+            self.lastTimeouts = timeouts
+
+    async def logStats(self):
+        while True:
+            await asyncio.sleep(STATS_TIME)
+            self.logger.info(f'HANDSHAKE_STATS: {self.handshake.summary()}')
 
     def setPinMode(self, pin, mode):
-        gpio.pinMode(pin, mode)
+        self.gpio.pinMode(pin, mode)
 
     def setupShiftPins(self):
         self.setPinMode(self.inputPin, OUTPUT)
@@ -101,19 +390,19 @@ class GPIO_to_cRIO:
         self.setPinMode(self.snapReadPin, INPUT)
 
     def writeData(self, pin, state):
-        gpio.digitalWrite(pin, state)
+        self.gpio.digitalWrite(pin, state)
 
     def shiftDataOut(self, data):
         self.writeData(self.clockPin, LOW)
         try:
-            gpio.shiftOut(self.inputPin, self.clockPin, self.order, data)
+            self.gpio.shiftOut(self.inputPin, self.clockPin, self.order, data)
         except:
             self.logger.error(f'gpio.shiftOut() failed')
 
     def latchData(self):
-        gpio.digitalWrite(self.latchPin, LOW)
-        gpio.digitalWrite(self.latchPin, HIGH)
-        gpio.digitalWrite(self.latchPin, LOW)
+        self.writeData(self.latchPin, LOW)
+        self.writeData(self.latchPin, HIGH)
+        self.writeData(self.latchPin, LOW)
 
     def clearData(self):
         self.writeData(self.clearPin, HIGH)
@@ -131,7 +420,7 @@ class GPIO_to_cRIO:
         # self.writeData(self.snapReadPin, LOW)
 
 async def runGPIOTest(loop):
-    shiftReg = GPIO_to_cRIO(qFIFO=asyncio.Queue(maxsize=32),
+    shiftReg = GPIO_to_cRIO(qFIFO=photonFIFO(),
                             inputPin=SHIFTREG_INPUT_PIN,
                             clockPin=SHIFTREG_CLOCK_PIN,
                             latchPin=SHIFTREG_LATCH_PIN,
@@ -140,7 +429,7 @@ async def runGPIOTest(loop):
                             snapFullPin=SNAP_FIFO_FULL_PIN, 
                             snapEmptyPin=SNAP_FIFO_EMPTY_PIN, 
                             snapReadPin=SNAP_FIFO_READ_PIN,
-                            order=gpio.MSBFIRST,
+                            order=MSBFIRST,
                             clockTime=0)
     
     testData = [(0b00000000, 0b00000000),
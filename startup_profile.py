@@ -0,0 +1,178 @@
+#!/usr/bin/python3
+# startup_profile.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Boot-to-first-packet profile and fast-start binding for JHU's Rocket Lab.
+###############################################################################
+# Times are seconds since the process started (from /proc/self/stat), so the
+# interpreter start-up before the first line of main_*.py is included:
+#   interpreter  - process start until main_*.py created its profile
+#   phases       - imports, interface discovery, GPIO init, bind, ...
+#   ready        - initialization done, packets are being handled
+#   first_rx     - first datagram received
+#   first_forward - first packet forwarded (VIM-BCAST) or first photon
+#                  shifted out (VIM-PARLL)
+# The profile is logged as STARTUP_PROFILE and is the 'startup' stats gauge.
+#
+# Fast start: main_*.py call earlyBind() before their slow imports. With
+# --fastStart it binds the UDP socket right away with a large receive buffer,
+# so the kernel holds the early packets until the event loop reads them.
+# VIM-BCAST forwards to the port it listens on, and the kernel loops its
+# broadcasts back to local sockets bound to INADDR_ANY, so it must bind its
+# interface address: without --localIP that comes from an SIOCGIFADDR ioctl,
+# and if the interface has no address the early bind is skipped.
+#
+# Only light standard library modules are imported here, so earlyBind() runs
+# before asyncio, numpy, netifaces and wiringpi are loaded.
+###############################################################################
+
+import os
+import time
+import fcntl
+import struct
+import socket
+import logging
+import argparse
+
+EARLY_RCVBUF = 8 * 1024 * 1024  # bytes of early packets the kernel may hold
+FIRST_POLL = 0.001  # seconds between checks for the first packets
+FIRST_POLL_TIME = 5  # seconds of fast checks, then every FIRST_POLL_SLOW
+FIRST_POLL_SLOW = 0.05
+SIOCGIFADDR = 0x8915
+
+_profiles = {}
+
+def processTimes():
+    """(seconds since boot the process started, seconds it has run)."""
+    try:
+        with open('/proc/self/stat') as f:
+            # the command name can hold spaces, the fields after it cannot
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        started = int(fields[19]) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None, 0.0
+    return started, max(uptime - started, 0.0)
+
+class startupProfile:
+    def __init__(self, name):
+        self.name = name
+        self.logger = logging.getLogger(name)
+        self.sinceBoot, age = processTimes()
+        self.interpreter = age  # process start to this profile
+        self.origin = time.perf_counter() - age  # process start
+        self.phases = {}
+        self.starts = {}
+        self.events = {}
+
+    def now(self):
+        return time.perf_counter() - self.origin
+
+    def begin(self, phase):
+        self.starts[phase] = time.perf_counter()
+
+    def end(self, phase):
+        elapsed = time.perf_counter() - self.starts.pop(phase)
+        self.phases[phase] = self.phases.get(phase, 0.0) + elapsed
+
+    def phase(self, phase):
+        return _phaseTimer(self, phase)
+
+    def mark(self, event):
+        """Record the first time `event` happens."""
+        if event not in self.events:
+            self.events[event] = self.now()
+
+    async def watchFirst(self, events):
+        """Mark each of {event: count()} once its count goes above 0."""
+        import asyncio  # not at the top: earlyBind() runs before asyncio loads
+
+        waiting = dict(events)
+        slowTime = time.perf_counter() + FIRST_POLL_TIME
+        while waiting:
+            for event, count in list(waiting.items()):
+                if count() > 0:
+                    self.mark(event)
+                    del waiting[event]
+            if time.perf_counter() < slowTime:
+                await asyncio.sleep(FIRST_POLL)
+            else:
+                await asyncio.sleep(FIRST_POLL_SLOW)
+        self.logger.info(f'STARTUP_PROFILE: {self.summary()}')
+
+    def summary(self):
+        summary = {'process_start_since_boot': self.sinceBoot,
+                   'interpreter': round(self.interpreter, 6)}
+        summary.update({name: round(value, 6)
+                        for name, value in self.phases.items()})
+        summary.update({name: round(value, 6)
+                        for name, value in self.events.items()})
+        return summary
+
+class _phaseTimer:
+    def __init__(self, profile, phase):
+        self.profile = profile
+        self.name = phase
+
+    def __enter__(self):
+        self.profile.begin(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        self.profile.end(self.name)
+        return False
+
+def getProfile(name):
+    """The startup profile of a service, created on first use."""
+    profile = _profiles.get(name)
+    if profile is None:
+        profile = _profiles[name] = startupProfile(name)
+    return profile
+
+def interfaceAddress(iface):
+    """IPv4 address of `iface` (SIOCGIFADDR), or None."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        try:
+            ifreq = fcntl.ioctl(sock.fileno(), SIOCGIFADDR,
+                                struct.pack('256s', iface.encode()[:15]))
+        except OSError:
+            return None
+    return socket.inet_ntoa(ifreq[20:24])
+
+def earlyBind(argv, name, defaultPort=60000, iface=None):
+    """With --fastStart in argv, bind the service's UDP socket now.
+
+    With `iface`, the socket is bound to its address (or --localIP), never
+    to INADDR_ANY.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--fastStart', action='store_true')
+    parser.add_argument('--fastStartBuffer', type=int, default=EARLY_RCVBUF)
+    parser.add_argument('--port', type=int, default=defaultPort)
+    parser.add_argument('--localIP', type=str, default='')
+    opts, _ = parser.parse_known_args(argv)
+    if not opts.fastStart:
+        return None
+
+    profile = getProfile(name)
+    localIP = opts.localIP
+    if iface is not None and not localIP:
+        localIP = interfaceAddress(iface)
+        if localIP is None:
+            profile.logger.warn(f'--fastStart: {iface} has no address, ' \
+                                f'binding after start-up')
+            return None
+    with profile.phase('early_bind'):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            # beyond net.core.rmem_max only root can force it
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUFFORCE,
+                            opts.fastStartBuffer)
+        except (OSError, AttributeError):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                            opts.fastStartBuffer)
+        sock.bind((localIP, opts.port))
+    return sock
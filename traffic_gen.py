@@ -0,0 +1,164 @@
+#!/usr/bin/python3
+# traffic_gen.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Synthetic zero-order detector traffic for load testing VIM-BCAST/PARLL.
+###############################################################################
+# Sends packets in the zero-order format (see photon_decoder.py) at a fixed
+# rate. The number of photons per packet follows one of DISTRIBUTIONS:
+#   fixed   - always --photons
+#   uniform - 0 .. 2 * --photons
+#   poisson - Poisson with mean --photons
+#   burst   - 0 most of the time, MAX_PHOTONS in 1 packet of --burstEvery
+# capped at MAX_PHOTONS. A pool of packets is built up front; sending only
+# patches the sequence number, so the generator is not the bottleneck.
+#
+#   ./traffic_gen.py --dest 127.0.0.1:60000 --rate 5000 --duration 10
+###############################################################################
+
+import sys
+import socket
+import argparse
+import shlex
+import json
+import math
+import random
+import struct
+import time
+
+from photon_decoder import MAX_PHOTONS, buildPacket
+
+DISTRIBUTIONS = ('fixed', 'uniform', 'poisson', 'burst')
+POOL_SIZE = 1024
+TICK_TIME = 0.001  # seconds between pacing checks
+MAX_BURST = 256  # most packets sent in one pacing check
+SEQ = struct.Struct('<H')
+
+def poisson(rng, mean):
+    # Knuth for small means, normal approximation for large ones
+    if mean > 30:
+        return max(int(rng.gauss(mean, math.sqrt(mean)) + 0.5), 0)
+    limit = math.exp(-mean)
+    count, prod = 0, rng.random()
+    while prod > limit:
+        count += 1
+        prod *= rng.random()
+    return count
+
+def photonCounts(dist, photons, count, burstEvery=100, seed=0):
+    rng = random.Random(seed)
+    counts = []
+    for i in range(count):
+        if dist == 'fixed':
+            n = photons
+        elif dist == 'uniform':
+            n = rng.randint(0, 2 * photons)
+        elif dist == 'poisson':
+            n = poisson(rng, photons)
+        elif dist == 'burst':
+            n = MAX_PHOTONS if i % burstEvery == 0 else 0
+        else:
+            raise ValueError(f'unknown distribution \'{dist}\'')
+        counts.append(min(n, MAX_PHOTONS))
+    return counts
+
+class packetSource:
+    """Pool of zero-order packets; next() stamps the next sequence number."""
+    def __init__(self, dist='poisson', photons=20, poolSize=POOL_SIZE,
+                 burstEvery=100, seed=0):
+        rng = random.Random(seed)
+        self.pool = []
+        for n in photonCounts(dist, photons, poolSize, burstEvery, seed):
+            photonList = [(rng.getrandbits(16), rng.getrandbits(16),
+                           rng.getrandbits(16)) for _ in range(n)]
+            self.pool.append((bytearray(buildPacket(0, photonList)), n))
+        self.index = 0
+        self.seq = 0
+        self.photons = 0  # photons handed out so far
+
+    def next(self):
+        pkt, n = self.pool[self.index]
+        self.index = (self.index + 1) % len(self.pool)
+        SEQ.pack_into(pkt, 2, self.seq)
+        self.seq = (self.seq + 1) & 0xFFFF
+        self.photons += n
+        return pkt
+
+class trafficResult:
+    __slots__ = ('sent', 'photons', 'errors', 'elapsed')
+
+    def __init__(self):
+        self.sent = 0
+        self.photons = 0
+        self.errors = 0
+        self.elapsed = 0.0
+
+    def asDict(self):
+        return {'sent': self.sent, 'photons': self.photons,
+                'errors': self.errors, 'elapsed_s': round(self.elapsed, 6),
+                'rate_pps': round(self.sent / self.elapsed, 1)
+                            if self.elapsed else 0.0}
+
+def sendTraffic(sock, dest, source, rate, duration):
+    """Send `rate` packets/s to `dest` for `duration` seconds."""
+    result = trafficResult()
+    photons0 = source.photons
+    sendto = sock.sendto
+    start = time.perf_counter()
+    end = start + duration
+    while True:
+        now = time.perf_counter()
+        if now >= end:
+            break
+        due = min(int((now - start) * rate) - result.sent, MAX_BURST)
+        for _ in range(due):
+            try:
+                sendto(source.next(), dest)
+            except OSError:
+                result.errors += 1
+            result.sent += 1
+        if due < MAX_BURST:
+            time.sleep(TICK_TIME)
+    result.elapsed = time.perf_counter() - start
+    result.photons = source.photons - photons0
+    return result
+
+def parseDest(dest):
+    host, port = dest.rsplit(':', 1)
+    return host, int(port)
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if isinstance(argv, str):
+        argv = shlex.split(argv)
+
+    parser = argparse.ArgumentParser(sys.argv[0])
+    parser.add_argument('--dest', type=str, default='127.0.0.1:60000',
+                        help='host:port to send to')
+    parser.add_argument('--rate', type=float, default=1000,
+                        help='packets per second')
+    parser.add_argument('--duration', type=float, default=5,
+                        help='in seconds')
+    parser.add_argument('--dist', type=str, default='poisson',
+                        choices=DISTRIBUTIONS,
+                        help='photons per packet distribution')
+    parser.add_argument('--photons', type=int, default=20,
+                        help='mean photons per packet')
+    parser.add_argument('--burstEvery', type=int, default=100,
+                        help='packets per burst for --dist burst')
+    parser.add_argument('--seed', type=int, default=0)
+    opts = parser.parse_args(argv)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    source = packetSource(opts.dist, opts.photons,
+                          burstEvery=opts.burstEvery, seed=opts.seed)
+    result = sendTraffic(sock, parseDest(opts.dest), source,
+                         opts.rate, opts.duration)
+    sock.close()
+    print(json.dumps(result.asDict()))
+
+if __name__ == "__main__":
+    main()
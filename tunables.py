@@ -0,0 +1,112 @@
+#!/usr/bin/python3
+# tunables.py
+# 10/18/2026
+# Aidan Gray
+# aidan.gray@idg.jhu.edu
+#
+# Runtime-adjustable settings ("knobs") for JHU's Rocket Lab.
+###############################################################################
+# Knob sets are looked up by name like loggers. Each knob is a getter and a
+# setter on the live object, registered under the name of its command line
+# option (and in the same units):
+#
+#   knobs = tunables.getTunables('parll')
+#   knobs.add('queueSize', lambda: qPacket.capacity, qPacket.setCapacity,
+#             int, 'packets held by the incoming packet queue', minimum=1)
+#
+# The control socket commands:
+#   get [name ...]           - current values
+#   set name value [...]     - change values, returns the new ones
+#   knobs                    - what each knob does
+###############################################################################
+
+import logging
+
+class tunable:
+    __slots__ = ('name', 'get', 'set', 'kind', 'help', 'choices', 'minimum')
+
+    def __init__(self, name, get, set, kind, help, choices, minimum):
+        self.name = name
+        self.get = get
+        self.set = set
+        self.kind = kind
+        self.help = help
+        self.choices = choices
+        self.minimum = minimum
+
+    def parse(self, text):
+        value = self.kind(text)
+        if self.choices is not None and value not in self.choices:
+            raise ValueError(f'{self.name} must be one of ' \
+                             f'{", ".join(map(str, self.choices))}')
+        if self.minimum is not None and value < self.minimum:
+            raise ValueError(f'{self.name} must be >= {self.minimum}')
+        return value
+
+class tunableSet:
+    def __init__(self, name):
+        self.name = name
+        self.logger = logging.getLogger(name)
+        self.knobs = {}
+
+    def add(self, name, get, set, kind=float, help='', choices=None,
+            minimum=None):
+        self.knobs[name] = tunable(name, get, set, kind, help, choices,
+                                   minimum)
+
+    def knob(self, name):
+        knob = self.knobs.get(name)
+        if knob is None:
+            raise KeyError(f'unknown knob \'{name}\'')
+        return knob
+
+    def values(self, names=None):
+        if not names:
+            names = self.knobs
+        return {name: self.knob(name).get() for name in names}
+
+    def set(self, name, text):
+        knob = self.knob(name)
+        value = knob.parse(text)
+        old = knob.get()
+        knob.set(value)
+        self.logger.info(f'KNOB {name}: {old} -> {knob.get()}')
+
+    def getCommand(self, args):
+        return self.values(args)
+
+    def setCommand(self, args):
+        if not args or len(args) % 2:
+            raise ValueError('usage: set <name> <value> [<name> <value> ...]')
+        pairs = list(zip(args[0::2], args[1::2]))
+        for name, text in pairs:
+            self.knob(name).parse(text)  # check them all before changing any
+        for name, text in pairs:
+            self.set(name, text)
+        return self.values([name for name, _ in pairs])
+
+    def describe(self, args=None):
+        return {name: knob.help for name, knob in self.knobs.items()}
+
+    def register(self, ctlSocket):
+        ctlSocket.register('get', self.getCommand)
+        ctlSocket.register('set', self.setCommand)
+        ctlSocket.register('knobs', self.describe)
+
+def logLevel(text):
+    """A logging level from a number or a name (debug, info, ...)."""
+    try:
+        return int(text)
+    except ValueError:
+        level = logging.getLevelName(text.upper())
+        if not isinstance(level, int):
+            raise ValueError(f'unknown log level \'{text}\'')
+        return level
+
+_sets = {}
+
+def getTunables(name):
+    """The knob set of a service, created on first use."""
+    if name not in _sets:
+        _sets[name] = tunableSet(name)
+    return _sets[name]
@@ -9,21 +9,86 @@
 
 import logging
 import asyncio
+import socket
 import time
 
+import mmsg_io
+import metrics
+import rx_timestamp
+import packet_trace
+from queue_policy import packetQueue, PACKET_CAPACITY, DROP_NEWEST, MAX_AGE
+
+STATS_TIME = 60  # seconds between batch statistics log lines
+TRUNC_LOG_TIME = 1  # minimum seconds between truncated datagram warnings
+
 try:
     import signal
 except ImportError:
     signal = None
 
+class AsyncUDPServerProtocol(asyncio.DatagramProtocol):
+    def __init__(self, loop, logger, qPacket, stats, capture=None):
+        self.loop = loop
+        self.logger = logger
+        self.qPacket = qPacket
+        self.capture = capture
+        self.rxPackets = stats.counter('rx_packets')
+        self.rxBytes = stats.counter('rx_bytes')
+        self.rxDropped = stats.counter('rx_dropped')
+        self.rxSocketWait = stats.histogram('rx_socket_wait')
+        self.rxTrace = packet_trace.getTracer('bcast').point('rx')
+        super().__init__()
+
+    def connection_made(self, transport):
+        self.transport = transport
+        peername = self.transport.get_extra_info('peername')
+        self.logger.debug(f'Connection made: \'{peername}\'')
+        
+    def datagram_received(self, data, addr, rcv_time=None):
+        # straight into the queue from the loop's read callback: no tasks.
+        # rcv_time is the kernel receive time when timestamps are on
+        enq_time = time.time()
+        if rcv_time is None:
+            rcv_time = enq_time
+        else:
+            self.rxSocketWait.record(enq_time - rcv_time)
+        self.rxPackets.value += 1
+        self.rxBytes.value += len(data)
+        if self.capture is not None:
+            self.capture.write(rcv_time, addr, data)
+        if self.rxTrace.enabled:
+            self.rxTrace.record(len(data), addr, data)
+        # the queue applies its overflow policy and reports drops
+        if not self.qPacket.put_nowait((rcv_time, addr, data, enq_time)):
+            self.rxDropped.value += 1
+
+    def error_received(self, exc):
+        self.logger.error(f'Error received: \'{exc}\'')
+
+    def connection_lost(self, exc):
+        self.logger.warn(f'Connection lost: \'{exc}\'')
+
 class AsyncUDPServer:
-    def __init__(self, loop, hostname, port):
+    def __init__(self, loop, hostname, port, capture=None,
+                 queueSize=PACKET_CAPACITY, queuePolicy=DROP_NEWEST,
+                 maxAge=MAX_AGE, timestamps=False):
         self.logger = logging.getLogger('bcast')
-        self.qPacket = asyncio.Queue(maxsize=32)
-        self.qXmit = asyncio.Queue(maxsize=32)
+        self.qPacket = packetQueue(queueSize, queuePolicy, maxAge, 'bcast',
+                                   'Incoming Packet Queue')
+        self.qXmit = packetQueue(queueSize, queuePolicy, maxAge, 'bcast',
+                                 'Transmit Data Queue')
         self.loop = loop
         self.addr = (hostname, port)
         self.serverTask = None
+        self.receiver = None
+        self.batchStats = None
+        self.capture = capture  # captureRing of everything received
+        self.timestamps = timestamps  # kernel receive times, SO_TIMESTAMPNS
+
+        self.metrics = metrics.getRegistry('bcast')
+        self.metrics.gauge('packet_queue', self.qPacket.qsize)
+        self.metrics.gauge('xmit_queue', self.qXmit.qsize)
+        self.metrics.gauge('packet_queue_drops', self.qPacket.drops.summary)
 
     def startUDP(self):
         if signal is not None:
@@ -37,52 +102,118 @@ class AsyncUDPServer:
             server.close()
             self.loop.close()
 
-    async def start_server(self):
-        class AsyncUDPServerProtocol(asyncio.DatagramProtocol):
-            def __init__(self, loop, logger, qPacket):
-                self.loop = loop
-                self.logger = logger
-                self.qPacket = qPacket
-                super().__init__()
-
-            def connection_made(self, transport):
-                self.transport = transport
-                peername = self.transport.get_extra_info('peername')
-                self.logger.debug(f'Connection made: \'{peername}\'')
-                
-            def datagram_received(self, data, addr):
-                rcv_time = time.time()    
-                self.logger.debug(f'Data received: \'{data}\'' \
-                                  f'from \'{addr}\'' \
-                                  f'at \'{rcv_time}\'')
-                datagram = (rcv_time, addr, data)
-                asyncio.ensure_future(self.datagram_handler(datagram))
-
-            def error_received(self, exc):
-                self.logger.error(f'Error received: \'{exc}\'')
-
-            def connection_lost(self, exc):
-                self.logger.warn(f'Connection lost: \'{exc}\'')
-
-            async def datagram_handler(self, dgram): 
-                self.loop.create_task(self.enqueue_packet(dgram))
-
-            async def enqueue_packet(self, packet):
-                if self.qPacket.full():
-                    self.logger.warn(f'Incoming Packet Queue is full')
-                else:
-                    await self.qPacket.put(packet)
-
+    async def start_server(self, sock=None):
         loop = asyncio.get_event_loop()
-        protocol = AsyncUDPServerProtocol(loop, self.logger, self.qPacket)
+        protocol = AsyncUDPServerProtocol(loop, self.logger, self.qPacket,
+                                          self.metrics, self.capture)
+        if self.timestamps:
+            if sock is None:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                sock.bind(self.addr)
+            reader = rx_timestamp.timestampReader(
+                sock, protocol.datagram_received, 'bcast')
+            reader.start(loop)
+            self.metrics.gauge('rx_no_timestamp', lambda: reader.missing)
+            return reader, protocol
+        if sock is not None:
+            # bound early by startup_profile.earlyBind()
+            return await loop.create_datagram_endpoint(lambda: protocol,
+                                                       sock=sock)
         return await loop.create_datagram_endpoint(
             lambda: protocol, local_addr=self.addr)
         #transport, server = self.loop.run_until_complete(serverTask)
         #return transport, server
 
-async def runUDPserverTest(loop):
-    udpServer = AsyncUDPServer(loop, localIP, localPort)
-    await asyncio.gather(udpServer.start_server())
+    async def start_batch_server(self, batchHandler,
+                                 batchSize=mmsg_io.DEFAULT_BATCH,
+                                 bufSize=mmsg_io.DEFAULT_BUF_SIZE,
+                                 sock=None):
+        # drain up to batchSize datagrams per wakeup with recvmmsg() and hand
+        # them to batchHandler(receiver, count) without going through qPacket
+        if sock is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind(self.addr)
+        sock.setblocking(False)
+        self.batchSock = sock
+        self.receiver = mmsg_io.mmsgReceiver(sock, batchSize, bufSize,
+                                             self.timestamps)
+        self.batchStats = mmsg_io.batchStats(batchSize)
+        self.metrics.gauge('batch_mean', self.batchStats.mean)
+        self.metrics.gauge('batch_calls', lambda: self.batchStats.calls)
+        self.rxPackets = self.metrics.counter('rx_packets')
+        self.rxToSend = self.metrics.histogram('batch_rx_to_send')
+        self.rxSocketWait = self.metrics.histogram('rx_socket_wait')
+        self.metrics.gauge('rx_truncated', lambda: self.receiver.truncated)
+        self.lastTruncated = 0
+        self.lastTruncLog = 0
+        self.batchTrace = packet_trace.getTracer('bcast').point('batch')
+        self.loop.add_reader(sock.fileno(), self.readBatch, batchHandler)
+        self.logger.debug(f'Batch server bound: \'{self.addr}\'')
+
+    def readBatch(self, batchHandler):
+        receiver = self.receiver
+        while True:
+            try:
+                count = receiver.recv()
+            except OSError as e:
+                self.logger.error(f'Error received: \'{e}\'')
+                return
+            if receiver.truncated != self.lastTruncated:
+                self.logTruncated()
+            if count == 0:
+                return
+            read_time = rcv_time = time.time()
+            self.batchStats.record(count)
+            self.rxPackets.value += count
+            if receiver.timestamps:
+                # from the oldest datagram's kernel receive time
+                stamps = [receiver.timestamp(i) or read_time
+                          for i in range(count)]
+                for stamp in stamps:
+                    self.rxSocketWait.record(read_time - stamp)
+                rcv_time = min(stamps)
+            if self.capture is not None:
+                for i in range(count):
+                    self.capture.write(stamps[i] if receiver.timestamps
+                                       else rcv_time, *receiver.packet(i))
+            if self.batchTrace.enabled:
+                addr, data = receiver.packet(0)
+                self.batchTrace.record(count, addr, data)
+            try:
+                batchHandler(receiver, count)
+            except (OSError, ValueError) as e:
+                self.logger.warn(f'Batch forwarding failed: \'{e}\'')
+            self.rxToSend.record(time.time() - rcv_time)
+            if count < receiver.batchSize:
+                return
+
+    def logTruncated(self):
+        now = time.perf_counter()
+        if now - self.lastTruncLog >= TRUNC_LOG_TIME:
+            truncated = self.receiver.truncated
+            self.logger.warn(f'Dropped {truncated - self.lastTruncated} ' \
+                             f'datagrams longer than the ' \
+                             f'{self.receiver.bufSize}B batch buffers ' \
+                             f'({truncated} total)')
+            self.lastTruncLog = now
+            self.lastTruncated = truncated
+
+    async def logBatchStats(self):
+        while True:
+            await asyncio.sleep(STATS_TIME)
+            if self.batchStats is not None:
+                self.logger.info(f'BATCH_STATS: {self.batchStats.summary()}')
+
+async def logPackets(qPacket):
+    logger = logging.getLogger('bcast')
+    while True:
+        rcv_time, addr, data, enq_time = await qPacket.get()
+        logger.info(f'PACKET: {len(data)}B from {addr}')
+
+async def runUDPserverTest(loop, hostname, port):
+    udpServer = AsyncUDPServer(loop, hostname, port)
+    await udpServer.start_server()
+    loop.create_task(logPackets(udpServer.qPacket))
 
 if __name__ == "__main__":
     LOG_FORMAT = '%(asctime)s.%(msecs)03dZ %(name)-10s %(levelno)s \
@@ -101,7 +232,7 @@ if __name__ == "__main__":
     srcPort = 1025
     
     loop = asyncio.get_event_loop()
-    loop.run_until_complete(runUDPserverTest(loop))
+    loop.run_until_complete(runUDPserverTest(loop, localIP, localPort))
 
     try:
         loop.run_forever()    
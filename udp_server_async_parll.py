@@ -11,21 +11,94 @@ from socket import *
 import logging
 import asyncio
 import subprocess
+import time
+
+import metrics
+import packet_trace
+import rx_timestamp
+from photon_fifo import photonFIFO, PHOTON_CAPACITY
+from queue_policy import packetQueue, PACKET_CAPACITY, DROP_NEWEST, MAX_AGE
 
 try:
     import signal
 except ImportError:
     signal = None
 
+class AsyncUDPServerProtocol(asyncio.DatagramProtocol):
+    def __init__(self, loop, logger, qPacket, srcIP, stats, capture=None):
+        self.loop = loop
+        self.logger = logger
+        self.qPacket = qPacket
+        self.srcIP = srcIP
+        self.capture = capture
+        self.rxPackets = stats.counter('rx_packets')
+        self.rxBytes = stats.counter('rx_bytes')
+        self.rxDropped = stats.counter('rx_dropped')
+        self.rxOther = stats.counter('rx_other_source')
+        self.rxSocketWait = stats.histogram('rx_socket_wait')
+        self.rxTrace = packet_trace.getTracer('parll').point('rx')
+        super().__init__()
+
+    def connection_made(self, transport):
+        # Ping to measure boot time
+        # subprocess.run(["ping", "-c", "1", self.srcIP], 
+        #                stdout=subprocess.PIPE)
+        self.transport = transport
+        peername = self.transport.get_extra_info('peername')
+        self.logger.debug(f'Connection made: \'{peername}\'')
+        
+    def datagram_received(self, data, addr, rcv_time=None):
+        # straight into the queue from the loop's read callback: no tasks.
+        # rcv_time is the kernel receive time when timestamps are on
+        if addr[0] != self.srcIP:
+            self.rxOther.value += 1
+            return
+        enq_time = time.time()
+        if rcv_time is None:
+            rcv_time = enq_time
+        else:
+            self.rxSocketWait.record(enq_time - rcv_time)
+        self.rxPackets.value += 1
+        self.rxBytes.value += len(data)
+        if self.capture is not None:
+            self.capture.write(rcv_time, addr, data)
+        if self.rxTrace.enabled:
+            self.rxTrace.record(len(data), addr, data)
+        # the queue applies its overflow policy and reports drops
+        if not self.qPacket.put_nowait((rcv_time, addr, data, enq_time)):
+            self.rxDropped.value += 1
+
+    def error_received(self, exc):
+        self.logger.error(f'Error received: \'{exc}\'')
+
+    def connection_lost(self, exc):
+        self.logger.warn(f'Connection lost: \'{exc}\'')
+
 class AsyncUDPServer:
-    def __init__(self, loop, hostname, port, source_ip_address):
+    def __init__(self, loop, hostname, port, source_ip_address,
+                 fifoPhotons=PHOTON_CAPACITY, capture=None,
+                 queueSize=PACKET_CAPACITY, queuePolicy=DROP_NEWEST,
+                 fifoPolicy=DROP_NEWEST, maxAge=MAX_AGE, timestamps=False):
         self.logger = logging.getLogger('parll')
-        self.qPacket = asyncio.Queue(maxsize=32)
-        self.qFIFO = asyncio.Queue(maxsize=32)
+        self.qPacket = packetQueue(queueSize, queuePolicy, maxAge, 'parll',
+                                   'Incoming Packet Queue')
+        self.qFIFO = photonFIFO(capacity=fifoPhotons, policy=fifoPolicy,
+                                maxAge=maxAge)
         self.loop = loop
         self.addr = (hostname, port)
         self.srcIP = source_ip_address
         self.serverTask = None
+        self.capture = capture  # captureRing of the detector's packets
+        self.timestamps = timestamps  # kernel receive times, SO_TIMESTAMPNS
+
+        self.metrics = metrics.getRegistry('parll')
+        self.metrics.gauge('packet_queue', self.qPacket.qsize)
+        self.metrics.gauge('fifo_photons', self.qFIFO.qsize)
+        self.metrics.gauge('fifo_high_water', lambda: self.qFIFO.highWater)
+        self.metrics.gauge('fifo_dropped_photons',
+                           lambda: self.qFIFO.droppedPhotons)
+        self.metrics.gauge('packet_queue_drops', self.qPacket.drops.summary)
+        self.metrics.gauge('fifo_drops', self.qFIFO.drops.summary)
 
     def startUDP(self):
         if signal is not None:
@@ -39,72 +112,47 @@ class AsyncUDPServer:
             server.close()
             self.loop.close()
 
-    async def start_server(self):
-        class AsyncUDPServerProtocol(asyncio.DatagramProtocol):
-            def __init__(self, loop, logger, qPacket, srcIP):
-                self.loop = loop
-                self.logger = logger
-                self.qPacket = qPacket
-                self.srcIP = srcIP
-                super().__init__()
-
-            def connection_made(self, transport):
-                # Ping to measure boot time
-                # subprocess.run(["ping", "-c", "1", self.srcIP], 
-                #                stdout=subprocess.PIPE)
-                self.transport = transport
-                peername = self.transport.get_extra_info('peername')
-                self.logger.debug(f'Connection made: \'{peername}\'')
-                
-            def datagram_received(self, data, addr):    
-                if addr[0] == self.srcIP:
-                    self.logger.debug(f'Data received: \'{data}\' from \'{addr}\'')
-                    # self.transport.sendto(data, addr)
-                    datagram = (addr, data)
-                    asyncio.ensure_future(self.datagram_handler(datagram))
-
-            def error_received(self, exc):
-                self.logger.error(f'Error received: \'{exc}\'')
-
-            def connection_lost(self, exc):
-                self.logger.warn(f'Connection lost: \'{exc}\'')
-
-            async def datagram_handler(self, dgram): 
-                packet = dgram[1]
-                try:
-                    pktDec = int.from_bytes(packet, "little")
-                except:
-                    self.logger.debug(f'cannot convert to int')    
-                self.logger.debug(f'{packet} type={type(packet)} int={pktDec}')
-                self.loop.create_task(self.enqueue_packet(packet))
-
-            async def enqueue_packet(self, packet):
-                if self.qPacket.full():
-                    self.logger.warn(f'Incoming Packet Queue is full')
-                else:
-                    await self.qPacket.put(packet)
-
+    async def start_server(self, sock=None):
         loop = asyncio.get_event_loop()
 
-        s=socket(AF_INET, SOCK_DGRAM)
-        s.bind(self.addr)
+        if sock is not None:
+            s = sock  # bound early by startup_profile.earlyBind()
+        else:
+            s=socket(AF_INET, SOCK_DGRAM)
+            s.bind(self.addr)
     
         protocol = AsyncUDPServerProtocol(
             loop, 
             self.logger, 
             self.qPacket, 
             self.srcIP,
+            self.metrics,
+            self.capture,
             )
         
+        if self.timestamps:
+            reader = rx_timestamp.timestampReader(
+                s, protocol.datagram_received, 'parll')
+            reader.start(loop)
+            self.metrics.gauge('rx_no_timestamp', lambda: reader.missing)
+            return reader, protocol
+
         return await loop.create_datagram_endpoint(
               lambda: protocol, sock=s)
     
         # transport, server = self.loop.run_until_complete(serverTask)
         # return transport, server
 
-async def runUDPserverTest(loop):
-    udpServer = AsyncUDPServer(loop, localIP, localPort, srcIP)
-    await asyncio.gather(udpServer.start_server())
+async def logPackets(qPacket):
+    logger = logging.getLogger('parll')
+    while True:
+        rcv_time, addr, data, enq_time = await qPacket.get()
+        logger.info(f'PACKET: {len(data)}B from {addr}')
+
+async def runUDPserverTest(loop, hostname, port, srcIP):
+    udpServer = AsyncUDPServer(loop, hostname, port, srcIP)
+    await udpServer.start_server()
+    loop.create_task(logPackets(udpServer.qPacket))
 
 if __name__ == "__main__":
     LOG_FORMAT = '%(asctime)s.%(msecs)03dZ %(name)-10s %(levelno)s \
@@ -119,7 +167,7 @@ if __name__ == "__main__":
     srcIP = '172.16.1.112'
     
     loop = asyncio.get_event_loop()
-    loop.run_until_complete(runUDPserverTest(loop))
+    loop.run_until_complete(runUDPserverTest(loop, localIP, localPort, srcIP))
 
     try:
         loop.run_forever()    